@@ -0,0 +1,3 @@
+"""
+Benchmarks measuring the client against a local stand-in for the Customer.io APIs.
+"""
@@ -0,0 +1,289 @@
+"""
+Measures the throughput, latency, CPU time and memory use of the synchronous clients.
+
+Each scenario calls one client method against the local stand-in server, with and without
+connection pooling, over HTTP/2 (which needs the `http2` extra) and from several threads at
+once. Run from the repository root:
+
+    python -m benchmarks.client --operations 2000 --threads 1,4,16 --json results.json
+
+Passing `--baseline` with the JSON written by an earlier run reports every result that got
+slower by more than `--tolerance` and exits with status 1, so runs against two releases can be
+compared before upgrading.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import urllib3
+
+from benchmarks.server import StandInServer
+from customerio import APIClient, CustomerIO, SendEmailRequest
+
+BATCH_SIZE = 100
+DEFAULT_OPERATIONS = 1000
+DEFAULT_THREADS = (1, 4, 16)
+DEFAULT_MEMORY_OPERATIONS = 200
+DEFAULT_TOLERANCE = 0.1
+WARMUP_OPERATIONS = 10
+
+MODES = {
+    "pooled": {"use_connection_pooling": True},
+    "unpooled": {"use_connection_pooling": False},
+    "http2": {"http2": True},
+}
+
+
+def _trust_self_signed(client):
+    """Makes every session the client builds skip verifying the stand-in's certificate."""
+    build_session = client._build_session
+
+    def _build_session():
+        session = build_session()
+        session.verify = False
+        session.trust_env = False
+        return session
+
+    client._build_session = _build_session
+    return client
+
+
+def _track_client(server, options, threads):
+    host, port = server.url.split("://")[1].split(":")
+    return _trust_self_signed(
+        CustomerIO(
+            site_id="siteid",
+            api_key="apikey",
+            host=host,
+            port=int(port),
+            pool_maxsize=max(threads, 1),
+            **options,
+        )
+    )
+
+
+def _api_client(server, options, threads):
+    return _trust_self_signed(
+        APIClient("apikey", url=server.url, pool_maxsize=max(threads, 1), **options)
+    )
+
+
+def _track(client, i):
+    client.track(customer_id=i, name="purchased", data={"price": 23.45, "sku": f"sku-{i}"})
+
+
+def _identify(client, i):
+    client.identify(id=i, email=f"customer-{i}@example.com", plan="premium", created_at=1561231234)
+
+
+def _batch(client, i):
+    client.batch(
+        [
+            {
+                "type": "person",
+                "action": "event",
+                "identifiers": {"id": i * BATCH_SIZE + n},
+                "name": "purchased",
+                "attributes": {"price": 23.45},
+            }
+            for n in range(BATCH_SIZE)
+        ]
+    )
+
+
+def _send_email(client, i):
+    client.send_email(
+        SendEmailRequest(
+            transactional_message_id="3",
+            identifiers={"id": i},
+            to=f"customer-{i}@example.com",
+            message_data={"name": "Customer", "items": [{"sku": "a", "price": 23.45}] * 5},
+        )
+    )
+
+
+SCENARIOS = {
+    "track": (_track_client, _track),
+    "identify": (_track_client, _identify),
+    f"batch[{BATCH_SIZE}]": (_track_client, _batch),
+    "send_email": (_api_client, _send_email),
+}
+
+
+def percentile(samples, fraction):
+    """Returns the sample at `fraction` of the way through `samples` (nearest-rank)."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _timed_calls(call, client, indices):
+    latencies = []
+    for i in indices:
+        start = time.perf_counter()
+        call(client, i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _run_threads(call, client, operations, threads):
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        # customer ids cannot be blank, so number calls from 1
+        futures = [
+            executor.submit(_timed_calls, call, client, range(t + 1, operations + 1, threads))
+            for t in range(threads)
+        ]
+        return [latency for future in futures for latency in future.result()]
+
+
+def _measure_memory(call, client, operations):
+    """Returns peak traced memory in KiB and net allocated blocks per call."""
+    tracemalloc.start()
+    try:
+        blocks = sys.getallocatedblocks()
+        for i in range(1, operations + 1):
+            call(client, i)
+        retained = sys.getallocatedblocks() - blocks
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024, retained / operations
+
+
+def run_benchmark(server, scenario, mode, threads, operations, memory_operations=0):
+    """Runs one scenario and returns its measurements as a dict."""
+    build_client, call = SCENARIOS[scenario]
+    client = build_client(server, MODES[mode], threads)
+    try:
+        _run_threads(call, client, WARMUP_OPERATIONS, threads)
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        latencies = _run_threads(call, client, operations, threads)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        result = {
+            "scenario": scenario,
+            "mode": mode,
+            "threads": threads,
+            "operations": operations,
+            "ops_per_sec": operations / wall,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "cpu_us_per_op": cpu / operations * 1e6,
+            "peak_kib": None,
+            "blocks_per_op": None,
+        }
+        if memory_operations:
+            result["peak_kib"], result["blocks_per_op"] = _measure_memory(
+                call, client, memory_operations
+            )
+        return result
+    finally:
+        client.close()
+
+
+def _key(result):
+    return (result["scenario"], result["mode"], result["threads"])
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns a description of every result that regressed against `baseline`."""
+    previous = {_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+
+        checks = [
+            ("ops/sec", before["ops_per_sec"] / result["ops_per_sec"]),
+            ("p99", result["p99_ms"] / before["p99_ms"]),
+            ("cpu/op", result["cpu_us_per_op"] / before["cpu_us_per_op"]),
+        ]
+        for metric, slowdown in checks:
+            if slowdown > 1 + tolerance:
+                regressions.append(
+                    "{} {} threads={}: {} {:.0%} worse".format(*_key(result), metric, slowdown - 1)
+                )
+    return regressions
+
+
+def _format_row(result):
+    memory = "-"
+    if result["peak_kib"] is not None:
+        memory = "{:.0f} KiB, {:+.1f} blocks/op".format(result["peak_kib"], result["blocks_per_op"])
+    return "{:<12} {:<9} {:>7} {:>10.0f} {:>9.2f} {:>9.2f} {:>11.0f}   {}".format(
+        result["scenario"],
+        result["mode"],
+        result["threads"],
+        result["ops_per_sec"],
+        result["p50_ms"],
+        result["p99_ms"],
+        result["cpu_us_per_op"],
+        memory,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--operations", type=int, default=DEFAULT_OPERATIONS)
+    parser.add_argument(
+        "--threads",
+        default=",".join(str(t) for t in DEFAULT_THREADS),
+        help="comma separated thread counts",
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument(
+        "--memory-operations",
+        type=int,
+        default=DEFAULT_MEMORY_OPERATIONS,
+        help="calls traced for memory use in a separate pass, 0 to skip",
+    )
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--certfile", default="tests/server.pem")
+    args = parser.parse_args(argv)
+
+    # the stand-in server uses a self signed certificate
+    urllib3.disable_warnings()
+
+    print(
+        "{:<12} {:<9} {:>7} {:>10} {:>9} {:>9} {:>11}   {}".format(
+            "scenario", "mode", "threads", "ops/sec", "p50 ms", "p99 ms", "cpu us/op", "memory"
+        )
+    )
+    results = []
+    with StandInServer(args.certfile) as server:
+        for scenario in args.scenarios.split(","):
+            for mode in args.modes.split(","):
+                for threads in (int(t) for t in args.threads.split(",")):
+                    result = run_benchmark(
+                        server, scenario, mode, threads, args.operations, args.memory_operations
+                    )
+                    results.append(result)
+                    print(_format_row(result), flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Measures the memory use and `_to_dict` speed of the transactional request objects.
+
+Compares `SendEmailRequest` with the plain class it replaced, which kept its fields in a
+per-instance `__dict__` and looked each one up by name when building the payload. Run from
+the repository root:
+
+    python -m benchmarks.request_objects --count 100000
+"""
+
+import argparse
+import gc
+import timeit
+import tracemalloc
+
+from customerio.api import EMAIL_FIELD_MAP, SendEmailRequest
+
+DEFAULT_COUNT = 100000
+DEFAULT_REPEAT = 5
+
+
+class _DictSendEmailRequest:
+    """The previous `SendEmailRequest`, kept for comparison."""
+
+    def __init__(self, **fields):
+        for field in EMAIL_FIELD_MAP:
+            setattr(self, field, fields.get(field))
+
+    def _to_dict(self):
+        return {
+            name: value
+            for field, name in EMAIL_FIELD_MAP.items()
+            if (value := getattr(self, field, None)) is not None
+        }
+
+
+def _fields(i):
+    return {
+        "transactional_message_id": "receipt",
+        "to": f"customer-{i}@example.com",
+        "identifiers": {"id": i},
+        "message_data": {"order_id": i},
+    }
+
+
+def _memory_per_request(cls, count):
+    """Returns the bytes allocated per request when holding `count` of them."""
+    fields = [_fields(i) for i in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        requests = [cls(**f) for f in fields]
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del requests
+    return (after - before) / count
+
+
+def _to_dict_us(cls, repeat):
+    request = cls(**_fields(1))
+    number = 100000
+    best = min(timeit.repeat(request._to_dict, number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--count", type=int, default=DEFAULT_COUNT)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args(argv)
+
+    print("{:<10} {:>14} {:>14}".format("class", "bytes/request", "_to_dict us"))
+    for name, cls in (("__dict__", _DictSendEmailRequest), ("__slots__", SendEmailRequest)):
+        memory = _memory_per_request(cls, args.count)
+        print(f"{name:<10} {memory:>14.0f} {_to_dict_us(cls, args.repeat):>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Measures the per-event cost of sanitizing wide event payloads.
+
+Compares the recursive sanitizer with the previous top-level-only `isinstance` checks, alone
+and followed by serialization. Run from the repository root:
+
+    python -m benchmarks.sanitize --widths 20,100,500
+"""
+
+import argparse
+import math
+import timeit
+from datetime import datetime, timezone
+
+from customerio.sanitizer import sanitize
+from customerio.serializers import dumps_stdlib
+
+DEFAULT_WIDTHS = (20, 100, 500)
+DEFAULT_REPEAT = 5
+
+
+def _top_level_sanitize(data):
+    """The sanitizer used before nested values were converted, kept for comparison."""
+
+    def sanitize_value(value):
+        if isinstance(value, datetime):
+            return int(value.replace(tzinfo=timezone.utc).timestamp())
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return value
+
+    return {key: sanitize_value(value) for key, value in data.items()}
+
+
+def wide_event(width):
+    """Builds event data with `width` attributes of the kinds commonly sent with events."""
+    data = {}
+    for i in range(width):
+        kind = i % 10
+        if kind < 4:
+            data[f"attr_{i}"] = f"value {i}"
+        elif kind < 6:
+            data[f"attr_{i}"] = i
+        elif kind == 6:
+            data[f"attr_{i}"] = i * 1.5
+        elif kind == 7:
+            data[f"attr_{i}"] = i % 2 == 0
+        elif kind == 8:
+            data[f"attr_{i}"] = datetime(2024, 1, 1, 12, 0, i % 60)
+        else:
+            data[f"attr_{i}"] = {"sku": f"sku-{i}", "price": 9.99, "tags": ["a", "b"]}
+    return data
+
+
+def _per_call_us(func, data, repeat):
+    number = max(1, 20000 // len(data))
+    best = min(timeit.repeat(lambda: func(data), number=number, repeat=repeat))
+    return best / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--widths",
+        default=",".join(str(w) for w in DEFAULT_WIDTHS),
+        help="comma separated numbers of attributes per event",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    args = parser.parse_args(argv)
+
+    cases = [
+        ("top-level", _top_level_sanitize),
+        ("recursive", sanitize),
+        ("top-level+json", lambda data: dumps_stdlib(_top_level_sanitize(data))),
+        ("recursive+json", lambda data: dumps_stdlib(sanitize(data))),
+    ]
+
+    print("{:<16} {:>7} {:>12}".format("sanitizer", "width", "us/event"))
+    for width in (int(w) for w in args.widths.split(",")):
+        data = wide_event(width)
+        for name, func in cases:
+            print(f"{name:<16} {width:>7} {_per_call_us(func, data, args.repeat):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
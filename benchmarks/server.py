@@ -0,0 +1,133 @@
+"""
+Implements a local TLS stand-in for the Customer.io APIs that answers every request with `{}`.
+
+The server runs in its own process so its CPU time is not counted against the client. It
+speaks HTTP/1.1, and HTTP/2 to clients that ask for it during the TLS handshake when the h2
+package is installed.
+"""
+
+import multiprocessing
+from contextlib import suppress
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tests.server import create_ssl_context
+
+RESPONSE_BODY = b"{}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Reads the request body and answers with an empty JSON object, keeping the connection open."""
+
+    protocol_version = "HTTP/1.1"
+    # send the response body without waiting for the client to acknowledge the headers
+    disable_nagle_algorithm = True
+
+    def _respond(self):
+        content_len = int(self.headers.get("content-length", 0))
+        if content_len:
+            self.rfile.read(content_len)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    do_POST = _respond
+    do_PUT = _respond
+    do_DELETE = _respond
+
+    def handle(self):
+        if self.request.selected_alpn_protocol() == "h2":
+            _serve_http2(self.request)
+        else:
+            super().handle()
+
+    def log_message(self, format, *args):
+        return
+
+
+def _serve_http2(sock):
+    """Answers every request on an HTTP/2 connection, multiplexed as streams, with `{}`."""
+    from h2.config import H2Configuration
+    from h2.connection import H2Connection
+    from h2.events import ConnectionTerminated, DataReceived, StreamEnded
+
+    conn = H2Connection(config=H2Configuration(client_side=False))
+    conn.initiate_connection()
+    sock.sendall(conn.data_to_send())
+    response_headers = [
+        (":status", "200"),
+        ("content-type", "application/json"),
+        ("content-length", str(len(RESPONSE_BODY))),
+    ]
+
+    while True:
+        try:
+            data = sock.recv(65535)
+        except OSError:
+            return
+        if not data:
+            return
+
+        for event in conn.receive_data(data):
+            if isinstance(event, DataReceived):
+                conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, StreamEnded):
+                conn.send_headers(event.stream_id, response_headers)
+                conn.send_data(event.stream_id, RESPONSE_BODY, end_stream=True)
+            elif isinstance(event, ConnectionTerminated):
+                sock.sendall(conn.data_to_send())
+                return
+        sock.sendall(conn.data_to_send())
+
+
+def _serve(certfile, port_sender):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    context = create_ssl_context()
+    context.load_cert_chain(certfile)
+    with suppress(ImportError):
+        import h2  # noqa: F401
+
+        context.set_alpn_protocols(["h2", "http/1.1"])
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    port_sender.send(server.server_address[1])
+    port_sender.close()
+    server.serve_forever()
+
+
+class StandInServer:
+    """Runs the stand-in server in a child process for the duration of a `with` block."""
+
+    def __init__(self, certfile="tests/server.pem"):
+        self.certfile = certfile
+        self.port = None
+        self._process = None
+
+    def start(self):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(
+            target=_serve, args=(self.certfile, sender), daemon=True
+        )
+        self._process.start()
+        sender.close()
+        self.port = receiver.recv()
+        receiver.close()
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    @property
+    def url(self):
+        return f"https://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -4,20 +4,41 @@ from customerio.api import (
     SendInAppRequest,
     SendInboxMessageRequest,
     SendPushRequest,
+    SendResult,
     SendSMSRequest,
 )
-from customerio.client_base import CustomerIOException
+from customerio.attachments import AttachmentCache
+from customerio.circuitbreaker import CircuitBreaker, CustomerIOCircuitOpenException
+from customerio.client_base import CustomerIOException, CustomerIOThrottledException
+from customerio.executor import CustomerIOBackpressureException
+from customerio.identify_cache import IdentifyCache
+from customerio.instrumentation import RequestEvent, RequestObserver
+from customerio.ratelimit import RateLimiter
 from customerio.regions import Regions
-from customerio.track import CustomerIO
+from customerio.spool import Spool
+from customerio.track import BatchChunkResult, CustomerIO, CustomerIOBatchException
 
 __all__ = [
     "APIClient",
+    "AttachmentCache",
+    "BatchChunkResult",
+    "CircuitBreaker",
     "CustomerIO",
+    "CustomerIOBackpressureException",
+    "CustomerIOBatchException",
+    "CustomerIOCircuitOpenException",
     "CustomerIOException",
+    "CustomerIOThrottledException",
+    "IdentifyCache",
+    "RateLimiter",
     "Regions",
+    "RequestEvent",
+    "RequestObserver",
     "SendEmailRequest",
     "SendInAppRequest",
     "SendInboxMessageRequest",
     "SendPushRequest",
+    "SendResult",
     "SendSMSRequest",
+    "Spool",
 ]
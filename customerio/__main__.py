@@ -0,0 +1,20 @@
+"""
+Command line tools, run with `python -m customerio <command>`.
+"""
+
+import argparse
+import sys
+
+from . import importer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m customerio", description=__doc__.strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer.add_parser(commands)
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
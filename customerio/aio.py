@@ -0,0 +1,355 @@
+"""
+Implements asyncio versions of the Track and App API clients on top of httpx.
+
+Install the optional dependency with `pip install customerio[async]`.
+"""
+
+import asyncio
+from collections import deque
+
+from .__version__ import __version__ as ClientVersion
+from .api import (
+    APIClient,
+    SendEmailRequest,
+    SendInAppRequest,
+    SendInboxMessageRequest,
+    SendPushRequest,
+    SendResult,
+    SendSMSRequest,
+)
+from .attachments import StreamingBody
+from .client_base import (
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_MAX_RETRY_AFTER,
+    THROTTLED_STATUS_CODE,
+    ClientBase,
+    CustomerIOException,
+    CustomerIOThrottledException,
+)
+from .constants import BATCH_MAX_OPERATION_SIZE, BATCH_MAX_REQUEST_SIZE
+from .regions import Regions
+from .track import BatchChunkResult, CustomerIO
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - exercised only without the extra installed
+    httpx = None
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 20
+
+
+class AsyncClientBase(ClientBase):
+    """Async counterpart of `ClientBase` sharing its sanitizing and retry configuration.
+
+    Requests go through a single pooled `httpx.AsyncClient`, so concurrent calls made with
+    `asyncio.gather` share at most `max_connections` connections.
+    """
+
+    max_connections = DEFAULT_MAX_CONNECTIONS
+    max_keepalive_connections = DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        if self._current_session is not None:
+            try:
+                await self._current_session.aclose()
+            finally:
+                self._current_session = None
+
+    async def send_request(self, method, url, data):
+        """Dispatches the request and returns a response."""
+        if self.rate_limiter is not None:
+            await asyncio.sleep(self.rate_limiter.reserve())
+
+        delay = self._check_throttle_wait()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        body, headers = self._prepare_body(data)
+        retry = self._build_retry()
+
+        while True:
+            try:
+                content = body.async_chunks() if isinstance(body, StreamingBody) else body
+                response = await self.http.request(method, url, content=content, headers=headers)
+            except httpx.HTTPError as e:
+                try:
+                    retry = retry.increment(method, url, error=e)
+                except Exception:
+                    raise CustomerIOException(self._retries_exhausted_message(e)) from e
+                await asyncio.sleep(retry.get_backoff_time())
+                continue
+
+            result_status = response.status_code
+            throttle_delay = None
+            if result_status == THROTTLED_STATUS_CODE:
+                throttle_delay = retry.throttle_delay(response.headers.get("Retry-After"))
+                self._on_throttle(throttle_delay)
+
+            has_retry_after = "Retry-After" in response.headers
+            if retry.is_retry(method, result_status, has_retry_after):
+                try:
+                    retry = retry.increment(method, url)
+                except Exception as e:
+                    message = self._retries_exhausted_message(e)
+                    if throttle_delay is not None:
+                        raise CustomerIOThrottledException(message, throttle_delay) from e
+                    raise CustomerIOException(message) from e
+
+                delay = self._retry_delay(retry, response)
+                if delay > self.max_retry_after:
+                    message = f"{result_status}: {url} asked to retry after {delay}s"
+                    if throttle_delay is not None:
+                        raise CustomerIOThrottledException(message, retry_after=delay)
+                    raise CustomerIOException(message)
+                await asyncio.sleep(delay)
+                continue
+
+            if throttle_delay is not None:
+                raise CustomerIOThrottledException(
+                    f"{result_status}: {url} {data} {response.text}", retry_after=throttle_delay
+                )
+            if result_status < 200 or result_status >= 300:
+                raise CustomerIOException(f"{result_status}: {url} {data} {response.text}")
+            return response
+
+    def _retry_delay(self, retry, response):
+        retry_after = response.headers.get("Retry-After")
+        if (
+            retry_after is not None
+            and retry.respect_retry_after_header
+            and response.status_code in retry.RETRY_AFTER_STATUS_CODES
+        ):
+            return retry.parse_retry_after(retry_after)
+        return retry.get_backoff_time()
+
+    def _build_session(self):
+        if httpx is None:
+            raise CustomerIOException(
+                "httpx is required for the async clients, install customerio[async]"
+            )
+
+        return httpx.AsyncClient(
+            transport=self._build_transport(),
+            headers={"User-Agent": f"Customer.io Python Client/{ClientVersion}"},
+            timeout=httpx.Timeout(self.timeout, pool=None),
+        )
+
+    def _build_transport(self):
+        from .transport import _tcp_keepalive_socket_options
+
+        return httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+            ),
+            socket_options=_tcp_keepalive_socket_options(),
+        )
+
+
+class AsyncCustomerIO(AsyncClientBase, CustomerIO):
+    """Async client for the Track API with the same methods as `CustomerIO`.
+
+    Every request method returns a coroutine, e.g. `await cio.identify(id="5", name="Bob")`.
+    """
+
+    def __init__(
+        self,
+        site_id=None,
+        api_key=None,
+        host=None,
+        region=Regions.US,
+        port=None,
+        url_prefix=None,
+        retries=3,
+        timeout=10,
+        backoff_factor=0.02,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        rate_limiter=None,
+        adaptive_throttling=False,
+        max_retry_after=DEFAULT_MAX_RETRY_AFTER,
+        serializer=None,
+        compression_threshold=None,
+        compression_level=DEFAULT_COMPRESSION_LEVEL,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        super().__init__(
+            site_id=site_id,
+            api_key=api_key,
+            host=host,
+            region=region,
+            port=port,
+            url_prefix=url_prefix,
+            retries=retries,
+            timeout=timeout,
+            backoff_factor=backoff_factor,
+            rate_limiter=rate_limiter,
+            adaptive_throttling=adaptive_throttling,
+            max_retry_after=max_retry_after,
+            serializer=serializer,
+            compression_threshold=compression_threshold,
+            compression_level=compression_level,
+        )
+
+    async def batch(
+        self,
+        operations,
+        concurrency=1,
+        max_request_size=BATCH_MAX_REQUEST_SIZE,
+        max_operation_size=BATCH_MAX_OPERATION_SIZE,
+    ):
+        """Send multiple operations, split into as many requests as the size limits require.
+
+        Behaves like `CustomerIO.batch`, with up to `concurrency` chunks in flight at once.
+        """
+        if not operations:
+            raise CustomerIOException("operations cannot be empty in batch")
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(chunk):
+            async with semaphore:
+                return await self._send_batch_chunk(chunk)
+
+        chunks = self._chunk_batch(operations, max_request_size, max_operation_size)
+        results = await asyncio.gather(*(send(chunk) for chunk in chunks))
+        return self._batch_results(list(results))
+
+    async def _send_batch_chunk(self, chunk):
+        start, count, body, error = chunk
+        size = len(body) if body is not None else 0
+        if error is not None:
+            return BatchChunkResult(start, count, size, None, error)
+
+        try:
+            response = await self.send_request("POST", self.batch_url, body)
+        except CustomerIOException as e:
+            return BatchChunkResult(start, count, size, None, e)
+        return BatchChunkResult(start, count, size, response, None)
+
+    def _build_session(self):
+        session = super()._build_session()
+        session.auth = (self.site_id, self.api_key)
+
+        return session
+
+
+class AsyncAPIClient(AsyncClientBase, APIClient):
+    """Async client for the App API with the same methods as `APIClient`.
+
+    `send_email_many`, `send_push_many` and `send_sms_many` return async iterators, used with
+    `async for result in client.send_email_many(requests)`.
+    """
+
+    def __init__(
+        self,
+        key,
+        url=None,
+        region=Regions.US,
+        retries=3,
+        timeout=10,
+        backoff_factor=0.02,
+        max_connections=DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+        rate_limiter=None,
+        adaptive_throttling=False,
+        max_retry_after=DEFAULT_MAX_RETRY_AFTER,
+        serializer=None,
+        compression_threshold=None,
+        compression_level=DEFAULT_COMPRESSION_LEVEL,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        super().__init__(
+            key,
+            url=url,
+            region=region,
+            retries=retries,
+            timeout=timeout,
+            backoff_factor=backoff_factor,
+            rate_limiter=rate_limiter,
+            adaptive_throttling=adaptive_throttling,
+            max_retry_after=max_retry_after,
+            serializer=serializer,
+            compression_threshold=compression_threshold,
+            compression_level=compression_level,
+        )
+
+    async def send_email(self, request):
+        if isinstance(request, SendEmailRequest):
+            request = request._to_dict()
+        resp = await self.send_request("POST", self.url + "/v1/send/email", request)
+        return resp.json()
+
+    async def send_push(self, request):
+        if isinstance(request, SendPushRequest):
+            request = request._to_dict()
+        resp = await self.send_request("POST", self.url + "/v1/send/push", request)
+        return resp.json()
+
+    async def send_sms(self, request):
+        if isinstance(request, SendSMSRequest):
+            request = request._to_dict()
+        resp = await self.send_request("POST", self.url + "/v1/send/sms", request)
+        return resp.json()
+
+    async def send_inbox_message(self, request):
+        if isinstance(request, SendInboxMessageRequest):
+            request = request._to_dict()
+        resp = await self.send_request("POST", self.url + "/v1/send/inbox_message", request)
+        return resp.json()
+
+    async def send_in_app(self, request):
+        if isinstance(request, SendInAppRequest):
+            request = request._to_dict()
+        resp = await self.send_request("POST", self.url + "/v1/send/in_app", request)
+        return resp.json()
+
+    async def _send_results(self, send, requests, concurrency, ordered):
+        pending = deque() if ordered else set()
+        try:
+            for index, request in enumerate(requests):
+                task = asyncio.ensure_future(self._send_one(send, index, request))
+                if ordered:
+                    pending.append(task)
+                    if len(pending) >= concurrency:
+                        yield await pending.popleft()
+                else:
+                    pending.add(task)
+                    if len(pending) >= concurrency:
+                        done, pending = await asyncio.wait(
+                            pending, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for finished in done:
+                            yield finished.result()
+
+            if ordered:
+                while pending:
+                    yield await pending.popleft()
+            else:
+                for next_result in asyncio.as_completed(pending):
+                    yield await next_result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _send_one(self, send, index, request):
+        try:
+            response = await send(request)
+        except (CustomerIOException, ValueError) as e:
+            return SendResult(index, request, None, e)
+        return SendResult(index, request, response, None)
+
+    def _build_session(self):
+        session = super()._build_session()
+        session.headers["Authorization"] = f"Bearer {self.key}"
+
+        return session
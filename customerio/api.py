@@ -3,19 +3,24 @@ Implements the client that interacts with Customer.io's App API using app keys.
 """
 
 import base64
-
-from .client_base import ClientBase, CustomerIOException
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, as_completed, wait
+
+from .attachments import Attachment, has_streamed_attachments, streaming_body
+from .client_base import (
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_FUTURES_WORKERS,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_RETRY_AFTER,
+    DEFAULT_POOLBLOCK,
+    DEFAULT_POOLSIZE,
+    JSON_HEADERS,
+    ClientBase,
+    CustomerIOException,
+)
+from .executor import chain, synchronous_thread_pool
 from .regions import Region, Regions
 
-
-def _payload_from_fields(source, field_map):
-    return {
-        name: value
-        for field, name in field_map.items()
-        if (value := getattr(source, field, None)) is not None
-    }
-
-
 COMMON_MESSAGE_FIELD_MAP = {
     "transactional_message_id": "transactional_message_id",
     "identifiers": "identifiers",
@@ -66,6 +71,42 @@ SMS_FIELD_MAP = COMMON_MESSAGE_FIELD_MAP | {
 INBOX_FIELD_MAP = COMMON_MESSAGE_FIELD_MAP
 IN_APP_FIELD_MAP = COMMON_MESSAGE_FIELD_MAP
 
+DEFAULT_SEND_CONCURRENCY = 8
+
+SendResult = namedtuple("SendResult", ["index", "request", "response", "error"])
+
+
+def _compile_to_dict(field_map):
+    """Generates a `_to_dict` reading each field, skipping those that are None or unset."""
+    lines = ["def _to_dict(self):", "    payload = {}"]
+    for field, name in field_map.items():
+        # subclasses with their own __init__ may leave fields unset
+        lines.append(f"    if (value := getattr(self, {field!r}, None)) is not None:")
+        lines.append(f"        payload[{name!r}] = value")
+    lines.append("    return payload")
+
+    namespace = {}
+    exec("\n".join(lines), namespace)
+    to_dict = namespace["_to_dict"]
+    to_dict.__doc__ = "Build a request payload from the object."
+    return to_dict
+
+
+class _Request:
+    """Base class of the transactional message requests.
+
+    Subclasses list their fields in `__slots__`, so instances have no `__dict__`, and pass
+    the map of fields to payload names as the `field_map` class keyword, from which their
+    `_to_dict` is generated. Subclasses that omit it inherit their parent's `_to_dict`.
+    """
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, field_map=None, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if field_map is not None:
+            cls._to_dict = _compile_to_dict(field_map)
+
 
 class APIClient(ClientBase):
     def __init__(
@@ -77,48 +118,148 @@ class APIClient(ClientBase):
         timeout=10,
         backoff_factor=0.02,
         use_connection_pooling=True,
+        pool_connections=DEFAULT_POOLSIZE,
+        pool_maxsize=DEFAULT_POOLSIZE,
+        pool_block=DEFAULT_POOLBLOCK,
+        rate_limiter=None,
+        adaptive_throttling=False,
+        max_retry_after=DEFAULT_MAX_RETRY_AFTER,
+        serializer=None,
+        compression_threshold=None,
+        compression_level=DEFAULT_COMPRESSION_LEVEL,
+        observers=None,
+        futures=False,
+        futures_workers=DEFAULT_FUTURES_WORKERS,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        backpressure="block",
+        circuit_breaker=None,
+        http2=False,
+        attachment_cache=None,
     ):
         if not isinstance(region, Region):
             raise CustomerIOException("invalid region provided")
 
         self.key = key
         self.url = url or f"https://{region.api_host}"
+        self.attachment_cache = attachment_cache
         super().__init__(
             retries=retries,
             timeout=timeout,
             backoff_factor=backoff_factor,
             use_connection_pooling=use_connection_pooling,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            rate_limiter=rate_limiter,
+            adaptive_throttling=adaptive_throttling,
+            max_retry_after=max_retry_after,
+            serializer=serializer,
+            compression_threshold=compression_threshold,
+            compression_level=compression_level,
+            observers=observers,
+            futures=futures,
+            futures_workers=futures_workers,
+            max_in_flight=max_in_flight,
+            backpressure=backpressure,
+            circuit_breaker=circuit_breaker,
+            http2=http2,
         )
 
     def send_email(self, request):
         if isinstance(request, SendEmailRequest):
             request = request._to_dict()
-        resp = self.send_request("POST", self.url + "/v1/send/email", request)
-        return resp.json()
+        return self._json(self.send_request("POST", self.url + "/v1/send/email", request))
 
     def send_push(self, request):
         if isinstance(request, SendPushRequest):
             request = request._to_dict()
-        resp = self.send_request("POST", self.url + "/v1/send/push", request)
-        return resp.json()
+        return self._json(self.send_request("POST", self.url + "/v1/send/push", request))
 
     def send_sms(self, request):
         if isinstance(request, SendSMSRequest):
             request = request._to_dict()
-        resp = self.send_request("POST", self.url + "/v1/send/sms", request)
-        return resp.json()
+        return self._json(self.send_request("POST", self.url + "/v1/send/sms", request))
+
+    def send_email_many(self, requests, concurrency=DEFAULT_SEND_CONCURRENCY, ordered=True):
+        """Sends every email request in `requests`, up to `concurrency` at a time.
+
+        See `_send_many` for how results are returned.
+        """
+        return self._send_many(self.send_email, requests, concurrency, ordered)
+
+    def send_push_many(self, requests, concurrency=DEFAULT_SEND_CONCURRENCY, ordered=True):
+        """Sends every push request in `requests`, up to `concurrency` at a time."""
+        return self._send_many(self.send_push, requests, concurrency, ordered)
+
+    def send_sms_many(self, requests, concurrency=DEFAULT_SEND_CONCURRENCY, ordered=True):
+        """Sends every SMS request in `requests`, up to `concurrency` at a time."""
+        return self._send_many(self.send_sms, requests, concurrency, ordered)
 
     def send_inbox_message(self, request):
         if isinstance(request, SendInboxMessageRequest):
             request = request._to_dict()
-        resp = self.send_request("POST", self.url + "/v1/send/inbox_message", request)
-        return resp.json()
+        return self._json(self.send_request("POST", self.url + "/v1/send/inbox_message", request))
 
     def send_in_app(self, request):
         if isinstance(request, SendInAppRequest):
             request = request._to_dict()
-        resp = self.send_request("POST", self.url + "/v1/send/in_app", request)
-        return resp.json()
+        return self._json(self.send_request("POST", self.url + "/v1/send/in_app", request))
+
+    def _send_many(self, send, requests, concurrency, ordered):
+        """Returns an iterator of `SendResult`, sending the requests as it is consumed.
+
+        Requests are read from the iterable lazily, with at most twice `concurrency` in
+        flight. Results come in the order of `requests` when `ordered` is true, otherwise as
+        soon as each request completes. A failed request does not stop the others; its
+        exception is in the result's `error`.
+        """
+        if concurrency < 1:
+            raise CustomerIOException("concurrency must be at least 1")
+        return self._send_results(send, requests, concurrency, ordered)
+
+    def _send_results(self, send, requests, concurrency, ordered):
+        max_in_flight = concurrency * 2
+        executor = synchronous_thread_pool(concurrency)
+        try:
+            if ordered:
+                pending = deque()
+                for index, request in enumerate(requests):
+                    pending.append(executor.submit(self._send_one, send, index, request))
+                    if len(pending) >= max_in_flight:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            else:
+                pending = set()
+                for index, request in enumerate(requests):
+                    pending.add(executor.submit(self._send_one, send, index, request))
+                    if len(pending) >= max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                for future in as_completed(pending):
+                    yield future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _send_one(self, send, index, request):
+        try:
+            response = send(request)
+        except (CustomerIOException, ValueError) as e:
+            return SendResult(index, request, None, e)
+        return SendResult(index, request, response, None)
+
+    def _json(self, response):
+        if isinstance(response, Future):
+            return chain(response, self._json)
+        return response.json()
+
+    def _prepare_body(self, data, trace=None):
+        # bodies with streamed attachments are produced while sending, and not compressed
+        if isinstance(data, dict) and has_streamed_attachments(data):
+            body = streaming_body(data, self._encode_body, self.attachment_cache)
+            return body, {**JSON_HEADERS, "Content-Length": str(len(body))}
+        return super()._prepare_body(data, trace)
 
     def _build_session(self):
         session = super()._build_session()
@@ -127,9 +268,11 @@ class APIClient(ClientBase):
         return session
 
 
-class SendEmailRequest:
+class SendEmailRequest(_Request, field_map=EMAIL_FIELD_MAP):
     """An object with all the options available for triggering a transactional email message."""
 
+    __slots__ = tuple(EMAIL_FIELD_MAP)
+
     def __init__(
         self,
         transactional_message_id=None,
@@ -179,14 +322,21 @@ class SendEmailRequest:
         self.language = language
 
     def attach(self, name, content, encode=True):
-        """Helper method to add base64-encoded attachments."""
+        """Helper method to add base64-encoded attachments.
+
+        `str` and `bytes` content is encoded straight away. A file path (`os.PathLike`), a
+        seekable binary file object, or a `memoryview`, `bytearray` or `mmap` is read and
+        encoded in chunks while the request is sent, so it is never held in memory whole.
+        """
         if not self.attachments:
             self.attachments = {}
 
         if name in self.attachments:
             raise CustomerIOException(f"attachment {name} already exists")
 
-        if encode:
+        if not isinstance(content, (str, bytes)):
+            content = Attachment(content, encode=encode)
+        elif encode:
             if isinstance(content, str):
                 content = base64.b64encode(content.encode("utf-8")).decode()
             else:
@@ -194,14 +344,12 @@ class SendEmailRequest:
 
         self.attachments[name] = content
 
-    def _to_dict(self):
-        """Build a request payload from the object."""
-        return _payload_from_fields(self, EMAIL_FIELD_MAP)
 
-
-class SendPushRequest:
+class SendPushRequest(_Request, field_map=PUSH_FIELD_MAP):
     """An object with all the options available for triggering a transactional push message."""
 
+    __slots__ = tuple(PUSH_FIELD_MAP)
+
     def __init__(
         self,
         transactional_message_id=None,
@@ -241,14 +389,12 @@ class SendPushRequest:
         self.device = device
         self.sound = sound
 
-    def _to_dict(self):
-        """Build a request payload from the object."""
-        return _payload_from_fields(self, PUSH_FIELD_MAP)
 
-
-class SendSMSRequest:
+class SendSMSRequest(_Request, field_map=SMS_FIELD_MAP):
     """An object with all the options available for triggering a transactional SMS message."""
 
+    __slots__ = tuple(SMS_FIELD_MAP)
+
     def __init__(
         self,
         transactional_message_id=None,
@@ -271,14 +417,12 @@ class SendSMSRequest:
         self.send_at = send_at
         self.language = language
 
-    def _to_dict(self):
-        """Build a request payload from the object."""
-        return _payload_from_fields(self, SMS_FIELD_MAP)
 
-
-class SendInboxMessageRequest:
+class SendInboxMessageRequest(_Request, field_map=INBOX_FIELD_MAP):
     """An object with all the options available for triggering a transactional inbox message."""
 
+    __slots__ = tuple(INBOX_FIELD_MAP)
+
     def __init__(
         self,
         transactional_message_id=None,
@@ -297,14 +441,12 @@ class SendInboxMessageRequest:
         self.send_at = send_at
         self.language = language
 
-    def _to_dict(self):
-        """Build a request payload from the object."""
-        return _payload_from_fields(self, INBOX_FIELD_MAP)
 
-
-class SendInAppRequest:
+class SendInAppRequest(_Request, field_map=IN_APP_FIELD_MAP):
     """An object with all the options available for triggering a transactional in-app message."""
 
+    __slots__ = tuple(IN_APP_FIELD_MAP)
+
     def __init__(
         self,
         transactional_message_id=None,
@@ -322,7 +464,3 @@ class SendInAppRequest:
         self.message_data = message_data
         self.send_at = send_at
         self.language = language
-
-    def _to_dict(self):
-        """Build a request payload from the object."""
-        return _payload_from_fields(self, IN_APP_FIELD_MAP)
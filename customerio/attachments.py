@@ -0,0 +1,267 @@
+"""
+Implements email attachments that are read and base64-encoded while the request is sent.
+
+An `Attachment` wraps a file path, a seekable binary file object or a buffer such as a
+`memoryview` or `mmap`. Payloads holding them are sent as a `StreamingBody`, which produces
+the JSON body in chunks of at most `CHUNK_SIZE` source bytes, so the memory used does not
+grow with the size of the attachments. An `AttachmentCache` keeps the encoded form of
+attachments that are sent repeatedly.
+"""
+
+import base64
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from .client_base import CustomerIOException
+
+# a multiple of 3, so the base64 of every chunk but the last has no padding
+CHUNK_SIZE = 3 * 64 * 1024
+
+DEFAULT_ATTACHMENT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+# File objects are read at each body's own position, one read at a time, so one file object can
+# be attached to requests sent concurrently.
+_source_locks = weakref.WeakKeyDictionary()
+_source_locks_lock = threading.Lock()
+_unreferenceable_sources_lock = threading.Lock()
+
+
+def _source_lock(source):
+    with _source_locks_lock:
+        try:
+            return _source_locks.setdefault(source, threading.Lock())
+        except TypeError:
+            return _unreferenceable_sources_lock
+
+
+def _is_buffer(source):
+    try:
+        memoryview(source).release()
+    except TypeError:
+        return False
+    return True
+
+
+class Attachment:
+    """An attachment read from `source` each time the request body is produced.
+
+    With `encode=False`, the source must already hold base64 text, which is sent as is.
+    """
+
+    __slots__ = ("source", "encode", "size", "_offset")
+
+    def __init__(self, source, encode=True):
+        self.encode = encode
+        self._offset = 0
+        if isinstance(source, os.PathLike):
+            self.size = os.path.getsize(source)
+        elif _is_buffer(source):
+            source = memoryview(source).cast("B")
+            self.size = source.nbytes
+        elif hasattr(source, "read"):
+            if not (hasattr(source, "seekable") and source.seekable()):
+                raise CustomerIOException("attachment file objects must be seekable")
+            with _source_lock(source):
+                self._offset = source.tell()
+                self.size = source.seek(0, os.SEEK_END) - self._offset
+                source.seek(self._offset)
+        else:
+            raise CustomerIOException(f"cannot attach {type(source).__name__}")
+        self.source = source
+
+    @property
+    def encoded_size(self):
+        """The number of bytes the attachment takes in the request body."""
+        if not self.encode:
+            return self.size
+        return (self.size + 2) // 3 * 4
+
+    def chunks(self):
+        """Yields the attachment as it appears in the request body, a chunk at a time."""
+        if isinstance(self.source, memoryview):
+            for start in range(0, self.size, CHUNK_SIZE):
+                chunk = self.source[start : start + CHUNK_SIZE]
+                yield base64.b64encode(chunk) if self.encode else bytes(chunk)
+        elif isinstance(self.source, os.PathLike):
+            with open(self.source, "rb") as f:
+                yield from self._read_chunks(f.read)
+        else:
+            yield from self._read_chunks(self._reader())
+
+    def cache_key(self):
+        """Returns the key of the attachment's encoded form in an `AttachmentCache`.
+
+        Paths are identified by their modification time and size, without reading them, and
+        other sources by a SHA-256 hash of their content. Returns None for a file that
+        changed size since it was attached.
+        """
+        if isinstance(self.source, os.PathLike):
+            stat = os.stat(self.source)
+            if stat.st_size != self.size:
+                return None
+            return ("path", os.fspath(self.source), stat.st_mtime_ns, self.size, self.encode)
+
+        digest = hashlib.sha256()
+        if isinstance(self.source, memoryview):
+            digest.update(self.source)
+        else:
+            read = self._reader()
+            remaining = self.size
+            while remaining > 0 and (data := read(min(CHUNK_SIZE, remaining))):
+                digest.update(data)
+                remaining -= len(data)
+        return ("sha256", digest.digest(), self.size, self.encode)
+
+    def _reader(self):
+        """Returns a function reading the file object source from the attachment's offset on."""
+        lock = _source_lock(self.source)
+        position = self._offset
+
+        def read(size):
+            nonlocal position
+            with lock:
+                self.source.seek(position)
+                data = self.source.read(size)
+            position += len(data)
+            return data
+
+        return read
+
+    def _read_chunks(self, read):
+        remaining = self.size
+        leftover = b""
+        while remaining > 0:
+            data = read(min(CHUNK_SIZE, remaining))
+            if not data:
+                raise CustomerIOException("attachment got shorter while it was being sent")
+            remaining -= len(data)
+            if not self.encode:
+                yield data
+                continue
+
+            # short reads are carried over so only the last chunk is padded
+            if leftover:
+                data = leftover + data
+            cut = len(data) - len(data) % 3
+            leftover = data[cut:]
+            if cut:
+                yield base64.b64encode(data[:cut])
+        if leftover:
+            yield base64.b64encode(leftover)
+
+
+class AttachmentCache:
+    """Keeps the encoded form of attachments sent by `APIClient`s, up to `max_bytes` in total.
+
+    Pass an instance to one or more clients with `attachment_cache`. Attachments are looked up
+    by `Attachment.cache_key`, and the least recently used are evicted to stay under
+    `max_bytes`. Attachments larger than `max_bytes` are streamed without being cached.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_ATTACHMENT_CACHE_BYTES):
+        if max_bytes < 1:
+            raise CustomerIOException("max_bytes must be at least 1")
+
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def encoded(self, attachment):
+        """Returns the attachment as it appears in the request body, or None if not cacheable."""
+        if attachment.encoded_size > self.max_bytes:
+            return None
+        key = attachment.cache_key()
+        if key is None:
+            return None
+
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return encoded
+            self.misses += 1
+
+        encoded = b"".join(attachment.chunks())
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = encoded
+                self.size += len(encoded)
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return encoded
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class StreamingBody:
+    """A request body made of byte strings and attachments, produced anew on every iteration.
+
+    Iterating again starts over from the beginning, so the body can be sent again on retries.
+    Its length is known up front, so it is sent with a `Content-Length` header.
+    """
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.length = sum(
+            part.encoded_size if isinstance(part, Attachment) else len(part) for part in parts
+        )
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, Attachment):
+                yield from part.chunks()
+            else:
+                yield part
+
+    async def async_chunks(self):
+        """Yields the same chunks as iterating, for asyncio transports."""
+        for chunk in self:
+            yield chunk
+
+
+def has_streamed_attachments(payload):
+    attachments = payload.get("attachments")
+    return isinstance(attachments, dict) and any(
+        isinstance(value, Attachment) for value in attachments.values()
+    )
+
+
+def streaming_body(payload, encode, cache=None):
+    """Returns a `StreamingBody` for a payload with `Attachment`s in its `attachments`.
+
+    `encode` serializes the rest of the payload, and each attachment name, to JSON bytes.
+    Attachments found in, or added to, `cache` are sent from their cached encoded form.
+    """
+    rest = {key: value for key, value in payload.items() if key != "attachments"}
+    head = bytes(encode(rest))
+    text = head[:-1] + (b", " if rest else b"") + b'"attachments": {'
+    parts = []
+    for index, (name, value) in enumerate(payload["attachments"].items()):
+        text += (b", " if index else b"") + bytes(encode(name)) + b": "
+        if not isinstance(value, Attachment):
+            text += bytes(encode(value))
+            continue
+
+        encoded = cache.encoded(value) if cache is not None else None
+        parts.extend([text + b'"', encoded if encoded is not None else value])
+        text = b'"'
+    parts.append(text + b"}}")
+    return StreamingBody(parts)
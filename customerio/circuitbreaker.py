@@ -0,0 +1,137 @@
+"""
+Implements a circuit breaker that fails requests fast while a host keeps failing.
+"""
+
+import logging
+import threading
+import time
+
+from .client_base import CustomerIOException
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+
+class CustomerIOCircuitOpenException(CustomerIOException):
+    """Raised without sending the request while the circuit for its host is open.
+
+    `retry_after` is the number of seconds until a trial request will be let through.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _HostCircuit:
+    __slots__ = ("state", "failures", "opened_at", "trials")
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trials = 0
+
+
+class CircuitBreaker:
+    """Tracks failing requests per host and stops sending to hosts that keep failing.
+
+    After `failure_threshold` consecutive requests to a host fail with a network error or
+    a 5xx response, the circuit for that host opens and requests to it raise
+    `CustomerIOCircuitOpenException` straight away. Once `reset_timeout` seconds have
+    passed, the circuit is half-open and lets up to `half_open_max_calls` trial requests
+    through: the circuit closes again if one succeeds, and reopens if one fails.
+
+    A single breaker can be passed to several clients with `circuit_breaker`, so that they
+    share what they learn about each host.
+    """
+
+    def __init__(
+        self,
+        failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout=DEFAULT_RESET_TIMEOUT,
+        half_open_max_calls=1,
+    ):
+        if failure_threshold < 1:
+            raise CustomerIOException("failure_threshold must be at least 1")
+        if reset_timeout <= 0:
+            raise CustomerIOException("reset_timeout must be greater than 0")
+        if half_open_max_calls < 1:
+            raise CustomerIOException("half_open_max_calls must be at least 1")
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._circuits = {}
+
+    def state(self, host):
+        """Returns `"closed"`, `"open"` or `"half-open"` for the host."""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                return CLOSED
+            if circuit.state == OPEN and self._cooled_down(circuit):
+                return HALF_OPEN
+            return circuit.state
+
+    def before_request(self, host):
+        """Raises `CustomerIOCircuitOpenException` if a request to the host may not be sent."""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.state == CLOSED:
+                return
+
+            if circuit.state == OPEN and self._cooled_down(circuit):
+                circuit.state = HALF_OPEN
+                circuit.trials = 0
+            if circuit.state == HALF_OPEN and circuit.trials < self.half_open_max_calls:
+                circuit.trials += 1
+                return
+
+            self.rejected += 1
+            retry_after = max(0.0, circuit.opened_at + self.reset_timeout - time.monotonic())
+
+        raise CustomerIOCircuitOpenException(
+            f"circuit for {host} is open after repeated failures", retry_after=retry_after
+        )
+
+    def cancel_request(self, host):
+        """Gives back the trial `before_request` let through for a request that was not sent."""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is not None and circuit.state == HALF_OPEN and circuit.trials > 0:
+                circuit.trials -= 1
+
+    def record_success(self, host):
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                return
+            if circuit.state != CLOSED:
+                logger.info("Closing circuit for %s", host)
+            circuit.state = CLOSED
+            circuit.failures = 0
+
+    def record_failure(self, host):
+        with self._lock:
+            circuit = self._circuits.setdefault(host, _HostCircuit())
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN or (
+                circuit.state == CLOSED and circuit.failures >= self.failure_threshold
+            ):
+                logger.warning(
+                    "Opening circuit for %s after %d consecutive failures", host, circuit.failures
+                )
+                circuit.state = OPEN
+                circuit.opened_at = time.monotonic()
+
+    def _cooled_down(self, circuit):
+        return time.monotonic() - circuit.opened_at >= self.reset_timeout
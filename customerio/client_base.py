@@ -2,60 +2,238 @@
 Implements the base client that is used by other classes to make requests.
 """
 
-import math
-import socket
-from datetime import datetime, timezone
-
-from requests import Session
-from requests.adapters import DEFAULT_POOLBLOCK, HTTPAdapter
-from urllib3.connection import HTTPConnection
-from urllib3.util.retry import Retry
+import gzip
+import logging
+import os
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
 
 from .__version__ import __version__ as ClientVersion
+from .instrumentation import RequestEvent
+from .sanitizer import datetime_to_timestamp, sanitize
+from .serializers import DEFAULT_SERIALIZER
+
+logger = logging.getLogger(__name__)
 
 TCP_KEEPALIVE_IDLE_TIMEOUT = 300
 TCP_KEEPALIVE_INTERVAL = 60
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+THROTTLED_STATUS_CODE = 429
+JSON_HEADERS = {"Content-Type": "application/json"}
+GZIP_JSON_HEADERS = {**JSON_HEADERS, "Content-Encoding": "gzip"}
+DEFAULT_COMPRESSION_LEVEL = 6
+# longest Retry-After or adaptive throttling pause a request waits for before raising
+DEFAULT_MAX_RETRY_AFTER = 60.0
+# the connection pool defaults of requests' HTTPAdapter
+DEFAULT_POOLSIZE = 10
+DEFAULT_POOLBLOCK = False
+DEFAULT_FUTURES_WORKERS = 10
+DEFAULT_MAX_IN_FLIGHT = 1000
+
+
+class ConnectionPoolStats:
+    """Counts how connections in a client's pool are opened, reused and discarded.
+
+    `opened` and `reused` count connections handed out for a request, depending on whether
+    a new socket has to be established. `discarded` counts open connections closed because
+    the pool was already full, which means `pool_maxsize` is too small for the concurrency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+        self.in_use = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "opened": self.opened,
+                "reused": self.reused,
+                "discarded": self.discarded,
+                "in_use": self.in_use,
+            }
+
+    def _checked_out(self, conn):
+        with self._lock:
+            if conn.sock is None:
+                self.opened += 1
+            else:
+                self.reused += 1
+            self.in_use += 1
+
+    def _returned(self, discarded):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+            if discarded:
+                self.discarded += 1
+
+
+class CompressionStats:
+    """Counts request bodies compressed with gzip and the bytes saved by doing so."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compressed_requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def bytes_saved(self):
+        return self.bytes_in - self.bytes_out
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "compressed_requests": self.compressed_requests,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+            }
+
+    def _record(self, bytes_in, bytes_out):
+        with self._lock:
+            self.compressed_requests += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+
+# the observed request being sent on each thread, read by the connection pools and retries
+_active_trace = threading.local()
+
+
+def _current_trace():
+    return getattr(_active_trace, "trace", None)
 
 
-def _tcp_keepalive_socket_options():
-    tcp_protocol = getattr(socket, "SOL_TCP", socket.IPPROTO_TCP)
-    tcp_keepidle = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+class _RequestTrace:
+    """Times the stages of one observed request and passes its event to the observers."""
 
-    options = list(HTTPConnection.default_socket_options)
-    keepalive_options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
-    if tcp_keepidle is not None:
-        keepalive_options.append((tcp_protocol, tcp_keepidle, TCP_KEEPALIVE_IDLE_TIMEOUT))
-    if hasattr(socket, "TCP_KEEPINTVL"):
-        keepalive_options.append((tcp_protocol, socket.TCP_KEEPINTVL, TCP_KEEPALIVE_INTERVAL))
+    def __init__(self, client, method, url):
+        self.client = client
+        self.event = RequestEvent(method, url, client._endpoint_template(url))
+        self.started_at = self._marked_at = time.perf_counter()
 
-    for option in keepalive_options:
-        if option not in options:
-            options.append(option)
+    def add(self, stage, seconds):
+        self.event.timings[stage] = self.event.timings.get(stage, 0.0) + seconds
 
-    return options
+    def mark(self, stage):
+        """Records the time since the previous mark as spent in `stage`."""
+        now = time.perf_counter()
+        self.add(stage, now - self._marked_at)
+        self._marked_at = now
 
+    def notify(self, hook):
+        self.client._notify_observers(hook, self.event)
 
-class TCPKeepAliveHTTPAdapter(HTTPAdapter):
-    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
-        pool_kwargs.setdefault("socket_options", _tcp_keepalive_socket_options())
-        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+    def retried(self, response, error):
+        self.event.status = response.status if response is not None else None
+        self.event.error = error
+        self.notify("on_retry")
 
-    def proxy_manager_for(self, proxy, **proxy_kwargs):
-        proxy_kwargs.setdefault("socket_options", _tcp_keepalive_socket_options())
-        return super().proxy_manager_for(proxy, **proxy_kwargs)
+    def responded(self, status):
+        self.event.status = status
+        self.event.error = None
+        self.event.timings["total"] = time.perf_counter() - self.started_at
+        self.notify("after_response")
+
+    def failed(self, error):
+        self.event.error = error
+        self.event.timings["total"] = time.perf_counter() - self.started_at
+        self.notify("on_error")
 
 
 class CustomerIOException(Exception):
     pass
 
 
+class CustomerIOThrottledException(CustomerIOException):
+    """Raised when requests are still throttled with 429 responses after all retries.
+
+    `retry_after` is the number of seconds the API asked clients to wait.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# Clients that have to reset their state in forked child processes, see `ClientBase._after_fork`.
+_clients = weakref.WeakSet()
+
+
+def _reset_clients_after_fork():
+    for client in list(_clients):
+        client._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_clients_after_fork)
+
+
 class ClientBase:
-    def __init__(self, retries=3, timeout=10, backoff_factor=0.02, use_connection_pooling=True):
+    def __init__(
+        self,
+        retries=3,
+        timeout=10,
+        backoff_factor=0.02,
+        use_connection_pooling=True,
+        pool_connections=DEFAULT_POOLSIZE,
+        pool_maxsize=DEFAULT_POOLSIZE,
+        pool_block=DEFAULT_POOLBLOCK,
+        rate_limiter=None,
+        adaptive_throttling=False,
+        max_retry_after=DEFAULT_MAX_RETRY_AFTER,
+        serializer=None,
+        compression_threshold=None,
+        compression_level=DEFAULT_COMPRESSION_LEVEL,
+        observers=None,
+        futures=False,
+        futures_workers=DEFAULT_FUTURES_WORKERS,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        backpressure="block",
+        circuit_breaker=None,
+        http2=False,
+    ):
         self.timeout = timeout
         self.retries = retries
         self.backoff_factor = backoff_factor
         self.use_connection_pooling = use_connection_pooling
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.http2 = http2
+        self.pool_stats = ConnectionPoolStats()
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.adaptive_throttling = adaptive_throttling
+        self.max_retry_after = max_retry_after
+        self.serializer = serializer or DEFAULT_SERIALIZER
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        self.compression_stats = CompressionStats()
+        self.observers = list(observers or ())
+        self.throttled_count = 0
+        self.last_retry_after = None
+        self._throttle_lock = threading.Lock()
+        self._throttled_until = 0.0
         self._current_session = None
+        self._session_lock = threading.Lock()
+        self._pid = os.getpid()
+        _clients.add(self)
+
+        self.request_executor = None
+        if futures:
+            from .executor import RequestExecutor
+
+            self.request_executor = RequestExecutor(
+                workers=futures_workers,
+                max_in_flight=max_in_flight,
+                backpressure=backpressure,
+            )
 
     def __enter__(self):
         return self
@@ -64,6 +242,8 @@ class ClientBase:
         self.close()
 
     def close(self):
+        if self.request_executor is not None:
+            self.request_executor.shutdown()
         if self._current_session is not None:
             try:
                 self._current_session.close()
@@ -72,32 +252,102 @@ class ClientBase:
 
     @property
     def http(self):
+        self._check_fork()
         if self._current_session is None:
-            self._current_session = self._build_session()
+            with self._session_lock:
+                if self._current_session is None:
+                    self._current_session = self._build_session()
 
         return self._current_session
 
     def send_request(self, method, url, data):
-        """Dispatches the request and returns a response."""
+        """Dispatches the request and returns a response.
+
+        `data` is either a payload dict, which is sanitized and serialized, or the
+        already-serialized JSON body as bytes.
+
+        In futures mode, returns a `Future` for the response and sends the request from the
+        client's `request_executor`.
+        """
+        self._check_fork()
+        executor = self.request_executor
+        if executor is not None and not executor.is_synchronous():
+            return executor.submit(self.send_request, method, url, data)
 
+        if not self.observers:
+            return self._send_request(method, url, data, None)
+
+        trace = _RequestTrace(self, method, url)
         try:
-            if self.use_connection_pooling:
-                response = self.http.request(
-                    method,
-                    url=url,
-                    json=self._sanitize(data),
-                    timeout=self.timeout,
-                )
-            else:
-                with self._build_session() as http:
-                    response = http.request(
+            return self._send_request(method, url, data, trace)
+        except CustomerIOException as e:
+            trace.failed(e)
+            raise
+
+    def _send_request(self, method, url, data, trace):
+        # The circuit is checked first, so requests fail fast while it is open instead of
+        # waiting for the rate limiter or throttling.
+        breaker = self.circuit_breaker
+        host = None
+        if breaker is not None:
+            host = urlsplit(url).netloc
+            breaker.before_request(host)
+
+        sent = False
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+                if trace is not None:
+                    trace.mark("rate_limit")
+
+            delay = self._check_throttle_wait()
+            if delay > 0:
+                time.sleep(delay)
+                if trace is not None:
+                    trace.mark("throttle")
+
+            body, headers = self._prepare_body(data, trace)
+            if trace is not None:
+                trace.event.payload_bytes = len(body)
+                trace.notify("before_send")
+                _active_trace.trace = trace
+
+            sent = True
+            try:
+                if self.use_connection_pooling:
+                    response = self.http.request(
                         method,
                         url=url,
-                        json=self._sanitize(data),
+                        data=body,
+                        headers=headers,
                         timeout=self.timeout,
                     )
+                else:
+                    with self._build_session() as http:
+                        response = http.request(
+                            method,
+                            url=url,
+                            data=body,
+                            headers=headers,
+                            timeout=self.timeout,
+                        )
+            finally:
+                _active_trace.trace = None
 
             result_status = response.status_code
+            if host is not None:
+                if result_status >= 500:
+                    breaker.record_failure(host)
+                else:
+                    breaker.record_success(host)
+            if trace is not None:
+                trace.responded(result_status)
+            if result_status == THROTTLED_STATUS_CODE:
+                delay = self._build_retry().throttle_delay(response.headers.get("Retry-After"))
+                self._on_throttle(delay)
+                raise CustomerIOThrottledException(
+                    f"{result_status}: {url} {data} {response.text}", retry_after=delay
+                )
             if result_status < 200 or result_status >= 300:
                 raise CustomerIOException(f"{result_status}: {url} {data} {response.text}")
             return response
@@ -105,25 +355,118 @@ class ClientBase:
         except CustomerIOException:
             raise
         except Exception as e:
-            message = (
-                f"Failed to receive valid response after {self.retries} retries.\n"
-                f"Check system status at http://status.customer.io.\n"
-                f"Last caught exception -- {type(e)}: {e}"
+            from .transport import _ThrottledResponseError
+
+            reason = getattr(e.args[0], "reason", None) if e.args else None
+            throttled = isinstance(reason, _ThrottledResponseError)
+            if host is not None and sent:
+                if throttled:
+                    breaker.record_success(host)
+                else:
+                    breaker.record_failure(host)
+            if throttled:
+                raise CustomerIOThrottledException(
+                    self._retries_exhausted_message(e), retry_after=reason.retry_after
+                ) from e
+            raise CustomerIOException(self._retries_exhausted_message(e)) from e
+        finally:
+            if host is not None and not sent:
+                breaker.cancel_request(host)
+
+    def _check_fork(self):
+        # Catches forks made without running the at-fork handlers, as some servers do.
+        if self._pid != os.getpid():
+            self._after_fork()
+
+    def _after_fork(self):
+        """Resets the state a forked child process cannot share with its parent.
+
+        The parent's pooled connections are dropped without being closed, since closing them
+        could end the parent's connections too, and a new session is built on first use.
+        Background workers are restarted in the child when next needed.
+        """
+        self._pid = os.getpid()
+        self._current_session = None
+        self._session_lock = threading.Lock()
+        self._throttle_lock = threading.Lock()
+        self.pool_stats = ConnectionPoolStats()
+        if self.request_executor is not None:
+            self.request_executor._after_fork()
+
+    def _notify_observers(self, hook, event):
+        for observer in self.observers:
+            callback = getattr(observer, hook, None)
+            if callback is None:
+                continue
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("request observer %r failed in %s", observer, hook)
+
+    def _endpoint_template(self, url):
+        """Returns the path of `url`, used to group observed requests by endpoint."""
+        return urlsplit(url).path
+
+    def _on_throttle(self, delay):
+        with self._throttle_lock:
+            self.throttled_count += 1
+            self.last_retry_after = delay
+            if self.adaptive_throttling:
+                self._throttled_until = max(self._throttled_until, time.monotonic() + delay)
+
+    def _throttle_wait_time(self):
+        """Seconds left before requests may be sent again after a 429 in adaptive mode."""
+        return max(0.0, self._throttled_until - time.monotonic())
+
+    def _check_throttle_wait(self):
+        """Returns the seconds to wait before sending, raising if over `max_retry_after`."""
+        delay = self._throttle_wait_time()
+        if delay > self.max_retry_after:
+            raise CustomerIOThrottledException(
+                f"requests are paused for {delay:.1f}s after a {THROTTLED_STATUS_CODE} response",
+                retry_after=delay,
             )
-            raise CustomerIOException(message) from e
+        return delay
+
+    def _retries_exhausted_message(self, e):
+        return (
+            f"Failed to receive valid response after {self.retries} retries.\n"
+            f"Check system status at http://status.customer.io.\n"
+            f"Last caught exception -- {type(e)}: {e}"
+        )
+
+    def _prepare_body(self, data, trace=None):
+        """Returns the request body and headers, gzip-compressing bodies over the threshold."""
+        body = self._encode_body(data, trace)
+        if self.compression_threshold is None or len(body) < self.compression_threshold:
+            return body, JSON_HEADERS
+
+        compressed = gzip.compress(body, compresslevel=self.compression_level)
+        self.compression_stats._record(len(body), len(compressed))
+        if trace is not None:
+            trace.mark("compress")
+        return compressed, GZIP_JSON_HEADERS
+
+    def _encode_body(self, data, trace=None):
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return data
+        if trace is None:
+            return self.serializer(self._sanitize(data))
+
+        sanitized = self._sanitize(data)
+        trace.mark("sanitize")
+        body = self.serializer(sanitized)
+        trace.mark("serialize")
+        return body
 
     def _sanitize(self, data):
-        return {key: self._sanitize_value(value) for key, value in data.items()}
+        return sanitize(data)
 
     def _sanitize_value(self, value):
-        if isinstance(value, datetime):
-            return self._datetime_to_timestamp(value)
-        if isinstance(value, float) and math.isnan(value):
-            return None
-        return value
+        return sanitize(value)
 
     def _datetime_to_timestamp(self, dt):
-        return int(dt.replace(tzinfo=timezone.utc).timestamp())
+        return datetime_to_timestamp(dt)
 
     def _stringify_list(self, customer_ids):
         customer_string_ids = []
@@ -137,15 +480,52 @@ class ClientBase:
         return customer_string_ids
 
     def _build_session(self):
+        if self.http2:
+            from .http2 import HTTP2Session
+
+            session = HTTP2Session(retry=self._build_retry, max_connections=self.pool_maxsize)
+            session.headers["User-Agent"] = f"Customer.io Python Client/{ClientVersion}"
+            return session
+
+        # requests and urllib3 are only imported once a session is needed
+        from requests import Session
+
+        from .transport import TCPKeepAliveHTTPAdapter
+
         session = Session()
         session.headers["User-Agent"] = f"Customer.io Python Client/{ClientVersion}"
 
-        retry = Retry(
+        adapter = TCPKeepAliveHTTPAdapter(
+            max_retries=self._build_retry(),
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            stats=self.pool_stats,
+        )
+        session.mount("https://", adapter)
+
+        return session
+
+    def _build_retry(self):
+        from .transport import ThrottleAwareRetry
+
+        return ThrottleAwareRetry(
             total=self.retries,
             backoff_factor=self.backoff_factor,
             allowed_methods=None,
-            status_forcelist=[500, 502, 503, 504],
+            status_forcelist=list(RETRY_STATUS_CODES),
+            on_throttle=self._on_throttle,
+            max_retry_after=self.max_retry_after,
         )
-        session.mount("https://", TCPKeepAliveHTTPAdapter(max_retries=retry))
 
-        return session
+
+# Names that moved to the transport module, kept importable from here.
+_TRANSPORT_NAMES = {"TCPKeepAliveHTTPAdapter", "ThrottleAwareRetry"}
+
+
+def __getattr__(name):
+    if name in _TRANSPORT_NAMES:
+        from . import transport
+
+        return getattr(transport, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,160 @@
+"""
+Implements the coalescer that merges `identify` calls made for the same customer in a short window.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, wait
+
+from .client_base import CustomerIOException
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingIdentify:
+    __slots__ = ("customer_id", "attributes", "deadline", "future")
+
+    def __init__(self, customer_id, deadline):
+        self.customer_id = customer_id
+        self.attributes = {}
+        self.deadline = deadline
+        self.future = Future()
+
+
+def _copy_outcome(source, target):
+    error = source.exception()
+    if error is not None:
+        target.set_exception(error)
+    else:
+        target.set_result(source.result())
+
+
+class IdentifyCoalescer:
+    """Holds `identify` calls for `window` seconds, merging those made for the same customer.
+
+    Attributes from later calls overwrite those from earlier ones. Each customer's merged
+    attributes are passed to `send(customer_id, attributes)` from a background thread once
+    `window` seconds have passed since their first pending call, or straight away with
+    `flush()`. Calls that fail are logged; their error is also set on the pending future.
+    """
+
+    def __init__(self, send, window):
+        if window <= 0:
+            raise CustomerIOException("window must be greater than 0")
+
+        self.send = send
+        self.window = window
+        self._condition = threading.Condition()
+        # Customers are added in deadline order, so the first pending customer is due first.
+        self._pending = {}
+        self._sending = {}
+        self._thread = None
+        self._closed = False
+
+    def add(self, customer_id, attributes):
+        """Merges the attributes into the customer's pending identify and returns its future."""
+        key = str(customer_id)
+        with self._condition:
+            if self._closed:
+                raise CustomerIOException("cannot coalesce identifies on a closed client")
+
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = _PendingIdentify(customer_id, time.monotonic() + self.window)
+                self._pending[key] = entry
+                self._ensure_worker()
+                self._condition.notify()
+            entry.attributes.update(attributes)
+            return entry.future
+
+    def flush(self, customer_id=None):
+        """Sends the pending identify for one customer, or for all of them, and waits for it.
+
+        Identifies for the customer that are already being sent are waited for too, so
+        requests made after flushing reach Customer.io after them.
+        """
+        with self._condition:
+            if customer_id is None:
+                keys = list(self._pending)
+                sending = list(self._sending.values())
+            else:
+                key = str(customer_id)
+                keys = [key] if key in self._pending else []
+                sending = [self._sending[key]] if key in self._sending else []
+            entries = [self._start_sending(key) for key in keys]
+
+        wait([entry.future for entry in sending])
+        for entry in entries:
+            self._send(entry)
+        wait([entry.future for entry in entries])
+
+    def close(self):
+        """Sends every pending identify and stops the background thread."""
+        with self._condition:
+            self._closed = True
+            thread = self._thread
+            self._condition.notify()
+
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def _after_fork(self):
+        # Identifies pending before a fork are still sent by the parent, so the child drops them.
+        self._condition = threading.Condition()
+        self._pending = {}
+        self._sending = {}
+        self._thread = None
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="customerio-identify-coalescer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._pending:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+                key, entry = next(iter(self._pending.items()))
+                delay = entry.deadline - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                self._start_sending(key)
+
+            self._send(entry)
+
+    def _start_sending(self, key):
+        # Called with the condition held. The entry moves to `_sending` in the same step it
+        # leaves `_pending`, so a flush never misses an identify that is about to be sent.
+        entry = self._pending.pop(key)
+        self._sending[key] = entry
+        return entry
+
+    def _send(self, entry):
+        key = str(entry.customer_id)
+        entry.future.add_done_callback(lambda future: self._sent(key, entry))
+
+        try:
+            result = self.send(entry.customer_id, entry.attributes)
+        except Exception as e:
+            logger.error("Failed to send identify for customer %s: %s", entry.customer_id, e)
+            entry.future.set_exception(e)
+            return
+
+        if isinstance(result, Future):
+            result.add_done_callback(lambda source: _copy_outcome(source, entry.future))
+        else:
+            entry.future.set_result(result)
+
+    def _sent(self, key, entry):
+        with self._condition:
+            if self._sending.get(key) is entry:
+                del self._sending[key]
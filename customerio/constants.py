@@ -3,3 +3,8 @@
 ID = "id"
 EMAIL = "email"
 CIOID = "cio_id"
+
+## Batch endpoint limits, measured on the serialized JSON
+
+BATCH_MAX_REQUEST_SIZE = 500 * 1024
+BATCH_MAX_OPERATION_SIZE = 32 * 1024
@@ -0,0 +1,146 @@
+"""
+Implements a background dispatcher that buffers Track API operations and sends them in batches.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+from .client_base import CustomerIOException
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = object()
+_STOP = object()
+
+
+class BatchDispatcher:
+    """Buffers batch operations and sends them from a background thread.
+
+    Operations are flushed once `batch_size` of them are buffered, once `flush_interval`
+    seconds have passed since the first buffered operation, or when `flush()` is called.
+    """
+
+    def __init__(
+        self,
+        send,
+        batch_size=100,
+        flush_interval=1.0,
+        max_queue_size=10000,
+        on_error=None,
+    ):
+        if batch_size < 1:
+            raise CustomerIOException("batch_size must be at least 1")
+
+        self.send = send
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_error = on_error
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def put(self, operation):
+        """Queues a single operation, starting the worker thread if needed."""
+        # Checked under the lock, so operations are not queued after close() stopped the worker.
+        with self._lock:
+            if self._closed:
+                raise CustomerIOException("cannot queue operations on a closed dispatcher")
+
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait(operation)
+            except queue.Full:
+                raise CustomerIOException("batch queue is full") from None
+
+    def flush(self):
+        """Sends all queued operations and waits until they are processed.
+
+        Does nothing once the dispatcher is closed, as closing already drained the queue.
+        """
+        with self._lock:
+            if self._closed or self._thread is None or not self._thread.is_alive():
+                return
+            self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Drains the queue and stops the worker thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _after_fork(self):
+        # Operations queued before a fork are still sent by the parent, so the child drops them.
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_worker(self):
+        # called with the lock held
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="customerio-batch-dispatcher", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        buffer = []
+        deadline = None
+
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0, deadline - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._send(buffer)
+                buffer, deadline = [], None
+                continue
+
+            if item is _FLUSH or item is _STOP:
+                self._send(buffer)
+                buffer, deadline = [], None
+                self._queue.task_done()
+                if item is _STOP:
+                    return
+                continue
+
+            buffer.append(item)
+            if deadline is None and self.flush_interval is not None:
+                deadline = time.monotonic() + self.flush_interval
+            if len(buffer) >= self.batch_size:
+                self._send(buffer)
+                buffer, deadline = [], None
+
+    def _send(self, operations):
+        if not operations:
+            return
+
+        try:
+            self.send(operations)
+        except Exception as e:
+            self._handle_error(e, operations)
+        finally:
+            for _ in operations:
+                self._queue.task_done()
+
+    def _handle_error(self, error, operations):
+        if self.on_error is None:
+            logger.error("Failed to send batch of %d operations: %s", len(operations), error)
+            return
+
+        try:
+            self.on_error(error, operations)
+        except Exception:
+            logger.exception("Batch error handler raised")
@@ -0,0 +1,136 @@
+"""
+Implements the executor that sends requests in the background for clients in futures mode.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .client_base import DEFAULT_FUTURES_WORKERS, DEFAULT_MAX_IN_FLIGHT, CustomerIOException
+
+BACKPRESSURE_BLOCK = "block"
+BACKPRESSURE_DROP = "drop"
+BACKPRESSURE_RAISE = "raise"
+BACKPRESSURE_POLICIES = (BACKPRESSURE_BLOCK, BACKPRESSURE_DROP, BACKPRESSURE_RAISE)
+
+_thread_state = threading.local()
+
+
+def is_synchronous():
+    """Whether requests made on this thread should be sent right away instead of submitted."""
+    return getattr(_thread_state, "synchronous", False)
+
+
+def _mark_synchronous():
+    _thread_state.synchronous = True
+
+
+def synchronous_thread_pool(max_workers):
+    """Returns a thread pool whose threads send requests right away, even in futures mode."""
+    return ThreadPoolExecutor(max_workers=max_workers, initializer=_mark_synchronous)
+
+
+class CustomerIOBackpressureException(CustomerIOException):
+    """Raised, or set on the returned future, when too many requests are already in flight."""
+
+
+class RequestExecutor:
+    """Runs requests on `workers` threads with at most `max_in_flight` submitted at once.
+
+    When the limit is reached, `backpressure` decides what happens to new submissions:
+    `"block"` waits for a request to finish, `"drop"` returns a future failed with
+    `CustomerIOBackpressureException` and counts it in `dropped`, and `"raise"` raises
+    `CustomerIOBackpressureException` straight away.
+    """
+
+    def __init__(
+        self,
+        workers=DEFAULT_FUTURES_WORKERS,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        backpressure=BACKPRESSURE_BLOCK,
+    ):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise CustomerIOException(
+                f"backpressure must be one of {', '.join(BACKPRESSURE_POLICIES)}"
+            )
+        if max_in_flight < 1:
+            raise CustomerIOException("max_in_flight must be at least 1")
+
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.backpressure = backpressure
+        self.dropped = 0
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    is_synchronous = staticmethod(is_synchronous)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules `fn(*args, **kwargs)` and returns a `Future` for its result."""
+        if not self._slots.acquire(blocking=self.backpressure == BACKPRESSURE_BLOCK):
+            error = CustomerIOBackpressureException(
+                f"{self.max_in_flight} requests are already in flight"
+            )
+            if self.backpressure == BACKPRESSURE_RAISE:
+                raise error
+
+            with self._lock:
+                self.dropped += 1
+            future = Future()
+            future.set_exception(error)
+            return future
+
+        try:
+            future = self._ensure_executor().submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads, by default after the submitted requests have finished."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _after_fork(self):
+        # The parent's threads do not exist in a forked child, nor do its requests in flight.
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+
+    def _ensure_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="customerio-request",
+                    initializer=_mark_synchronous,
+                )
+            return self._executor
+
+    def _release(self, future):
+        self._slots.release()
+
+
+def completed(result):
+    """Returns a future already resolved with `result`."""
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def chain(future, fn):
+    """Returns a future resolved with `fn` applied to the result of `future`."""
+    chained = Future()
+
+    def _resolve(source):
+        try:
+            chained.set_result(fn(source.result()))
+        except BaseException as e:
+            chained.set_exception(e)
+
+    future.add_done_callback(_resolve)
+    return chained
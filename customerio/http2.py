@@ -0,0 +1,135 @@
+"""
+Implements the HTTP/2 transport used by clients created with `http2=True`.
+
+Concurrent requests are multiplexed over a few connections by httpx, with the same retry
+policy, timeouts and TCP keep-alive options as the default transport. It is imported when a
+client builds its first session. Install the optional dependencies with
+`pip install customerio[http2]`.
+"""
+
+import threading
+import time
+
+from urllib3.exceptions import MaxRetryError
+
+from .client_base import CustomerIOException, _current_trace
+from .transport import _tcp_keepalive_socket_options
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - exercised only without the extra installed
+    httpx = None
+
+
+class HTTP2RetryError(Exception):
+    """Raised with the `MaxRetryError` of a request that failed after all retries."""
+
+
+class _RetriedResponse:
+    """The parts of a urllib3 response that `Retry` reads, taken from an httpx response."""
+
+    def __init__(self, response):
+        self.status = response.status_code
+        self.headers = response.headers
+
+    def get_redirect_location(self):
+        return False
+
+
+class HTTP2Session:
+    """Sends requests with an HTTP/2 `httpx.Client` through the interface of `requests.Session`.
+
+    Only the parts the clients use are provided. `headers`, `auth`, `verify` and `trust_env`
+    take effect if set before the first request, which builds the underlying client. Each
+    request is retried with a fresh policy from `retry`, like the default transport.
+    """
+
+    def __init__(self, retry, max_connections):
+        if httpx is None:
+            raise CustomerIOException("httpx is required for http2, install customerio[http2]")
+
+        self.retry = retry
+        self.max_connections = max_connections
+        self.headers = {}
+        self.auth = None
+        self.verify = True
+        self.trust_env = True
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    def request(self, method, url, data=None, headers=None, timeout=None):
+        client = self._client or self._build_client()
+        retry = self.retry()
+
+        while True:
+            try:
+                response = self._send(client, method, url, data, headers, timeout)
+            except httpx.TransportError as e:
+                retry = self._increment(retry, method, url, error=e)
+                retry.sleep()
+                continue
+
+            if not retry.is_retry(method, response.status_code, "Retry-After" in response.headers):
+                return response
+
+            retried = _RetriedResponse(response)
+            retry = self._increment(retry, method, url, response=retried)
+            retry.sleep(retried)
+
+    def _send(self, client, method, url, data, headers, timeout):
+        trace = _current_trace()
+        if trace is None:
+            return client.request(method, url, content=data, headers=headers, timeout=timeout)
+
+        # streams share connections, so their time is not split into connect and server
+        trace.event.attempt += 1
+        started_at = time.perf_counter()
+        try:
+            return client.request(method, url, content=data, headers=headers, timeout=timeout)
+        finally:
+            trace.add("server", time.perf_counter() - started_at)
+
+    @staticmethod
+    def _increment(retry, method, url, **kwargs):
+        try:
+            return retry.increment(method, url, **kwargs)
+        except MaxRetryError as e:
+            # the clients look for the cause of a failure in the first argument, as requests sets it
+            raise HTTP2RetryError(e) from e
+
+    def _build_client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    transport=self._build_transport(),
+                    headers=self.headers,
+                    auth=self.auth,
+                    trust_env=self.trust_env,
+                )
+            return self._client
+
+    def _build_transport(self):
+        try:
+            return httpx.HTTPTransport(
+                http2=True,
+                verify=self.verify,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                socket_options=_tcp_keepalive_socket_options(),
+            )
+        except ImportError as e:
+            raise CustomerIOException("h2 is required for http2, install customerio[http2]") from e
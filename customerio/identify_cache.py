@@ -0,0 +1,115 @@
+"""
+Implements a cache of the attributes last sent for each customer, used to skip unchanged identifies.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from .client_base import CustomerIOException
+
+DEFAULT_IDENTIFY_CACHE_SIZE = 10000
+
+
+def _fingerprint(value):
+    """Returns a hash of the serialized value, or None when it cannot be serialized."""
+    try:
+        return hash(json.dumps(value, sort_keys=True, separators=(",", ":")))
+    except (TypeError, ValueError):
+        return None
+
+
+class IdentifyCache:
+    """Remembers a hash of each attribute last sent to `identify`, per customer id.
+
+    Pass an instance to `CustomerIO` with `identify_cache` to only send the attributes that
+    changed since the last successful `identify` for a customer, and skip the request when
+    none did. Up to `max_size` customers are kept, evicting the least recently used. With
+    `ttl`, a customer's attributes are sent in full again `ttl` seconds after they were last
+    sent in full, which bounds how long changes made outside the client can be overwritten.
+
+    `hits` counts identifies that were skipped, `partial_hits` those that sent only changed
+    attributes and `misses` those that sent every attribute.
+    """
+
+    def __init__(self, max_size=DEFAULT_IDENTIFY_CACHE_SIZE, ttl=None):
+        if max_size < 1:
+            raise CustomerIOException("max_size must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise CustomerIOException("ttl must be greater than 0")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # customer id -> (time the attributes were last sent in full, {name: fingerprint})
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def changes(self, customer_id, attributes):
+        """Returns the attributes to send and their fingerprints to `update` once sent.
+
+        The attributes are None when every attribute matches what was last sent.
+        """
+        fingerprints = {name: _fingerprint(value) for name, value in attributes.items()}
+        with self._lock:
+            entry = self._entry(str(customer_id))
+            if entry is None:
+                self.misses += 1
+                return attributes, fingerprints
+
+            sent = entry[1]
+            changed = {
+                name: value
+                for name, value in attributes.items()
+                if fingerprints[name] is None or sent.get(name) != fingerprints[name]
+            }
+            if not changed:
+                self.hits += 1
+                return None, None
+            self.partial_hits += 1
+
+        return changed, {name: fingerprints[name] for name in changed}
+
+    def update(self, customer_id, fingerprints):
+        """Records attributes returned by `changes` as sent."""
+        key = str(customer_id)
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None:
+                entry = (time.monotonic(), {})
+                self._entries[key] = entry
+                if len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+            sent = entry[1]
+            for name, fingerprint in fingerprints.items():
+                if fingerprint is None:
+                    sent.pop(name, None)
+                else:
+                    sent[name] = fingerprint
+
+    def invalidate(self, customer_id):
+        """Forgets what was sent for a customer, so their next identify sends every attribute."""
+        with self._lock:
+            self._entries.pop(str(customer_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.monotonic() - entry[0] >= self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
@@ -0,0 +1,256 @@
+"""
+Implements `python -m customerio import`, which streams NDJSON or CSV rows to the batch endpoint.
+
+Rows are read one at a time, mapped to batch operations and sent in groups of `batch_size` by a
+`CustomerIO` client in futures mode, whose `batch` splits each group into requests that stay
+under the endpoint's size limits. Reading waits while the client's `max_in_flight` groups are
+being sent, so memory use does not grow with the size of the input.
+"""
+
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import wait
+from contextlib import ExitStack
+
+from .client_base import CustomerIOException
+from .constants import ID
+from .regions import Regions
+from .track import CustomerIO, CustomerIOBatchException
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "csv")
+ACTIONS = ("identify", "event")
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+DEFAULT_IMPORT_WORKERS = 4
+DEFAULT_REPORT_INTERVAL = 1.0
+
+
+class Importer:
+    """Sends the rows of NDJSON or CSV files to Customer.io as batch operations.
+
+    NDJSON rows that have `type` and `action` keys are sent as they are. Other rows, and all
+    CSV rows, are mapped to `action` operations for the customer in the `id_column`:
+    `"identify"` sends the other columns as attributes, and `"event"` sends an event named
+    by the `name` column, with an optional `timestamp` column and the others as attributes.
+    Empty CSV cells are left out.
+
+    Rows that cannot be mapped are logged and counted in `skipped`. Operations that could not
+    be delivered are counted in `failed`, and written as NDJSON to `errors` if given, so that
+    file can be imported again. Progress is written to `report` every `report_interval`
+    seconds.
+    """
+
+    def __init__(
+        self,
+        client,
+        action="identify",
+        id_column=ID,
+        batch_size=DEFAULT_IMPORT_BATCH_SIZE,
+        errors=None,
+        report=None,
+        report_interval=DEFAULT_REPORT_INTERVAL,
+    ):
+        if client.request_executor is None:
+            raise CustomerIOException("the importer needs a client in futures mode")
+        if action not in ACTIONS:
+            raise CustomerIOException(f"action must be one of {', '.join(ACTIONS)}")
+        if batch_size < 1:
+            raise CustomerIOException("batch_size must be at least 1")
+
+        self.client = client
+        self.action = action
+        self.id_column = id_column
+        self.batch_size = batch_size
+        self.errors = errors
+        self.report = report
+        self.report_interval = report_interval
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._started_at = None
+        self._reported_at = None
+
+    @property
+    def rate(self):
+        """Operations sent or failed per second since the import started."""
+        elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0
+        return (self.sent + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    def run(self, f, format="ndjson"):
+        """Imports every row of the text file `f` and returns whether every row was delivered."""
+        self._started_at = self._reported_at = time.monotonic()
+        operations = []
+        for line, row in self._read_rows(f, format):
+            try:
+                operations.append(self._to_operation(row, csv_row=format == "csv"))
+            except (CustomerIOException, TypeError, ValueError) as e:
+                logger.warning("Skipping line %d: %s", line, e)
+                self.skipped += 1
+                continue
+
+            if len(operations) == self.batch_size:
+                self._submit(operations)
+                operations = []
+                self._report_progress()
+        if operations:
+            self._submit(operations)
+
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending)
+        self._write_report(
+            f"Imported {self.sent} operations in {time.monotonic() - self._started_at:.1f}s "
+            f"({self.rate:,.0f} ops/s), {self.failed} failed, {self.skipped} skipped"
+        )
+        return not self.failed and not self.skipped
+
+    def _read_rows(self, f, format):
+        if format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        if format != "ndjson":
+            raise CustomerIOException(f"format must be one of {', '.join(FORMATS)}")
+
+        for line, text in enumerate(f, 1):
+            if text.strip():
+                yield line, text
+
+    def _to_operation(self, row, csv_row=False):
+        if csv_row:
+            row = {key: value for key, value in row.items() if key is not None and value != ""}
+        else:
+            row = json.loads(row)
+            if not isinstance(row, dict):
+                raise CustomerIOException("rows must be JSON objects")
+            if "type" in row and "action" in row:
+                return row
+
+        customer_id = row.pop(self.id_column, None)
+        if customer_id in (None, ""):
+            raise CustomerIOException(f"missing {self.id_column!r}")
+        operation = {"type": "person", "action": self.action, "identifiers": {ID: customer_id}}
+        if self.action == "event":
+            operation["name"] = row.pop("name", None)
+            if not operation["name"]:
+                raise CustomerIOException("missing 'name'")
+            timestamp = row.pop("timestamp", None)
+            if timestamp is not None:
+                operation["timestamp"] = int(timestamp)
+        operation["attributes"] = row
+        return operation
+
+    def _submit(self, operations):
+        # blocks while the client has max_in_flight groups being sent
+        future = self.client.batch(operations)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(lambda f: self._done(operations, f))
+
+    def _done(self, operations, future):
+        error = future.exception()
+        undelivered = []
+        if isinstance(error, CustomerIOBatchException):
+            for result in error.results:
+                if result.error is not None:
+                    undelivered.extend(operations[result.start : result.start + result.count])
+        elif error is not None:
+            undelivered = operations
+        if error is not None:
+            logger.warning("Failed to send %d operations: %s", len(undelivered), error)
+
+        with self._lock:
+            self._pending.discard(future)
+            self.sent += len(operations) - len(undelivered)
+            self.failed += len(undelivered)
+            if self.errors is not None:
+                for operation in undelivered:
+                    self.errors.write(json.dumps(operation) + "\n")
+
+    def _report_progress(self):
+        now = time.monotonic()
+        if now - self._reported_at >= self.report_interval:
+            self._reported_at = now
+            self._write_report(
+                f"{self.sent} sent, {self.failed} failed, {self.skipped} skipped, "
+                f"{self.rate:,.0f} ops/s"
+            )
+
+    def _write_report(self, message):
+        if self.report is not None:
+            print(message, file=self.report, flush=True)
+
+
+def add_parser(commands):
+    parser = commands.add_parser(
+        "import",
+        help="import customers or events from an NDJSON or CSV file",
+        description=Importer.__doc__.split("\n\n")[0].strip(),
+    )
+    parser.add_argument("path", nargs="?", default="-", help="file to read, - for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to csv for .csv files")
+    parser.add_argument("--action", choices=ACTIONS, default="identify")
+    parser.add_argument("--id-column", default=ID)
+    parser.add_argument("--site-id", default=os.environ.get("CUSTOMERIO_SITE_ID"))
+    parser.add_argument("--api-key", default=os.environ.get("CUSTOMERIO_API_KEY"))
+    parser.add_argument("--region", choices=("us", "eu"), default="us")
+    parser.add_argument("--workers", type=int, default=DEFAULT_IMPORT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_IMPORT_BATCH_SIZE)
+    parser.add_argument("--errors", help="write undelivered operations to this NDJSON file")
+    parser.add_argument("--report-interval", type=float, default=DEFAULT_REPORT_INTERVAL)
+    parser.set_defaults(run=run, parser=parser)
+    return parser
+
+
+def run(args):
+    if not args.site_id or not args.api_key:
+        args.parser.error("--site-id and --api-key, or CUSTOMERIO_SITE_ID and CUSTOMERIO_API_KEY")
+    if args.workers < 1 or args.batch_size < 1:
+        args.parser.error("--workers and --batch-size must be at least 1")
+
+    logging.basicConfig(format="%(message)s")
+    # each retry would be logged, and the error of the last one is logged with the failure
+    logging.getLogger("urllib3").setLevel(logging.ERROR)
+
+    with ExitStack() as stack:
+        try:
+            if args.path == "-":
+                sys.stdin.reconfigure(encoding="utf-8", newline="")
+                f = sys.stdin
+            else:
+                f = stack.enter_context(open(args.path, encoding="utf-8", newline=""))
+            errors = stack.enter_context(open(args.errors, "w")) if args.errors else None
+        except OSError as e:
+            args.parser.error(f"{e.filename}: {e.strerror}")
+
+        client = stack.enter_context(
+            CustomerIO(
+                args.site_id,
+                args.api_key,
+                region=Regions.EU if args.region == "eu" else Regions.US,
+                pool_maxsize=args.workers,
+                futures=True,
+                futures_workers=args.workers,
+                max_in_flight=args.workers,
+            )
+        )
+        importer = Importer(
+            client,
+            action=args.action,
+            id_column=args.id_column,
+            batch_size=args.batch_size,
+            errors=errors,
+            report=sys.stderr,
+            report_interval=args.report_interval,
+        )
+        format = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+        return 0 if importer.run(f, format) else 1
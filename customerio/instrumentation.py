@@ -0,0 +1,65 @@
+"""
+Implements the observer interface for following requests through `ClientBase.send_request`.
+"""
+
+
+class RequestEvent:
+    """Describes one call to `send_request` as it progresses.
+
+    The same event is passed to every hook for a request, so `status`, `attempt`, `error`
+    and `timings` reflect the request at the time the hook is called. `endpoint` is the URL
+    path with customer and device ids replaced by placeholders, which makes it suitable for
+    grouping metrics. `payload_bytes` is the size of the body as sent, after compression.
+
+    `timings` maps stages to the seconds spent in them. Stages are only present once reached:
+
+    - `rate_limit`: waiting for a token from the client's `rate_limiter`
+    - `throttle`: pausing after a 429 response with `adaptive_throttling`
+    - `sanitize`, `serialize`, `compress`: turning the payload into the request body
+    - `connection_wait`: checking a connection out of the pool, summed over attempts
+    - `connect`: opening new connections, including the TLS handshake
+    - `server`: sending the request and waiting for the response headers
+    - `backoff`: sleeping between retries
+    - `total`: the whole call up to `after_response` or `on_error`
+    """
+
+    def __init__(self, method, url, endpoint):
+        self.method = method
+        self.url = url
+        self.endpoint = endpoint
+        self.payload_bytes = None
+        self.status = None
+        self.attempt = 0
+        self.error = None
+        self.timings = {}
+
+    def __repr__(self):
+        return (
+            f"RequestEvent(method={self.method!r}, endpoint={self.endpoint!r}, "
+            f"status={self.status!r}, attempt={self.attempt!r})"
+        )
+
+
+class RequestObserver:
+    """Base class for request observers passed to a client with `observers`.
+
+    Override the hooks you need; the default implementations do nothing. Hooks run on the
+    thread sending the request, so they should be quick. Exceptions raised by a hook are
+    logged and do not affect the request.
+    """
+
+    def before_send(self, event):
+        """Called once the body is ready, before the first attempt is made."""
+
+    def on_retry(self, event):
+        """Called when an attempt failed and will be retried.
+
+        `event.status` is the status of the failed attempt, or `None` and `event.error` is
+        set when no response was received.
+        """
+
+    def after_response(self, event):
+        """Called with the final response's `status`, including error statuses."""
+
+    def on_error(self, event):
+        """Called with the `CustomerIOException` that `send_request` raises, in `event.error`."""
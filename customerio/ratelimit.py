@@ -0,0 +1,51 @@
+"""
+Implements a token bucket rate limiter that can be shared between clients and threads.
+"""
+
+import threading
+import time
+
+from .client_base import CustomerIOException
+
+# Customer.io asks Track API integrations to stay at or below 100 requests per second.
+TRACK_API_RATE_LIMIT = 100
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per second with bursts of up to `burst` requests.
+
+    A single limiter can be passed to several clients to cap their combined traffic. Callers
+    are served in the order they ask for a token, each waiting until its token is available.
+    """
+
+    def __init__(self, rate=TRACK_API_RATE_LIMIT, burst=None):
+        if rate <= 0:
+            raise CustomerIOException("rate must be greater than 0")
+
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        if self.burst < 1:
+            raise CustomerIOException("burst must be at least 1")
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+
+    def reserve(self):
+        """Takes a token and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated_at
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+            self._tokens -= 1
+
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """Blocks until a token is available."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,106 @@
+"""
+Implements the sanitizer that turns payload values into types every JSON serializer accepts.
+
+Values are converted recursively through nested dicts, lists, tuples and sets:
+
+- `datetime` and `date` become Unix timestamps, treating them as UTC
+- NaN and infinite floats and `Decimal`s become `None`, other `Decimal`s become floats
+- `UUID`s become strings and sets become lists
+
+Converters are looked up by the value's exact type. Subclasses are resolved once through
+their MRO and cached, and types without a converter are left for the serializer. `Decimal`
+and `UUID` are matched by name, so their modules are not imported until the caller uses them.
+"""
+
+import math
+from datetime import date, datetime, timezone
+
+EPOCH = date(1970, 1, 1)
+
+
+def datetime_to_timestamp(dt):
+    return int(dt.replace(tzinfo=timezone.utc).timestamp())
+
+
+def date_to_timestamp(d):
+    return (d - EPOCH).days * 86400
+
+
+def _sanitize_float(value):
+    if math.isnan(value) or math.isinf(value):
+        return None
+    return value
+
+
+def _sanitize_decimal(value):
+    return _sanitize_float(float(value))
+
+
+def _sanitize_dict(data):
+    converters = _converters
+    result = {}
+    for key, value in data.items():
+        try:
+            convert = converters[type(value)]
+        except KeyError:
+            convert = _resolve_converter(type(value))
+        result[key] = value if convert is None else convert(value)
+    return result
+
+
+def _sanitize_sequence(values):
+    converters = _converters
+    result = []
+    for value in values:
+        try:
+            convert = converters[type(value)]
+        except KeyError:
+            convert = _resolve_converter(type(value))
+        result.append(value if convert is None else convert(value))
+    return result
+
+
+# A converter of None means values of that type are sent as they are.
+_converters = {
+    str: None,
+    int: None,
+    bool: None,
+    type(None): None,
+    float: _sanitize_float,
+    dict: _sanitize_dict,
+    list: _sanitize_sequence,
+    tuple: _sanitize_sequence,
+    set: _sanitize_sequence,
+    frozenset: _sanitize_sequence,
+    datetime: datetime_to_timestamp,
+    date: date_to_timestamp,
+}
+
+_converters_by_name = {
+    ("decimal", "Decimal"): _sanitize_decimal,
+    ("uuid", "UUID"): str,
+}
+
+
+def _resolve_converter(cls):
+    convert = None
+    for base in cls.__mro__:
+        if base in _converters:
+            convert = _converters[base]
+            break
+        name = (base.__module__, base.__qualname__)
+        if name in _converters_by_name:
+            convert = _converters_by_name[name]
+            break
+
+    _converters[cls] = convert
+    return convert
+
+
+def sanitize(value):
+    """Returns `value` with every nested value converted to a JSON-compatible type."""
+    try:
+        convert = _converters[type(value)]
+    except KeyError:
+        convert = _resolve_converter(type(value))
+    return value if convert is None else convert(value)
@@ -0,0 +1,26 @@
+"""
+Implements the JSON serializers that turn request payloads into body bytes.
+
+A serializer is any callable taking the sanitized payload and returning `bytes`.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson installed
+    orjson = None
+
+
+def dumps_stdlib(data, cls=None):
+    """Serializes with the standard library, producing the same bytes as `requests` does."""
+    return json.dumps(data, cls=cls, allow_nan=False).encode("utf-8")
+
+
+def dumps_orjson(data):
+    """Serializes with orjson, which is several times faster on large payloads."""
+    return orjson.dumps(data)
+
+
+DEFAULT_SERIALIZER = dumps_stdlib
+FAST_SERIALIZER = dumps_orjson if orjson is not None else dumps_stdlib
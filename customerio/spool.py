@@ -0,0 +1,239 @@
+"""
+Implements a durable on-disk spool for batch operations that could not be delivered.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from .client_base import CustomerIOException
+from .constants import ID
+from .track import BatchChunkResult, CustomerIOBatchException, _is_retryable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_REPLAY_BATCH_SIZE = 1000
+# Seconds after which a replay that stopped without finishing, e.g. because its process was
+# killed, may be taken over by another process.
+REPLAY_LEASE = 300.0
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS operations "
+    "(id INTEGER PRIMARY KEY AUTOINCREMENT, body BLOB NOT NULL, customer TEXT)",
+    "CREATE INDEX IF NOT EXISTS operations_customer ON operations (customer)",
+    # The stored size and the process replaying are shared by every process using the file.
+    "CREATE TABLE IF NOT EXISTS state "
+    "(id INTEGER PRIMARY KEY CHECK (id = 1), size INTEGER NOT NULL, replayer TEXT, "
+    "lease_until REAL)",
+    "INSERT OR IGNORE INTO state (id, size) "
+    "SELECT 1, COALESCE(SUM(LENGTH(body)), 0) FROM operations",
+    "CREATE TRIGGER IF NOT EXISTS operation_added AFTER INSERT ON operations "
+    "BEGIN UPDATE state SET size = size + LENGTH(NEW.body); END",
+    "CREATE TRIGGER IF NOT EXISTS operation_removed AFTER DELETE ON operations "
+    "BEGIN UPDATE state SET size = size - LENGTH(OLD.body); END",
+)
+
+
+def _dumps(operation):
+    return json.dumps(operation).encode("utf-8")
+
+
+def _customer_key(id_type, customer_id):
+    return f"{id_type}:{customer_id}"
+
+
+def _operation_customer(operation):
+    # Only operations on a single customer are keyed, so `discard` can find them.
+    identifiers = operation.get("identifiers")
+    if isinstance(identifiers, dict) and len(identifiers) == 1:
+        ((id_type, customer_id),) = identifiers.items()
+        return _customer_key(id_type, customer_id)
+    return None
+
+
+class Spool:
+    """Stores batch operations in a SQLite database until they are delivered.
+
+    Operations are replayed oldest first and only removed once the request sending them
+    succeeded, so each operation is delivered at least once. When the stored operations
+    exceed `max_bytes`, the oldest ones are dropped and counted in `dropped`. Operations
+    Customer.io rejects when replayed, with a 4xx response, are removed and counted in
+    `rejected`.
+
+    Several processes can use the same file, e.g. the workers of a pre-fork server: the
+    size is tracked in the database, and only one process replays at a time.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_SPOOL_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._connect()
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._connection.execute("SELECT COUNT(*) FROM operations").fetchone()
+        return count
+
+    @property
+    def size(self):
+        """Total size in bytes of the stored operations."""
+        with self._lock:
+            (size,) = self._connection.execute("SELECT size FROM state").fetchone()
+        return size
+
+    def append(self, operations, serializer=None):
+        """Durably stores operations, dropping the oldest ones if over `max_bytes`.
+
+        Operations are encoded to JSON bytes with `serializer`, or `json.dumps` if not given.
+        """
+        serialize = serializer or _dumps
+        rows = [(serialize(operation), _operation_customer(operation)) for operation in operations]
+        if not rows:
+            return
+
+        # Inserting takes the database's write lock, so the size read after it includes
+        # what other processes stored, and evicting is part of the same transaction.
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO operations (body, customer) VALUES (?, ?)", rows
+            )
+            (size,) = self._connection.execute("SELECT size FROM state").fetchone()
+            if size > self.max_bytes:
+                self._evict(size - self.max_bytes)
+
+    def discard(self, customer_id, id_type=ID):
+        """Removes the stored operations on a customer, e.g. one being deleted.
+
+        Returns the number of operations removed.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "DELETE FROM operations WHERE customer = ?",
+                (_customer_key(id_type, customer_id),),
+            )
+        return cursor.rowcount
+
+    def replay(self, send, batch_size=DEFAULT_REPLAY_BATCH_SIZE):
+        """Sends stored operations with `send` in batches, oldest first.
+
+        Stops at the first batch `send` raises for, raising its error. Of that batch, only
+        the operations that may be delivered later stay in the spool, along with the later
+        operations. Returns the number of operations delivered. If another thread or process
+        is already replaying, returns 0 straight away.
+        """
+        if not self._replay_lock.acquire(blocking=False):
+            return 0
+
+        delivered = 0
+        try:
+            while True:
+                # renewed for every batch, so a long replay keeps other processes out
+                if not self._take_replay_lease():
+                    return delivered
+
+                with self._lock:
+                    rows = self._connection.execute(
+                        "SELECT id, body FROM operations ORDER BY id LIMIT ?", (batch_size,)
+                    ).fetchall()
+                if not rows:
+                    return delivered
+
+                try:
+                    send([json.loads(body) for _, body in rows])
+                except CustomerIOException as e:
+                    self._remove_undeliverable(e, rows)
+                    raise
+
+                self._delete(rows)
+                delivered += len(rows)
+        finally:
+            self._release_replay_lease()
+            self._replay_lock.release()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _connect(self):
+        # imported here, so the client can be imported on Python builds without sqlite3
+        import sqlite3
+
+        self._replayer = f"{os.getpid()}:{id(self)}"
+        try:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            with self._connection:
+                for statement in _SCHEMA:
+                    self._connection.execute(statement)
+        except sqlite3.Error as e:
+            raise CustomerIOException(f"cannot open spool at {self.path}: {e}") from e
+
+    def _after_fork(self):
+        # SQLite connections must not be used across a fork, and the parent's locks may have
+        # been held by its threads, so the child opens its own. The parent's connection is
+        # dropped without being closed, as that could release the parent's database locks.
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._connect()
+
+    def _remove_undeliverable(self, error, rows):
+        # Like the operations of failed batches, only those that failed retryably are kept.
+        if isinstance(error, CustomerIOBatchException):
+            results = error.results
+        else:
+            results = [BatchChunkResult(0, len(rows), None, None, error)]
+
+        removed, rejected = [], 0
+        for result in results:
+            if result.error is None or not _is_retryable(result.error):
+                removed.extend(rows[result.start : result.start + result.count])
+                if result.error is not None:
+                    rejected += result.count
+        if rejected:
+            logger.warning("Removing %d rejected operations from the spool: %s", rejected, error)
+
+        self._delete(removed)
+        with self._lock:
+            self.rejected += rejected
+
+    def _take_replay_lease(self):
+        now = time.time()
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "UPDATE state SET replayer = ?, lease_until = ? "
+                "WHERE replayer IS NULL OR replayer = ? OR lease_until < ?",
+                (self._replayer, now + REPLAY_LEASE, self._replayer, now),
+            )
+        return cursor.rowcount == 1
+
+    def _release_replay_lease(self):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE state SET replayer = NULL, lease_until = NULL WHERE replayer = ?",
+                (self._replayer,),
+            )
+
+    def _delete(self, rows):
+        # rows another process evicted in the meantime are already gone, which is fine
+        with self._lock, self._connection:
+            ids = [(row_id,) for row_id, _ in rows]
+            self._connection.executemany("DELETE FROM operations WHERE id = ?", ids)
+
+    def _evict(self, over):
+        cutoff, freed, count = None, 0, 0
+        for row_id, length in self._connection.execute(
+            "SELECT id, LENGTH(body) FROM operations ORDER BY id"
+        ):
+            cutoff, freed, count = row_id, freed + length, count + 1
+            if freed >= over:
+                break
+
+        self._connection.execute("DELETE FROM operations WHERE id <= ?", (cutoff,))
+        self.dropped += count
@@ -2,14 +2,102 @@
 Implements the client that interacts with Customer.io's Track API using Site ID and API Keys.
 """
 
-import warnings
+import atexit
+import logging
+import re
+import threading
+import weakref
+from collections import namedtuple
+from concurrent.futures import Future
 from datetime import datetime
+from functools import lru_cache, partial
 from urllib.parse import quote
 
-from customerio.constants import CIOID, EMAIL, ID
-
-from .client_base import ClientBase, CustomerIOException
+from customerio.constants import (
+    BATCH_MAX_OPERATION_SIZE,
+    BATCH_MAX_REQUEST_SIZE,
+    CIOID,
+    EMAIL,
+    ID,
+)
+
+from .circuitbreaker import CustomerIOCircuitOpenException
+from .client_base import (
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_FUTURES_WORKERS,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_RETRY_AFTER,
+    DEFAULT_POOLBLOCK,
+    DEFAULT_POOLSIZE,
+    ClientBase,
+    CustomerIOException,
+    CustomerIOThrottledException,
+)
+from .coalescer import IdentifyCoalescer
+from .dispatcher import BatchDispatcher
+from .executor import completed, synchronous_thread_pool
 from .regions import Region, Regions
+from .serializers import dumps_stdlib
+
+# Serialized operations are joined into the batch body without being encoded again.
+BATCH_PREFIX = b'{"batch": ['
+BATCH_SUFFIX = b"]}"
+BATCH_SEPARATOR = b", "
+BATCH_ENVELOPE_SIZE = len(BATCH_PREFIX) + len(BATCH_SUFFIX)
+
+DEFAULT_URL_CACHE_SIZE = 1024
+
+logger = logging.getLogger(__name__)
+
+_CUSTOMER_PATH_SEGMENT = re.compile(r"/customers/[^/]+")
+_DEVICE_PATH_SEGMENT = re.compile(r"/devices/[^/]+")
+
+BatchChunkResult = namedtuple("BatchChunkResult", ["start", "count", "size", "response", "error"])
+
+# Buffered clients that are still open, closed at exit by `_close_buffered_clients`.
+_buffered_clients = weakref.WeakSet()
+
+
+def _close_buffered_clients():
+    # The dispatcher thread is a daemon, so operations still queued at exit would be lost.
+    for client in list(_buffered_clients):
+        try:
+            client.close()
+        except Exception:
+            logger.exception("Failed to send buffered operations at exit")
+
+
+atexit.register(_close_buffered_clients)
+
+
+def _is_retryable(error):
+    """Whether sending again later may succeed: throttling, open circuit, network and 5xx errors."""
+    return (
+        isinstance(error, (CustomerIOThrottledException, CustomerIOCircuitOpenException))
+        or error.__cause__ is not None
+    )
+
+
+def _undelivered_operations(error, operations):
+    if not isinstance(error, CustomerIOBatchException):
+        return operations if _is_retryable(error) else []
+
+    undelivered = []
+    for result in error.results:
+        if result.error is not None and _is_retryable(result.error):
+            undelivered.extend(operations[result.start : result.start + result.count])
+    return undelivered
+
+
+class CustomerIOBatchException(CustomerIOException):
+    """Raised when one or more chunks of a batch could not be sent.
+
+    `results` holds a `BatchChunkResult` for every chunk, including the successful ones.
+    """
+
+    def __init__(self, message, results):
+        super().__init__(message)
+        self.results = results
 
 
 class CustomerIO(ClientBase):
@@ -26,9 +114,38 @@ class CustomerIO(ClientBase):
         timeout=10,
         backoff_factor=0.02,
         use_connection_pooling=True,
+        pool_connections=DEFAULT_POOLSIZE,
+        pool_maxsize=DEFAULT_POOLSIZE,
+        pool_block=DEFAULT_POOLBLOCK,
+        rate_limiter=None,
+        adaptive_throttling=False,
+        max_retry_after=DEFAULT_MAX_RETRY_AFTER,
+        serializer=None,
+        compression_threshold=None,
+        compression_level=DEFAULT_COMPRESSION_LEVEL,
+        observers=None,
+        futures=False,
+        futures_workers=DEFAULT_FUTURES_WORKERS,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        backpressure="block",
+        circuit_breaker=None,
+        http2=False,
+        buffered=False,
+        batch_size=100,
+        flush_interval=1.0,
+        max_queue_size=10000,
+        on_batch_error=None,
+        spool=None,
+        url_cache_size=DEFAULT_URL_CACHE_SIZE,
+        identify_cache=None,
+        identify_coalesce_window=None,
     ):
         if not isinstance(region, Region):
             raise CustomerIOException("invalid region provided")
+        if buffered and futures:
+            raise CustomerIOException("buffered and futures modes cannot be combined")
+        if spool is not None and not buffered:
+            raise CustomerIOException("spool can only be used in buffered mode")
 
         self.host = host or region.track_host
         self.port = port or 443
@@ -37,23 +154,152 @@ class CustomerIO(ClientBase):
         self.site_id = site_id
 
         if json_encoder is not None:
-            warnings.warn(
-                "With the switch to using requests library the `json_encoder` param is no longer used.",
-                DeprecationWarning,
-                stacklevel=2,
-            )
+            if serializer is not None:
+                raise CustomerIOException("pass either json_encoder or serializer, not both")
+            serializer = partial(dumps_stdlib, cls=json_encoder)
 
+        # Customer ids are mostly repeated, so their encoded paths are kept in an LRU cache.
+        self._customer_url = lru_cache(maxsize=url_cache_size, typed=True)(self._build_customer_url)
         self.setup_base_url()
         super().__init__(
             retries=retries,
             timeout=timeout,
             backoff_factor=backoff_factor,
             use_connection_pooling=use_connection_pooling,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            rate_limiter=rate_limiter,
+            adaptive_throttling=adaptive_throttling,
+            max_retry_after=max_retry_after,
+            serializer=serializer,
+            compression_threshold=compression_threshold,
+            compression_level=compression_level,
+            observers=observers,
+            futures=futures,
+            futures_workers=futures_workers,
+            max_in_flight=max_in_flight,
+            backpressure=backpressure,
+            circuit_breaker=circuit_breaker,
+            http2=http2,
         )
 
+        self.identify_cache = identify_cache
+        self.spool = spool
+        self._replay_lock = threading.Lock()
+        self._on_batch_error = on_batch_error
+        self._dispatcher = None
+        if buffered:
+            self._dispatcher = BatchDispatcher(
+                self._send_buffered,
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                max_queue_size=max_queue_size,
+                on_error=self._on_buffered_error if spool is not None else on_batch_error,
+            )
+            _buffered_clients.add(self)
+        self._coalescer = None
+        if identify_coalesce_window is not None:
+            self._coalescer = IdentifyCoalescer(self._send_identify, identify_coalesce_window)
+
+    def flush(self):
+        """Sends any operations buffered by `identify`, `track`, `pageview` and `add_device`."""
+        if self._coalescer is not None:
+            self._coalescer.flush()
+        if self._dispatcher is not None:
+            self._dispatcher.flush()
+
+    def replay_spool(self):
+        """Sends the operations stored in the spool and returns how many were delivered."""
+        if self.spool is None:
+            return 0
+        with self._replay_lock:
+            return self.spool.replay(self.batch)
+
+    def _send_buffered(self, operations):
+        # Spooled operations were queued before these, so they are sent first. While they
+        # cannot be, these are spooled behind them instead of overtaking them.
+        if self.spool is not None and not self._replay_spool_first():
+            self.spool.append(operations, serializer=self._serialize_operation)
+            return
+
+        try:
+            self.batch(operations)
+        except CustomerIOException:
+            self._forget_identified(operations)
+            raise
+
+    def _replay_spool_first(self):
+        """Replays the spool, waiting for a replay in progress, and returns whether it is empty."""
+        if not self.spool.size:
+            return True
+        try:
+            self.replay_spool()
+        except CustomerIOException as e:
+            logger.warning("Failed to replay spooled operations: %s", e)
+            return False
+        # another process may still be replaying them
+        return not self.spool.size
+
+    def _forget_identified(self, operations):
+        # Identifies are cached when queued, so ones that may not have been delivered are dropped.
+        if self.identify_cache is None:
+            return
+        for operation in operations:
+            if operation.get("action") == "identify":
+                self.identify_cache.invalidate(operation["identifiers"][ID])
+
+    def _on_buffered_error(self, error, operations):
+        undelivered = _undelivered_operations(error, operations)
+        try:
+            self.spool.append(undelivered, serializer=self._serialize_operation)
+        except Exception:
+            logger.exception("Failed to spool %d undelivered operations", len(undelivered))
+        if self._on_batch_error is not None:
+            self._on_batch_error(error, operations)
+
+    def close(self):
+        _buffered_clients.discard(self)
+        try:
+            if self._coalescer is not None:
+                self._coalescer.close()
+            if self._dispatcher is not None:
+                self._dispatcher.close()
+        finally:
+            super().close()
+
+    def _after_fork(self):
+        super()._after_fork()
+        self._replay_lock = threading.Lock()
+        if self._coalescer is not None:
+            self._coalescer._after_fork()
+        if self._dispatcher is not None:
+            self._dispatcher._after_fork()
+        if self.spool is not None:
+            self.spool._after_fork()
+
+    def _flush_pending(self, *customer_ids, deleted=()):
+        # Sends coalesced identifies, buffered and spooled operations before requests that must
+        # reach Customer.io after them. Spooled operations for the `(id_type, customer_id)`
+        # pairs in `deleted` are dropped, as replaying them would create the customers again.
+        if self._coalescer is not None:
+            for customer_id in customer_ids:
+                self._coalescer.flush(customer_id)
+        if self._dispatcher is not None:
+            self._dispatcher.flush()
+        if self.spool is not None:
+            for id_type, customer_id in deleted:
+                self.spool.discard(customer_id, id_type)
+            self._replay_spool_first()
+
     def _url_encode(self, id):
         return quote(str(id), safe="")
 
+    def _endpoint_template(self, url):
+        path = super()._endpoint_template(url)
+        path = _CUSTOMER_PATH_SEGMENT.sub("/customers/{customer_id}", path)
+        return _DEVICE_PATH_SEGMENT.sub("/devices/{device_id}", path)
+
     def setup_base_url(self):
         template = "https://{host}:{port}/{prefix}"
         if self.port == 443:
@@ -67,14 +313,25 @@ class CustomerIO(ClientBase):
             port=self.port,
             prefix=self.url_prefix.strip("/"),
         )
+        self.batch_url = template.format(
+            host=self.host.strip("/"), port=self.port, prefix="api/v2/batch"
+        )
+        self._customer_url.cache_clear()
+
+    def url_cache_info(self):
+        """Returns the hits, misses and size of the customer URL cache."""
+        return self._customer_url.cache_info()
+
+    def _build_customer_url(self, customer_id):
+        return f"{self.base_url}/customers/{self._url_encode(customer_id)}"
 
     def get_customer_query_string(self, customer_id):
         """Generates a customer API path."""
-        return f"{self.base_url}/customers/{self._url_encode(customer_id)}"
+        return self._customer_url(customer_id)
 
     def get_event_query_string(self, customer_id):
         """Generates an event API path."""
-        return f"{self.base_url}/customers/{self._url_encode(customer_id)}/events"
+        return self._customer_url(customer_id) + "/events"
 
     def get_events_query_string(self):
         """Returns the events API path."""
@@ -82,21 +339,63 @@ class CustomerIO(ClientBase):
 
     def get_device_query_string(self, customer_id):
         """Generates a device API path."""
-        return f"{self.base_url}/customers/{self._url_encode(customer_id)}/devices"
+        return self._customer_url(customer_id) + "/devices"
 
     def identify(self, id, **kwargs):
-        """Identify a single customer by their unique id, and optionally add attributes."""
+        """Identify a single customer by their unique id, and optionally add attributes.
+
+        With an `identify_cache`, only attributes that changed since the last identify for
+        the customer are sent, and nothing is sent when none did. With an
+        `identify_coalesce_window`, the call is merged with the customer's other identifies
+        made in the window and `None` is returned, or a `Future` in futures mode.
+        """
         if not id:
             raise CustomerIOException("id cannot be blank in identify")
+
+        if self._coalescer is not None:
+            self._check_fork()
+            future = self._coalescer.add(id, kwargs)
+            return future if self.request_executor is not None else None
+        return self._send_identify(id, kwargs)
+
+    def _send_identify(self, id, kwargs):
+        cache = self.identify_cache
+        fingerprints = None
+        if cache is not None:
+            kwargs, fingerprints = cache.changes(id, self._sanitize(kwargs))
+            if kwargs is None:
+                return completed(None) if self.request_executor is not None else None
+
+        if self._dispatcher is not None:
+            if fingerprints is not None:
+                cache.update(id, fingerprints)
+            try:
+                return self._enqueue("identify", id, attributes=self._sanitize(kwargs))
+            except CustomerIOException:
+                if fingerprints is not None:
+                    cache.invalidate(id)
+                raise
+
         url = self.get_customer_query_string(id)
-        return self.send_request("PUT", url, kwargs)
+        response = self.send_request("PUT", url, kwargs)
+        if fingerprints is not None:
+            if isinstance(response, Future):
+                response.add_done_callback(
+                    lambda f: f.exception() is None and cache.update(id, fingerprints)
+                )
+            else:
+                cache.update(id, fingerprints)
+        return response
 
     def track(self, customer_id, name, data=None, id=None, timestamp=None):
         """Track an event for a given customer_id."""
         if not customer_id:
             raise CustomerIOException("customer_id cannot be blank in track")
-        url = self.get_event_query_string(customer_id)
         post_data = self._build_event(name, data, id=id, timestamp=timestamp)
+        if self._dispatcher is not None:
+            post_data["attributes"] = post_data.pop("data")
+            return self._enqueue("event", customer_id, **post_data)
+        url = self.get_event_query_string(customer_id)
         return self.send_request("POST", url, post_data)
 
     def track_anonymous(self, anonymous_id, name, data=None, id=None, timestamp=None):
@@ -112,6 +411,8 @@ class CustomerIO(ClientBase):
         """Track a pageview for a given customer_id."""
         if not customer_id:
             raise CustomerIOException("customer_id cannot be blank in pageview")
+        if self._dispatcher is not None:
+            return self._enqueue("page", customer_id, name=page, attributes=self._sanitize(data))
         url = self.get_event_query_string(customer_id)
         post_data = {
             "type": "page",
@@ -164,11 +465,20 @@ class CustomerIO(ClientBase):
                 post_data["timestamp"] = timestamp
         return post_data
 
+    def _enqueue(self, action, customer_id, **fields):
+        operation = {"type": "person", "action": action, "identifiers": {ID: customer_id}}
+        operation.update(fields)
+        self._check_fork()
+        self._dispatcher.put(operation)
+
     def delete(self, customer_id):
         """Delete a customer profile."""
         if not customer_id:
             raise CustomerIOException("customer_id cannot be blank in delete")
 
+        self._flush_pending(customer_id, deleted=[(ID, customer_id)])
+        if self.identify_cache is not None:
+            self.identify_cache.invalidate(customer_id)
         url = self.get_customer_query_string(customer_id)
         return self.send_request("DELETE", url, {})
 
@@ -183,6 +493,14 @@ class CustomerIO(ClientBase):
         if not platform:
             raise CustomerIOException("platform cannot be blank in add_device")
 
+        if self._dispatcher is not None:
+            device = {"token": device_id, "platform": platform}
+            if "last_used" in data:
+                device["last_used"] = self._sanitize_value(data.pop("last_used"))
+            if data:
+                device["attributes"] = self._sanitize(data)
+            return self._enqueue("add_device", customer_id, device=device)
+
         data.update(
             {
                 "id": device_id,
@@ -201,6 +519,7 @@ class CustomerIO(ClientBase):
         if not device_id:
             raise CustomerIOException("device_id cannot be blank in delete_device")
 
+        self._flush_pending(customer_id)
         url = self.get_device_query_string(customer_id)
         delete_url = f"{url}/{self._url_encode(device_id)}"
         return self.send_request("DELETE", delete_url, {})
@@ -209,9 +528,10 @@ class CustomerIO(ClientBase):
         if not customer_id:
             raise CustomerIOException("customer_id cannot be blank in suppress")
 
+        self._flush_pending(customer_id)
         return self.send_request(
             "POST",
-            f"{self.base_url}/customers/{self._url_encode(customer_id)}/suppress",
+            self._customer_url(customer_id) + "/suppress",
             {},
         )
 
@@ -219,9 +539,10 @@ class CustomerIO(ClientBase):
         if not customer_id:
             raise CustomerIOException("customer_id cannot be blank in unsuppress")
 
+        self._flush_pending(customer_id)
         return self.send_request(
             "POST",
-            f"{self.base_url}/customers/{self._url_encode(customer_id)}/unsuppress",
+            self._customer_url(customer_id) + "/unsuppress",
             {},
         )
 
@@ -242,6 +563,11 @@ class CustomerIO(ClientBase):
         if not secondary_id:
             raise CustomerIOException("secondary customer_id cannot be blank")
 
+        # merging deletes the secondary customer
+        self._flush_pending(primary_id, secondary_id, deleted=[(secondary_id_type, secondary_id)])
+        if self.identify_cache is not None:
+            self.identify_cache.invalidate(primary_id)
+            self.identify_cache.invalidate(secondary_id)
         url = f"{self.base_url}/merge_customers"
         post_data = {
             "primary": {primary_id_type: primary_id},
@@ -249,20 +575,113 @@ class CustomerIO(ClientBase):
         }
         return self.send_request("POST", url, post_data)
 
-    def batch(self, operations):
-        """Send multiple operations in a single request.
+    def batch(
+        self,
+        operations,
+        concurrency=1,
+        max_request_size=BATCH_MAX_REQUEST_SIZE,
+        max_operation_size=BATCH_MAX_OPERATION_SIZE,
+    ):
+        """Send multiple operations, split into as many requests as the size limits require.
 
         Each operation is a dict with at minimum 'type' and 'action' keys.
         See https://customer.io/docs/api/track/#operation/batch
+
+        Returns a list of `BatchChunkResult`, one per request, ordered by the index of the
+        first operation in the chunk. Up to `concurrency` chunks are sent at the same time.
+        If any chunk fails, or an operation is larger than `max_operation_size`, the other
+        chunks are still sent and `CustomerIOBatchException` is raised afterwards.
+
+        In futures mode, returns a `Future` for the list of results.
         """
         if not operations:
             raise CustomerIOException("operations cannot be empty in batch")
 
-        if self.port == 443:
-            url = f"https://{self.host}/api/v2/batch"
+        executor = self.request_executor
+        if executor is not None and not executor.is_synchronous():
+            return executor.submit(
+                self.batch, operations, concurrency, max_request_size, max_operation_size
+            )
+
+        chunks = self._chunk_batch(operations, max_request_size, max_operation_size)
+        if concurrency > 1:
+            with synchronous_thread_pool(concurrency) as executor:
+                results = list(executor.map(self._send_batch_chunk, chunks))
         else:
-            url = f"https://{self.host}:{self.port}/api/v2/batch"
-        return self.send_request("POST", url, {"batch": operations})
+            results = [self._send_batch_chunk(chunk) for chunk in chunks]
+
+        return self._batch_results(results)
+
+    def _serialize_operation(self, operation):
+        return self.serializer(self._sanitize(operation))
+
+    def _chunk_batch(self, operations, max_request_size, max_operation_size):
+        """Yields `(start, count, body, error)` for each request-sized chunk.
+
+        Each operation is sanitized and serialized once; the chunk body is built from those bytes. Chunks
+        always cover consecutive operations, so `operations[start:start + count]` are the
+        operations in a chunk.
+        """
+        parts, start, size = [], 0, BATCH_ENVELOPE_SIZE
+
+        for index, operation in enumerate(operations):
+            part, error = None, None
+            try:
+                part = self._serialize_operation(operation)
+            except (TypeError, ValueError) as e:
+                error = CustomerIOException(f"operation {index}: {e}")
+            else:
+                if len(part) > max_operation_size:
+                    error = CustomerIOException(
+                        f"operation {index} is {len(part)} bytes, "
+                        f"over the {max_operation_size} byte limit"
+                    )
+
+            if parts and (
+                error is not None or size + len(BATCH_SEPARATOR) + len(part) > max_request_size
+            ):
+                yield start, len(parts), self._batch_body(parts), None
+                parts, size = [], BATCH_ENVELOPE_SIZE
+
+            if error is not None:
+                yield index, 1, part, error
+                continue
+
+            if parts:
+                size += len(BATCH_SEPARATOR)
+            else:
+                start = index
+            parts.append(part)
+            size += len(part)
+
+        if parts:
+            yield start, len(parts), self._batch_body(parts), None
+
+    def _batch_body(self, parts):
+        return BATCH_PREFIX + BATCH_SEPARATOR.join(parts) + BATCH_SUFFIX
+
+    def _send_batch_chunk(self, chunk):
+        start, count, body, error = chunk
+        size = len(body) if body is not None else 0
+        if error is not None:
+            return BatchChunkResult(start, count, size, None, error)
+
+        try:
+            response = self.send_request("POST", self.batch_url, body)
+        except CustomerIOException as e:
+            return BatchChunkResult(start, count, size, None, e)
+        return BatchChunkResult(start, count, size, response, None)
+
+    def _batch_results(self, results):
+        results.sort(key=lambda result: result.start)
+        failed = [result for result in results if result.error is not None]
+        if failed:
+            raise CustomerIOBatchException(
+                f"{len(failed)} of {len(results)} batch requests failed, "
+                f"first error: {failed[0].error}",
+                results,
+            )
+        return results
 
     def _build_session(self):
         session = super()._build_session()
@@ -0,0 +1,216 @@
+"""
+Implements the requests and urllib3 based transport used by the clients.
+
+It is imported when a client builds its first session, so `import customerio` does not load
+requests and urllib3.
+"""
+
+import socket
+import time
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import InvalidHeader, MaxRetryError, ResponseError
+from urllib3.poolmanager import PoolManager
+from urllib3.util.retry import Retry
+
+from .client_base import (
+    DEFAULT_POOLBLOCK,
+    TCP_KEEPALIVE_IDLE_TIMEOUT,
+    TCP_KEEPALIVE_INTERVAL,
+    THROTTLED_STATUS_CODE,
+    _current_trace,
+)
+
+
+def _tcp_keepalive_socket_options():
+    tcp_protocol = getattr(socket, "SOL_TCP", socket.IPPROTO_TCP)
+    tcp_keepidle = getattr(socket, "TCP_KEEPIDLE", getattr(socket, "TCP_KEEPALIVE", None))
+
+    options = list(HTTPConnection.default_socket_options)
+    keepalive_options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if tcp_keepidle is not None:
+        keepalive_options.append((tcp_protocol, tcp_keepidle, TCP_KEEPALIVE_IDLE_TIMEOUT))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        keepalive_options.append((tcp_protocol, socket.TCP_KEEPINTVL, TCP_KEEPALIVE_INTERVAL))
+
+    for option in keepalive_options:
+        if option not in options:
+            options.append(option)
+
+    return options
+
+
+class _StatsConnectionPoolMixin:
+    stats = None
+
+    def _get_conn(self, timeout=None):
+        started_at = time.perf_counter()
+        conn = super()._get_conn(timeout=timeout)
+        trace = _current_trace()
+        if trace is not None:
+            trace.add("connection_wait", time.perf_counter() - started_at)
+        if self.stats is not None:
+            self.stats._checked_out(conn)
+        return conn
+
+    def _validate_conn(self, conn):
+        trace = _current_trace()
+        if trace is None:
+            return super()._validate_conn(conn)
+
+        started_at = time.perf_counter()
+        try:
+            return super()._validate_conn(conn)
+        finally:
+            trace.add("connect", time.perf_counter() - started_at)
+
+    def _make_request(self, conn, *args, **kwargs):
+        trace = _current_trace()
+        if trace is None:
+            return super()._make_request(conn, *args, **kwargs)
+
+        trace.event.attempt += 1
+        connect_before = trace.event.timings.get("connect", 0.0)
+        started_at = time.perf_counter()
+        try:
+            return super()._make_request(conn, *args, **kwargs)
+        finally:
+            connect = trace.event.timings.get("connect", 0.0) - connect_before
+            trace.add("server", time.perf_counter() - started_at - connect)
+
+    def _put_conn(self, conn):
+        was_open = conn is not None and conn.sock is not None
+        try:
+            super()._put_conn(conn)
+        finally:
+            if self.stats is not None:
+                self.stats._returned(was_open and conn.sock is None)
+
+
+class _StatsHTTPConnectionPool(_StatsConnectionPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _StatsHTTPSConnectionPool(_StatsConnectionPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _StatsPoolManager(PoolManager):
+    def __init__(self, *args, stats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+        self.pool_classes_by_scheme = {
+            "http": _StatsHTTPConnectionPool,
+            "https": _StatsHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context=request_context)
+        pool.stats = self.stats
+        return pool
+
+
+class TCPKeepAliveHTTPAdapter(HTTPAdapter):
+    def __init__(self, *args, stats=None, **kwargs):
+        self.stats = stats
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=DEFAULT_POOLBLOCK, **pool_kwargs):
+        pool_kwargs.setdefault("socket_options", _tcp_keepalive_socket_options())
+
+        # save these values for pickling, as HTTPAdapter.init_poolmanager does
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+
+        self.poolmanager = _StatsPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            stats=getattr(self, "stats", None),
+            **pool_kwargs,
+        )
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs.setdefault("socket_options", _tcp_keepalive_socket_options())
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+
+class _ThrottledResponseError(ResponseError):
+    def __init__(self, retry_after):
+        super().__init__(f"too many {THROTTLED_STATUS_CODE} error responses")
+        self.retry_after = retry_after
+
+
+class ThrottleAwareRetry(Retry):
+    """Retry policy that reports every 429 response, and its delay, to `on_throttle`.
+
+    Responses asking to retry after more than `max_retry_after` seconds fail straight away
+    instead of holding up the caller for that long.
+    """
+
+    def __init__(self, *args, on_throttle=None, max_retry_after=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_throttle = on_throttle
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.on_throttle = self.on_throttle
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    def increment(
+        self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None
+    ):
+        if response is None or response.status != THROTTLED_STATUS_CODE:
+            retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        else:
+            delay = self.throttle_delay(response.headers.get("Retry-After"))
+            if self.on_throttle is not None:
+                self.on_throttle(delay)
+            if self._over_max_retry_after(delay):
+                raise MaxRetryError(_pool, url, _ThrottledResponseError(delay))
+
+            try:
+                retry = super().increment(method, url, response, error, _pool, _stacktrace)
+            except MaxRetryError as e:
+                raise MaxRetryError(_pool, url, _ThrottledResponseError(delay)) from e
+
+        trace = _current_trace()
+        if trace is not None:
+            trace.retried(response, error)
+        return retry
+
+    def sleep_for_retry(self, response):
+        retry_after = self.get_retry_after(response)
+        if retry_after is not None and self._over_max_retry_after(retry_after):
+            raise MaxRetryError(
+                None, None, ResponseError(f"Retry-After of {retry_after}s is too long to wait")
+            )
+        return super().sleep_for_retry(response)
+
+    def sleep(self, response=None):
+        trace = _current_trace()
+        if trace is None:
+            return super().sleep(response)
+
+        started_at = time.perf_counter()
+        try:
+            return super().sleep(response)
+        finally:
+            trace.add("backoff", time.perf_counter() - started_at)
+
+    def _over_max_retry_after(self, delay):
+        return self.max_retry_after is not None and delay > self.max_retry_after
+
+    def throttle_delay(self, retry_after):
+        """Seconds to hold off after a 429: its Retry-After, or the next backoff time."""
+        if retry_after is not None and self.respect_retry_after_header:
+            try:
+                return self.parse_retry_after(retry_after)
+            except InvalidHeader:
+                pass
+        return min(self.backoff_max, self.backoff_factor * (2 ** len(self.history)))
@@ -1,11 +1,15 @@
 import json
+import os
 import ssl
 import threading
 import time
 import unittest
+from collections import namedtuple
 from contextlib import suppress
 from http.server import BaseHTTPRequestHandler, HTTPServer
 
+from customerio.attachments import StreamingBody
+
 
 def create_ssl_context():
     """Create SSL context for Python 3.12+ compatibility"""
@@ -38,6 +42,13 @@ class Handler(BaseHTTPRequestHandler):
         self.end_headers()
 
     def do_POST(self):
+        if self.path.endswith("/throttled"):
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
         response_body = bytes("{}", "utf-8")
         self.send_response(200)
         self.send_header("Content-Type", "application/json")
@@ -101,3 +112,73 @@ class HTTPSTestCase(unittest.TestCase):
         cls.server.shutdown()
         cls.server.socket.close()
         cls.server_thread.join()
+
+
+FakeRequest = namedtuple("FakeRequest", ["method", "url", "data", "headers", "thread", "pid"])
+
+
+class FakeResponse:
+    """Response returned by `FakeSession`, with a JSON `body`."""
+
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.body = {} if body is None else body
+        self.text = json.dumps(self.body)
+        self.headers = {} if headers is None else headers
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Session that records requests instead of sending them, for a client's `_build_session`.
+
+    Each request is answered with the next of `outcomes`, a status code or an exception to
+    raise, or else with `status_code`, and with the body `respond(url)` returns if given.
+    Streamed bodies are read into bytes. Requests wait on `barrier` if given, and are only
+    counted, not recorded, when `record` is false.
+    """
+
+    def __init__(self, status_code=200, outcomes=(), respond=None, barrier=None, record=True):
+        self.status_code = status_code
+        self.outcomes = list(outcomes)
+        self.respond = respond
+        self.barrier = barrier
+        self.record = record
+        self.requests = []
+        self.count = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def bodies(self):
+        return [request.data for request in self.requests]
+
+    def batches(self):
+        """Returns the operations of each batch request."""
+        return [json.loads(request.data)["batch"] for request in self.requests]
+
+    def request(self, method, url, data=None, headers=None, **kwargs):
+        if isinstance(data, StreamingBody):
+            data = b"".join(data)
+        with self._lock:
+            self.count += 1
+            if self.record:
+                thread = threading.current_thread().name
+                self.requests.append(FakeRequest(method, url, data, headers, thread, os.getpid()))
+            outcome = self.outcomes.pop(0) if self.outcomes else self.status_code
+
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome, None if self.respond is None else self.respond(url))
+
+    def close(self):
+        self.closed = True
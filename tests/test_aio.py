@@ -0,0 +1,146 @@
+import asyncio
+import json
+import unittest
+
+from requests.auth import _basic_auth_str
+
+from customerio import CustomerIOException, CustomerIOThrottledException, SendEmailRequest
+
+try:
+    import httpx
+
+    from customerio.aio import AsyncAPIClient, AsyncCustomerIO
+except ImportError:  # pragma: no cover
+    httpx = None
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncCustomerIO(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = []
+        self.responses = []
+        self.cio = AsyncCustomerIO(site_id="siteid", api_key="apikey", backoff_factor=0)
+        self.cio._build_transport = lambda: httpx.MockTransport(self._handle)
+
+    async def asyncTearDown(self):
+        await self.cio.close()
+
+    def _handle(self, request):
+        self.requests.append(request)
+        if self.responses:
+            return self.responses.pop(0)
+        return httpx.Response(200, json={})
+
+    async def test_identify_call(self):
+        await self.cio.identify(id=1, name="john", email="john@test.com")
+
+        request = self.requests[0]
+        self.assertEqual(request.method, "PUT")
+        self.assertEqual(str(request.url), "https://track.customer.io/api/v1/customers/1")
+        self.assertEqual(json.loads(request.content), {"name": "john", "email": "john@test.com"})
+        self.assertEqual(request.headers["Authorization"], _basic_auth_str("siteid", "apikey"))
+        self.assertTrue(request.headers["User-Agent"].startswith("Customer.io Python Client/"))
+
+    async def test_track_and_batch_calls(self):
+        await self.cio.track(customer_id=1, name="sign_up", data={"email": "john@test.com"})
+        await self.cio.batch([{"type": "person", "action": "identify", "identifiers": {"id": 1}}])
+
+        self.assertTrue(str(self.requests[0].url).endswith("/customers/1/events"))
+        self.assertTrue(str(self.requests[1].url).endswith("/api/v2/batch"))
+
+    async def test_retries_server_errors(self):
+        self.responses = [httpx.Response(503), httpx.Response(502)]
+        response = await self.cio.identify(id=1, name="john")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_throttled_responses_are_retried(self):
+        self.cio.adaptive_throttling = True
+        self.responses = [httpx.Response(429, headers={"Retry-After": "0"})]
+        response = await self.cio.identify(id=1, name="john")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cio.throttled_count, 1)
+
+    async def test_long_retry_after_raises_instead_of_waiting(self):
+        self.responses = [httpx.Response(429, headers={"Retry-After": "3600"})]
+        with self.assertRaises(CustomerIOThrottledException) as ctx:
+            await self.cio.identify(id=1, name="john")
+
+        self.assertEqual(ctx.exception.retry_after, 3600)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_throttled_until_retries_are_exhausted(self):
+        self.responses = [httpx.Response(429)] * 4
+        with self.assertRaises(CustomerIOThrottledException):
+            await self.cio.identify(id=1, name="john")
+
+    async def test_raises_when_retries_are_exhausted(self):
+        self.responses = [httpx.Response(500)] * 4
+        with self.assertRaises(CustomerIOException) as ctx:
+            await self.cio.identify(id=1, name="john")
+
+        self.assertIn("after 3 retries", str(ctx.exception))
+        self.assertEqual(len(self.requests), 4)
+
+    async def test_client_errors_are_not_retried(self):
+        self.responses = [httpx.Response(400, text="bad request")]
+        with self.assertRaises(CustomerIOException) as ctx:
+            await self.cio.identify(id=1, name="john")
+
+        self.assertIn("400", str(ctx.exception))
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_concurrent_calls_share_one_client(self):
+        await asyncio.gather(*(self.cio.track(i, "event") for i in range(1, 51)))
+
+        self.assertEqual(len(self.requests), 50)
+        self.assertIsNotNone(self.cio._current_session)
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncAPIClient(unittest.IsolatedAsyncioTestCase):
+    async def test_send_email(self):
+        requests = []
+
+        def handle(request):
+            requests.append(request)
+            return httpx.Response(200, json={"delivery_id": "abc"})
+
+        async with AsyncAPIClient(key="app_api_key") as client:
+            client._build_transport = lambda: httpx.MockTransport(handle)
+            email = SendEmailRequest(identifiers={"id": "customer_1"}, transactional_message_id=100)
+            result = await client.send_email(email)
+
+        self.assertEqual(result, {"delivery_id": "abc"})
+        self.assertEqual(requests[0].headers["Authorization"], "Bearer app_api_key")
+        self.assertEqual(str(requests[0].url), "https://api.customer.io/v1/send/email")
+        self.assertEqual(
+            json.loads(requests[0].content),
+            {"identifiers": {"id": "customer_1"}, "transactional_message_id": 100},
+        )
+
+    async def test_send_email_many(self):
+        def handle(request):
+            customer_id = json.loads(request.content)["identifiers"]["id"]
+            if customer_id == 1:
+                return httpx.Response(400, json={"meta": {"error": "invalid"}})
+            return httpx.Response(200, json={"delivery_id": customer_id})
+
+        async with AsyncAPIClient(key="app_api_key") as client:
+            client._build_transport = lambda: httpx.MockTransport(handle)
+            emails = [
+                SendEmailRequest(identifiers={"id": i}, transactional_message_id=100)
+                for i in range(5)
+            ]
+            results = [result async for result in client.send_email_many(emails, concurrency=2)]
+
+        self.assertEqual([result.index for result in results], list(range(5)))
+        self.assertEqual(results[0].response, {"delivery_id": 0})
+        self.assertIsInstance(results[1].error, CustomerIOException)
+        self.assertEqual(sum(result.error is not None for result in results), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 import base64
 import json
+import threading
+import time
 import unittest
 from functools import partial
 
@@ -16,12 +18,143 @@ from customerio import (
     SendSMSRequest,
 )
 from customerio.__version__ import __version__ as ClientVersion
+from customerio.api import SendResult
 from tests.server import HTTPSTestCase
 
 # test uses a self signed certificate so disable the warning messages
 urllib3.disable_warnings()
 
 
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class TestAPIClientSendMany(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient(key="app_api_key")
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        def send_request(method, url, data):
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                # later requests finish first
+                time.sleep(0.01 * (5 - data["identifiers"]["id"] % 5))
+                if data["identifiers"]["id"] == 3:
+                    raise CustomerIOException("400: bad request")
+                return FakeResponse({"delivery_id": data["identifiers"]["id"]})
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+
+        self.client.send_request = send_request
+
+    def _requests(self, cls, count):
+        return (cls(identifiers={"id": i}, transactional_message_id=1) for i in range(count))
+
+    def test_results_are_returned_in_order_with_errors_collected(self):
+        results = list(self.client.send_push_many(self._requests(SendPushRequest, 10), 3))
+
+        self.assertEqual([result.index for result in results], list(range(10)))
+        self.assertIsInstance(results[0], SendResult)
+        self.assertEqual(results[0].response, {"delivery_id": 0})
+        self.assertIsInstance(results[3].error, CustomerIOException)
+        self.assertIsNone(results[3].response)
+        self.assertEqual(sum(result.error is not None for result in results), 1)
+        self.assertLessEqual(self.max_in_flight, 3)
+
+    def test_results_can_be_returned_as_completed(self):
+        results = list(
+            self.client.send_sms_many(self._requests(SendSMSRequest, 4), 4, ordered=False)
+        )
+
+        self.assertEqual(sorted(result.index for result in results), [0, 1, 2, 3])
+        self.assertNotEqual([result.index for result in results], [0, 1, 2, 3])
+
+    def test_requests_are_read_lazily(self):
+        consumed = []
+
+        def emails():
+            for i in range(100):
+                consumed.append(i)
+                yield SendEmailRequest(identifiers={"id": i}, transactional_message_id=1)
+
+        results = self.client.send_email_many(emails(), concurrency=2)
+        next(results)
+        results.close()
+
+        self.assertLess(len(consumed), 10)
+
+    def test_invalid_concurrency_raises(self):
+        with self.assertRaises(CustomerIOException):
+            self.client.send_email_many([], concurrency=0)
+
+
+class TestRequestObjects(unittest.TestCase):
+    def test_requests_have_no_instance_dict(self):
+        for cls in (
+            SendEmailRequest,
+            SendPushRequest,
+            SendSMSRequest,
+            SendInboxMessageRequest,
+            SendInAppRequest,
+        ):
+            request = cls(transactional_message_id=1)
+            self.assertFalse(hasattr(request, "__dict__"), cls)
+            with self.assertRaises(AttributeError):
+                request.unknown_field = 1
+
+    def test_to_dict_only_includes_set_fields(self):
+        request = SendPushRequest(
+            transactional_message_id=1, identifiers={"id": "1"}, device={"token": "abc"}
+        )
+        request.title = "Hello"
+        request.link = None
+
+        self.assertEqual(
+            request._to_dict(),
+            {
+                "transactional_message_id": 1,
+                "identifiers": {"id": "1"},
+                "title": "Hello",
+                "custom_device": {"token": "abc"},
+            },
+        )
+        self.assertEqual(
+            SendEmailRequest(_from="a@example.com")._to_dict(), {"from": "a@example.com"}
+        )
+
+    def test_plain_subclasses_keep_their_parents_fields(self):
+        class ReceiptEmail(SendEmailRequest):
+            def __init__(self, order_id, **kwargs):
+                super().__init__(transactional_message_id="receipt", **kwargs)
+                self.order_id = order_id
+
+        request = ReceiptEmail("o-1", to="a@example.com")
+        request.attach("receipt.txt", "thanks")
+
+        self.assertEqual(request.order_id, "o-1")
+        payload = request._to_dict()
+        self.assertEqual(payload["transactional_message_id"], "receipt")
+        self.assertEqual(payload["to"], "a@example.com")
+        self.assertIn("receipt.txt", payload["attachments"])
+        self.assertNotIn("order_id", payload)
+
+    def test_subclasses_may_leave_fields_unset(self):
+        class PlainEmail(SendEmailRequest):
+            def __init__(self, to):
+                self.to = to
+
+        self.assertEqual(PlainEmail("a@example.com")._to_dict(), {"to": "a@example.com"})
+
+
 class TestAPIClient(HTTPSTestCase):
     """Starts server which the client connects to in the following tests"""
 
@@ -47,6 +180,18 @@ class TestAPIClient(HTTPSTestCase):
             "url: {} expected suffix: {}".format(request.url, rq["url_suffix"]),
         )
 
+    def test_send_email_many(self):
+        emails = [
+            SendEmailRequest(identifiers={"id": str(i)}, transactional_message_id=1)
+            for i in range(5)
+        ]
+
+        results = list(self.client.send_email_many(emails, concurrency=2))
+
+        self.assertEqual([result.index for result in results], list(range(5)))
+        self.assertEqual([result.response for result in results], [{}] * 5)
+        self.assertTrue(all(result.error is None for result in results))
+
     def test_client_setup(self):
         client = APIClient(key="app_api_key")
         self.assertEqual(client.url, f"https://{Regions.US.api_host}")
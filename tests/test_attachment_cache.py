@@ -0,0 +1,107 @@
+import base64
+import io
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from customerio import APIClient, AttachmentCache, CustomerIOException, SendEmailRequest
+from customerio.attachments import Attachment
+from tests.server import FakeSession
+
+CONTENT = bytes(range(256)) * 1001
+
+
+class TestAttachmentCache(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name, "receipt.pdf")
+        self.path.write_bytes(CONTENT)
+
+        self.cache = AttachmentCache()
+        self.session = FakeSession()
+        self.client = APIClient(key="app_api_key", attachment_cache=self.cache)
+        self.client._build_session = lambda: self.session
+
+    def _send(self, source, name="receipt.pdf"):
+        request = SendEmailRequest(transactional_message_id=1, identifiers={"id": "1"})
+        request.attach(name, source)
+        self.client.send_email(request)
+        body = self.session.bodies[-1]
+        self.assertEqual(int(self.session.requests[-1].headers["Content-Length"]), len(body))
+        return json.loads(body)["attachments"][name]
+
+    def test_paths_are_read_once(self):
+        expected = base64.b64encode(CONTENT).decode()
+        self.assertEqual(self._send(self.path), expected)
+        with mock.patch.object(Attachment, "chunks", side_effect=AssertionError("read")):
+            self.assertEqual(self._send(self.path), expected)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.size, len(expected))
+
+    def test_modified_paths_are_encoded_again(self):
+        self._send(self.path)
+        self.path.write_bytes(CONTENT[::-1])
+        os.utime(self.path, ns=(0, 0))
+
+        self.assertEqual(base64.b64decode(self._send(self.path)), CONTENT[::-1])
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+    def test_other_sources_are_matched_by_content(self):
+        expected = base64.b64encode(CONTENT).decode()
+        self.assertEqual(self._send(memoryview(CONTENT)), expected)
+        self.assertEqual(self._send(bytearray(CONTENT)), expected)
+        self.assertEqual(self._send(io.BytesIO(CONTENT)), expected)
+        self.assertEqual(
+            self._send(memoryview(CONTENT[1:])), base64.b64encode(CONTENT[1:]).decode()
+        )
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+
+    def test_encode_is_part_of_the_key(self):
+        encoded = base64.b64encode(b"hello")
+        request = SendEmailRequest()
+        request.attach("a.txt", memoryview(encoded))
+        request.attach("b.txt", memoryview(encoded), encode=False)
+        self.client.send_email(request)
+
+        attachments = json.loads(self.session.bodies[-1])["attachments"]
+        self.assertEqual(attachments["b.txt"], encoded.decode())
+        self.assertEqual(base64.b64decode(attachments["a.txt"]), encoded)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_least_recently_used_are_evicted_by_size(self):
+        cache = AttachmentCache(max_bytes=100)
+        first, second, third = (Attachment(memoryview(bytes([i]) * 30)) for i in range(3))
+        cache.encoded(first)
+        cache.encoded(second)
+        cache.encoded(first)
+        cache.encoded(third)
+
+        self.assertEqual((len(cache), cache.size), (2, 80))
+        cache.encoded(first)
+        cache.encoded(second)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_large_attachments_are_streamed_without_caching(self):
+        self.cache.max_bytes = 100
+        self.assertEqual(self._send(memoryview(CONTENT)), base64.b64encode(CONTENT).decode())
+        self.assertEqual((len(self.cache), self.cache.misses), (0, 0))
+
+    def test_files_that_changed_size_are_not_cached(self):
+        request = SendEmailRequest()
+        request.attach("receipt.pdf", self.path)
+        self.path.write_bytes(CONTENT + b"more")
+
+        self.assertIsNone(self.cache.encoded(request.attachments["receipt.pdf"]))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalid_size_raises(self):
+        with self.assertRaises(CustomerIOException):
+            AttachmentCache(max_bytes=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,192 @@
+import base64
+import io
+import json
+import mmap
+import os
+import tempfile
+import tracemalloc
+import unittest
+from pathlib import Path
+
+import urllib3
+
+from benchmarks.server import StandInServer
+from customerio import APIClient, CustomerIOException, SendEmailRequest
+from customerio.attachments import CHUNK_SIZE
+from tests.server import FakeSession
+
+try:
+    import httpx
+
+    from customerio.aio import AsyncAPIClient
+except ImportError:  # pragma: no cover
+    httpx = None
+
+# the stand-in server uses a self signed certificate
+urllib3.disable_warnings()
+
+# not a multiple of the chunk size or of 3, so padding and carried over bytes are exercised
+CONTENT = bytes(range(256)) * 4001
+
+
+class TestStreamedAttachments(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "receipt.pdf")
+        with open(self.path, "wb") as f:
+            f.write(CONTENT)
+
+        self.session = FakeSession()
+        self.client = APIClient(key="app_api_key")
+        self.client._build_session = lambda: self.session
+
+    def _request(self):
+        return SendEmailRequest(transactional_message_id=1, identifiers={"id": "1"})
+
+    def _sent_payload(self, request):
+        self.client.send_email(request)
+        body = self.session.bodies[-1]
+        self.assertEqual(int(self.session.requests[-1].headers["Content-Length"]), len(body))
+        return json.loads(body)
+
+    def test_sources_are_encoded_while_sending(self):
+        expected = base64.b64encode(CONTENT).decode()
+        with open(self.path, "rb") as f, open(self.path, "r+b") as m:
+            mapped = mmap.mmap(m.fileno(), 0)
+            sources = {
+                "path": Path(self.path),
+                "file": f,
+                "memoryview": memoryview(CONTENT),
+                "bytearray": bytearray(CONTENT),
+            }
+            for name, source in sources.items():
+                with self.subTest(source=name):
+                    request = self._request()
+                    request.attach("receipt.pdf", source)
+                    payload = self._sent_payload(request)
+                    self.assertEqual(payload["attachments"], {"receipt.pdf": expected})
+                    self.assertEqual(payload["transactional_message_id"], 1)
+
+            request = self._request()
+            request.attach("receipt.pdf", mapped)
+            self.assertEqual(self._sent_payload(request)["attachments"]["receipt.pdf"], expected)
+            del request
+            mapped.close()
+
+    def test_file_objects_are_read_from_their_position(self):
+        f = io.BytesIO(b"skipped" + CONTENT)
+        f.seek(len(b"skipped"))
+        request = self._request()
+        request.attach("receipt.pdf", f)
+
+        self.client.send_email(request)
+        self.client.send_email(request)
+        self.assertEqual(self.session.bodies[0], self.session.bodies[1])
+        payload = json.loads(self.session.bodies[0])
+        self.assertEqual(base64.b64decode(payload["attachments"]["receipt.pdf"]), CONTENT)
+
+    def test_streamed_and_encoded_attachments_are_combined(self):
+        request = self._request()
+        request.attach("a.csv", "1,2,3")
+        request.attach("b.txt", memoryview(base64.b64encode(b"hello")), encode=False)
+
+        self.assertEqual(
+            self._sent_payload(request)["attachments"],
+            {"a.csv": base64.b64encode(b"1,2,3").decode(), "b.txt": "aGVsbG8="},
+        )
+
+    def test_only_attachments_in_payload(self):
+        request = SendEmailRequest()
+        request.attach("empty.txt", memoryview(b""))
+        self.assertEqual(self._sent_payload(request), {"attachments": {"empty.txt": ""}})
+
+    def test_memory_is_bounded_by_chunk_size(self):
+        content = bytes(8 * 1024 * 1024)
+        request = self._request()
+        request.attach("large.bin", memoryview(content))
+        body, _ = self.client._prepare_body(request._to_dict())
+
+        tracemalloc.start()
+        try:
+            size = sum(len(chunk) for chunk in body)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(size, len(body))
+        self.assertLess(peak, 4 * CHUNK_SIZE)
+
+    def test_shared_file_object_is_read_concurrently(self):
+        f = io.BytesIO(b"skipped" + CONTENT)
+        f.seek(len(b"skipped"))
+        requests = []
+        for _ in range(50):
+            request = self._request()
+            request.attach("receipt.pdf", f)
+            requests.append(request)
+
+        results = self.client.send_email_many(requests, concurrency=8)
+        self.assertEqual([result.error for result in results], [None] * 50)
+        expected = base64.b64encode(CONTENT).decode()
+        for body in self.session.bodies:
+            self.assertEqual(json.loads(body)["attachments"]["receipt.pdf"], expected)
+
+    def test_unsupported_sources_raise(self):
+        request = self._request()
+        with self.assertRaises(CustomerIOException):
+            request.attach("number", 5)
+
+        class Unseekable(io.RawIOBase):
+            def readable(self):
+                return True
+
+        with self.assertRaises(CustomerIOException):
+            request.attach("stream", Unseekable())
+
+    def test_truncated_file_raises(self):
+        request = self._request()
+        request.attach("receipt.pdf", Path(self.path))
+        with open(self.path, "wb") as f:
+            f.write(CONTENT[:10])
+
+        with self.assertRaises(CustomerIOException):
+            self.client.send_email(request)
+
+    def test_streamed_body_is_sent_over_both_transports(self):
+        with StandInServer() as server:
+            for http2 in (False, True):
+                with self.subTest(http2=http2):
+                    client = APIClient("apikey", url=server.url, http2=http2)
+                    client.http.verify = False
+                    request = self._request()
+                    request.attach("receipt.pdf", memoryview(CONTENT))
+                    try:
+                        self.assertEqual(client.send_email(request), {})
+                    finally:
+                        client.close()
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncStreamedAttachments(unittest.IsolatedAsyncioTestCase):
+    async def test_attachments_are_streamed(self):
+        bodies = []
+
+        async def handle(request):
+            bodies.append(await request.aread())
+            return httpx.Response(200, json={})
+
+        client = AsyncAPIClient(key="app_api_key")
+        client._build_transport = lambda: httpx.MockTransport(handle)
+        request = SendEmailRequest(transactional_message_id=1)
+        request.attach("receipt.pdf", memoryview(CONTENT))
+        try:
+            await client.send_email(request)
+        finally:
+            await client.close()
+
+        payload = json.loads(bodies[0])
+        self.assertEqual(base64.b64decode(payload["attachments"]["receipt.pdf"]), CONTENT)
+
+
+if __name__ == "__main__":
+    unittest.main()
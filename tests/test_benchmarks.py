@@ -0,0 +1,50 @@
+import unittest
+
+import urllib3
+
+from benchmarks.client import compare, percentile, run_benchmark
+from benchmarks.server import StandInServer
+
+# the stand-in server uses a self signed certificate
+urllib3.disable_warnings()
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_percentile(self):
+        samples = list(range(1, 101))
+
+        self.assertEqual(percentile(samples, 0.50), 50)
+        self.assertEqual(percentile(samples, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_compare_reports_regressions_beyond_tolerance(self):
+        baseline = [
+            {
+                "scenario": "track",
+                "mode": "pooled",
+                "threads": 1,
+                "ops_per_sec": 1000,
+                "p99_ms": 2.0,
+                "cpu_us_per_op": 500,
+            }
+        ]
+        results = [dict(baseline[0], ops_per_sec=950, p99_ms=3.0)]
+
+        self.assertEqual(
+            compare(results, baseline, tolerance=0.1), ["track pooled threads=1: p99 50% worse"]
+        )
+
+    def test_run_benchmark_against_stand_in_server(self):
+        with StandInServer() as server:
+            for scenario in ("track", "send_email"):
+                for mode in ("pooled", "unpooled"):
+                    result = run_benchmark(server, scenario, mode, threads=2, operations=4)
+
+                    self.assertEqual(result["operations"], 4)
+                    self.assertGreater(result["ops_per_sec"], 0)
+                    self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+                    self.assertIsNone(result["peak_kib"])
+
+
+if __name__ == "__main__":
+    unittest.main()
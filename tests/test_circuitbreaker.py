@@ -0,0 +1,173 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from customerio import (
+    APIClient,
+    CircuitBreaker,
+    CustomerIO,
+    CustomerIOCircuitOpenException,
+    CustomerIOException,
+    Spool,
+)
+from tests.server import FakeSession
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch(
+            "customerio.circuitbreaker.time.monotonic", side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure("a")
+        self.breaker.record_failure("a")
+        self.breaker.record_success("a")
+        self.breaker.record_failure("a")
+        self.breaker.record_failure("a")
+        self.assertEqual(self.breaker.state("a"), "closed")
+
+        self.breaker.record_failure("a")
+        self.assertEqual(self.breaker.state("a"), "open")
+        with self.assertRaises(CustomerIOCircuitOpenException) as ctx:
+            self.breaker.before_request("a")
+        self.assertEqual(ctx.exception.retry_after, 30)
+        self.assertEqual(self.breaker.rejected, 1)
+
+    def test_hosts_are_tracked_separately(self):
+        for _ in range(3):
+            self.breaker.record_failure("a")
+        self.breaker.before_request("b")
+        self.assertEqual(self.breaker.state("b"), "closed")
+
+    def test_half_open_lets_one_trial_through(self):
+        for _ in range(3):
+            self.breaker.record_failure("a")
+        self.now += 30
+        self.assertEqual(self.breaker.state("a"), "half-open")
+
+        self.breaker.before_request("a")
+        with self.assertRaises(CustomerIOCircuitOpenException):
+            self.breaker.before_request("a")
+
+        self.breaker.record_success("a")
+        self.assertEqual(self.breaker.state("a"), "closed")
+        self.breaker.before_request("a")
+
+    def test_failed_trial_reopens_the_circuit(self):
+        for _ in range(3):
+            self.breaker.record_failure("a")
+        self.now += 30
+        self.breaker.before_request("a")
+        self.breaker.record_failure("a")
+
+        self.assertEqual(self.breaker.state("a"), "open")
+        self.now += 29
+        with self.assertRaises(CustomerIOCircuitOpenException):
+            self.breaker.before_request("a")
+
+    def test_cancelled_trial_is_given_back(self):
+        for _ in range(3):
+            self.breaker.record_failure("a")
+        self.now += 30
+        self.breaker.before_request("a")
+        self.breaker.cancel_request("a")
+
+        self.breaker.before_request("a")
+        self.assertEqual(self.breaker.state("a"), "half-open")
+
+    def test_invalid_arguments_raise(self):
+        with self.assertRaises(CustomerIOException):
+            CircuitBreaker(failure_threshold=0)
+        with self.assertRaises(CustomerIOException):
+            CircuitBreaker(reset_timeout=0)
+        with self.assertRaises(CustomerIOException):
+            CircuitBreaker(half_open_max_calls=0)
+
+
+class TestClientCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        self.session = FakeSession()
+
+    def _client(self, cls, **kwargs):
+        client = cls(circuit_breaker=self.breaker, **kwargs)
+        client._build_session = lambda: self.session
+        return client
+
+    def test_failures_open_the_circuit_for_the_host(self):
+        cio = self._client(CustomerIO, site_id="siteid", api_key="apikey")
+        api = self._client(APIClient, key="app_api_key")
+        self.session.outcomes = [OSError("connection refused"), 503]
+
+        for _ in range(2):
+            with self.assertRaises(CustomerIOException):
+                cio.identify(id="1")
+        with self.assertRaises(CustomerIOCircuitOpenException):
+            cio.track(customer_id="1", name="purchased")
+        self.assertEqual(self.session.count, 2)
+
+        api.send_request("POST", api.url + "/v1/send/email", {})
+        self.assertTrue(self.session.requests[-1].url.startswith("https://api.customer.io/"))
+
+    def test_client_errors_do_not_count_as_failures(self):
+        cio = self._client(CustomerIO, site_id="siteid", api_key="apikey")
+        self.session.outcomes = [400, 404, 400]
+
+        for _ in range(3):
+            with self.assertRaises(CustomerIOException) as ctx:
+                cio.identify(id="1")
+            self.assertNotIsInstance(ctx.exception, CustomerIOCircuitOpenException)
+
+    def test_open_circuit_fails_before_waiting_for_the_rate_limiter(self):
+        limiter = mock.Mock()
+        cio = self._client(CustomerIO, site_id="siteid", api_key="apikey", rate_limiter=limiter)
+        for _ in range(2):
+            self.breaker.record_failure("track.customer.io")
+
+        with self.assertRaises(CustomerIOCircuitOpenException):
+            cio.identify(id="1")
+        limiter.acquire.assert_not_called()
+
+    def test_trial_is_given_back_when_the_request_is_not_sent(self):
+        def serializer(data):
+            if "fails" in data:
+                raise TypeError("not serializable")
+            return b"{}"
+
+        cio = self._client(CustomerIO, site_id="siteid", api_key="apikey", serializer=serializer)
+        for _ in range(2):
+            self.breaker.record_failure("track.customer.io")
+        with mock.patch("customerio.circuitbreaker.time.monotonic", return_value=1e9):
+            with self.assertRaises(CustomerIOException):
+                cio.identify(id="1", fails=True)
+            cio.identify(id="1")
+
+        self.assertEqual(self.breaker.state("track.customer.io"), "closed")
+        self.assertEqual(self.session.count, 1)
+
+    def test_open_circuit_diverts_buffered_operations_to_spool(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        spool = Spool(os.path.join(directory.name, "spool.db"))
+        self.addCleanup(spool.close)
+        for _ in range(2):
+            self.breaker.record_failure("track.customer.io")
+
+        cio = self._client(
+            CustomerIO, site_id="siteid", api_key="apikey", buffered=True, spool=spool
+        )
+        cio.track(customer_id="1", name="purchased")
+        cio.close()
+
+        self.assertEqual(self.session.count, 0)
+        self.assertEqual(len(spool), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
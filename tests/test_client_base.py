@@ -1,34 +1,22 @@
+import gzip
+import json
+import socket
 import threading
+import time
 import unittest
 
-from customerio.client_base import ClientBase, CustomerIOException
+from urllib3.exceptions import MaxRetryError
+from urllib3.response import HTTPResponse
 
-
-class FakeResponse:
-    status_code = 200
-    text = "ok"
-
-
-class FakeSession:
-    def __init__(self, request_barrier=None):
-        self.closed = False
-        self.request_barrier = request_barrier
-        self.request_count = 0
-
-    def __enter__(self):
-        return self
-
-    def __exit__(self, *args):
-        self.close()
-
-    def request(self, *args, **kwargs):
-        self.request_count += 1
-        if self.request_barrier is not None:
-            self.request_barrier.wait(timeout=5)
-        return FakeResponse()
-
-    def close(self):
-        self.closed = True
+from customerio.client_base import (
+    ClientBase,
+    ConnectionPoolStats,
+    CustomerIOException,
+    CustomerIOThrottledException,
+)
+from customerio.serializers import FAST_SERIALIZER, dumps_orjson, dumps_stdlib, orjson
+from customerio.transport import _StatsHTTPSConnectionPool
+from tests.server import FakeResponse, FakeSession
 
 
 class TestClientBase(unittest.TestCase):
@@ -59,7 +47,7 @@ class TestClientBase(unittest.TestCase):
         errors = []
 
         def build_session():
-            session = FakeSession(request_barrier)
+            session = FakeSession(barrier=request_barrier)
             sessions.append(session)
             return session
 
@@ -82,7 +70,7 @@ class TestClientBase(unittest.TestCase):
         self.assertTrue(all(r.status_code == 200 for r in responses))
         self.assertEqual(len(sessions), 2)
         self.assertTrue(all(session.closed for session in sessions))
-        self.assertTrue(all(session.request_count == 1 for session in sessions))
+        self.assertTrue(all(session.count == 1 for session in sessions))
         self.assertIsNone(client._current_session)
 
     def test_retry_config_allows_post(self):
@@ -94,7 +82,178 @@ class TestClientBase(unittest.TestCase):
         self.assertEqual(retry.total, 5)
         self.assertEqual(retry.backoff_factor, 0.1)
         self.assertIsNone(retry.allowed_methods)
-        self.assertEqual(set(retry.status_forcelist), {500, 502, 503, 504})
+        self.assertEqual(set(retry.status_forcelist), {429, 500, 502, 503, 504})
+
+    def test_pool_settings_are_passed_to_adapter(self):
+        client = ClientBase(pool_connections=4, pool_maxsize=64, pool_block=True)
+        adapter = client._build_session().get_adapter("https://example.com")
+        pool = adapter.poolmanager.connection_from_url("https://example.com")
+
+        self.assertEqual(adapter._pool_connections, 4)
+        self.assertEqual(adapter._pool_maxsize, 64)
+        self.assertTrue(adapter._pool_block)
+        self.assertEqual(pool.pool.maxsize, 64)
+        self.assertTrue(pool.block)
+        self.assertIs(pool.stats, client.pool_stats)
+
+    def test_pool_stats_count_opened_reused_and_discarded(self):
+        stats = ConnectionPoolStats()
+        pool = _StatsHTTPSConnectionPool("example.com", maxsize=1)
+        pool.stats = stats
+
+        first = pool._get_conn()
+        second = pool._get_conn()
+        self.assertEqual(stats.snapshot(), {"opened": 2, "reused": 0, "discarded": 0, "in_use": 2})
+
+        first.sock, peer = socket.socketpair()
+        second.sock, other_peer = socket.socketpair()
+        self.addCleanup(peer.close)
+        self.addCleanup(other_peer.close)
+        self.addCleanup(first.close)
+        pool._put_conn(first)
+        pool._put_conn(second)
+        self.assertEqual(stats.snapshot(), {"opened": 2, "reused": 0, "discarded": 1, "in_use": 0})
+        self.assertIsNone(second.sock)
+
+        self.assertIs(pool._get_conn(), first)
+        self.assertEqual(stats.snapshot(), {"opened": 2, "reused": 1, "discarded": 1, "in_use": 1})
+
+    def test_retry_reports_throttling_with_retry_after(self):
+        client = ClientBase(retries=2, backoff_factor=0.5)
+        retry = client._build_retry()
+        response = HTTPResponse(status=429, headers={"Retry-After": "7"})
+
+        retry = retry.increment("POST", "/", response=response)
+        self.assertEqual((client.throttled_count, client.last_retry_after), (1, 7))
+
+        # without Retry-After the next backoff time is used
+        retry.increment("POST", "/", response=HTTPResponse(status=429))
+        self.assertEqual((client.throttled_count, client.last_retry_after), (2, 1.0))
+
+    def test_long_retry_after_raises_instead_of_waiting(self):
+        client = ClientBase(retries=2, max_retry_after=60)
+        retry = client._build_retry()
+
+        with self.assertRaises(MaxRetryError) as ctx:
+            retry.increment(
+                "POST", "/", response=HTTPResponse(status=429, headers={"Retry-After": "3600"})
+            )
+        self.assertEqual(ctx.exception.reason.retry_after, 3600)
+        self.assertEqual(client.last_retry_after, 3600)
+
+        retry = retry.increment("POST", "/", response=HTTPResponse(status=503))
+        with self.assertRaises(MaxRetryError):
+            retry.sleep(HTTPResponse(status=503, headers={"Retry-After": "3600"}))
+
+    def test_adaptive_throttling_raises_for_pauses_over_max_retry_after(self):
+        client = ClientBase(adaptive_throttling=True, max_retry_after=60)
+        client._on_throttle(3600)
+        session = FakeSession()
+        client._build_session = lambda: session
+
+        with self.assertRaises(CustomerIOThrottledException) as ctx:
+            client.send_request("POST", "https://example.com", {})
+        self.assertGreater(ctx.exception.retry_after, 3500)
+        self.assertEqual(session.count, 0)
+
+    def test_adaptive_throttling_delays_later_requests(self):
+        client = ClientBase(adaptive_throttling=True)
+        client._on_throttle(0.2)
+        self.assertGreater(client._throttle_wait_time(), 0.1)
+
+        client._build_session = FakeSession
+        start = time.monotonic()
+        client.send_request("POST", "https://example.com", {})
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    def test_throttling_without_adaptive_mode_does_not_delay(self):
+        client = ClientBase()
+        client._on_throttle(30)
+        self.assertEqual(client._throttle_wait_time(), 0)
+
+    def test_429_response_raises_throttled_exception(self):
+        client = ClientBase()
+        response = FakeResponse()
+        response.status_code = 429
+        response.headers = {"Retry-After": "3"}
+
+        def build_session():
+            session = FakeSession()
+            session.request = lambda *a, **kw: response
+            return session
+
+        client._build_session = build_session
+
+        with self.assertRaises(CustomerIOThrottledException) as ctx:
+            client.send_request("POST", "https://example.com", {})
+
+        self.assertEqual(ctx.exception.retry_after, 3)
+
+    def test_payload_is_serialized_once_with_configured_serializer(self):
+        calls = []
+
+        def serializer(data):
+            calls.append(data)
+            return b"serialized"
+
+        client = ClientBase(serializer=serializer)
+        session = FakeSession()
+        client._build_session = lambda: session
+
+        client.send_request("POST", "https://example.com", {"n": float("nan")})
+
+        self.assertEqual(calls, [{"n": None}])
+        self.assertEqual(session.requests[-1].data, b"serialized")
+        self.assertEqual(session.requests[-1].headers["Content-Type"], "application/json")
+
+    def test_serialized_bytes_are_sent_as_is(self):
+        client = ClientBase(serializer=lambda data: self.fail("should not serialize"))
+        session = FakeSession()
+        client._build_session = lambda: session
+
+        client.send_request("POST", "https://example.com", b'{"a": 1}')
+
+        self.assertEqual(session.requests[-1].data, b'{"a": 1}')
+
+    def test_default_serializer_matches_requests_encoding(self):
+        data = {"name": "Bob", "items": [1, 2.5, None], "ok": True}
+        self.assertEqual(dumps_stdlib(data), json.dumps(data).encode("utf-8"))
+        with self.assertRaises(ValueError):
+            dumps_stdlib({"n": float("inf")})
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_fast_serializer_uses_orjson(self):
+        self.assertIs(FAST_SERIALIZER, dumps_orjson)
+        self.assertEqual(json.loads(FAST_SERIALIZER({"a": [1, "b"]})), {"a": [1, "b"]})
+
+    def test_bodies_over_threshold_are_gzip_compressed(self):
+        client = ClientBase(compression_threshold=100, compression_level=9)
+        session = FakeSession()
+        client._build_session = lambda: session
+        data = {"body": "<p>hello</p>" * 100}
+
+        client.send_request("POST", "https://example.com", data)
+
+        body = session.requests[-1].data
+        self.assertEqual(session.requests[-1].headers["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(body)), data)
+        stats = client.compression_stats.snapshot()
+        self.assertEqual(stats["compressed_requests"], 1)
+        self.assertEqual(stats["bytes_in"], len(json.dumps(data)))
+        self.assertEqual(stats["bytes_out"], len(body))
+        self.assertGreater(stats["bytes_saved"], 1000)
+
+    def test_small_bodies_and_default_settings_are_not_compressed(self):
+        for client, data in [
+            (ClientBase(compression_threshold=100), {"a": 1}),
+            (ClientBase(), {"body": "x" * 1000}),
+        ]:
+            session = FakeSession()
+            client._build_session = lambda session=session: session
+            client.send_request("POST", "https://example.com", data)
+
+            self.assertNotIn("Content-Encoding", session.requests[-1].headers)
+            self.assertEqual(client.compression_stats.compressed_requests, 0)
 
     def test_non_200_raises_without_retry_wrapper(self):
         client = ClientBase()
@@ -0,0 +1,142 @@
+import threading
+import unittest
+from concurrent.futures import Future
+
+from customerio import CustomerIO, CustomerIOException
+from customerio.coalescer import IdentifyCoalescer
+
+
+class TestIdentifyCoalescer(unittest.TestCase):
+    def test_identifies_in_window_are_merged(self):
+        sent = []
+        done = threading.Event()
+
+        def send(customer_id, attributes):
+            sent.append((customer_id, attributes))
+            done.set()
+            return "response"
+
+        coalescer = IdentifyCoalescer(send, window=0.05)
+        future = coalescer.add("1", {"email": "a@example.com", "plan": "free"})
+        self.assertIs(coalescer.add("1", {"plan": "pro"}), future)
+        coalescer.add("2", {"plan": "team"})
+
+        self.assertEqual(future.result(timeout=5), "response")
+        self.assertTrue(done.wait(timeout=5))
+        coalescer.close()
+        self.assertEqual(
+            sent,
+            [("1", {"email": "a@example.com", "plan": "pro"}), ("2", {"plan": "team"})],
+        )
+
+    def test_flush_sends_one_customer_right_away(self):
+        sent = []
+        coalescer = IdentifyCoalescer(lambda *args: sent.append(args), window=60)
+        coalescer.add("1", {"plan": "pro"})
+        coalescer.add("2", {"plan": "team"})
+
+        coalescer.flush("1")
+        self.assertEqual(sent, [("1", {"plan": "pro"})])
+        coalescer.close()
+        self.assertEqual(sent[1], ("2", {"plan": "team"}))
+
+    def test_flush_waits_for_an_identify_the_worker_has_taken(self):
+        sent = []
+        coalescer = IdentifyCoalescer(lambda customer_id, _: sent.append(customer_id), window=0.01)
+        taken, resume = threading.Event(), threading.Event()
+        send = coalescer._send
+
+        def send_later(entry):
+            # the worker is descheduled between taking the identify and sending it
+            taken.set()
+            resume.wait(timeout=5)
+            send(entry)
+
+        coalescer._send = send_later
+        coalescer.add("1", {"plan": "pro"})
+        self.assertTrue(taken.wait(timeout=5))
+
+        flushed = threading.Thread(target=lambda: (coalescer.flush("1"), sent.append("delete")))
+        flushed.start()
+        flushed.join(timeout=0.1)
+        resume.set()
+        flushed.join(timeout=5)
+        coalescer.close()
+        self.assertEqual(sent, ["1", "delete"])
+
+    def test_errors_are_set_on_the_future(self):
+        def send(customer_id, attributes):
+            raise CustomerIOException("500: boom")
+
+        coalescer = IdentifyCoalescer(send, window=60)
+        future = coalescer.add("1", {"plan": "pro"})
+        with self.assertLogs("customerio.coalescer", level="ERROR"):
+            coalescer.flush()
+        self.assertIsInstance(future.exception(timeout=0), CustomerIOException)
+        coalescer.close()
+
+    def test_future_results_are_passed_through(self):
+        result = Future()
+        coalescer = IdentifyCoalescer(lambda *args: result, window=60)
+        future = coalescer.add("1", {"plan": "pro"})
+
+        flushed = threading.Thread(target=coalescer.flush, args=("1",))
+        flushed.start()
+        flushed.join(timeout=0.05)
+        self.assertTrue(flushed.is_alive())
+
+        result.set_result("response")
+        flushed.join(timeout=5)
+        self.assertEqual(future.result(timeout=0), "response")
+        coalescer.close()
+
+    def test_closed_coalescer_rejects_identifies(self):
+        coalescer = IdentifyCoalescer(lambda *args: None, window=60)
+        coalescer.close()
+        with self.assertRaises(CustomerIOException):
+            coalescer.add("1", {"plan": "pro"})
+
+    def test_window_must_be_positive(self):
+        with self.assertRaises(CustomerIOException):
+            IdentifyCoalescer(lambda *args: None, window=0)
+
+
+class TestCustomerIOCoalescing(unittest.TestCase):
+    def setUp(self):
+        self.cio = CustomerIO(site_id="siteid", api_key="apikey", identify_coalesce_window=60)
+        self.sent = []
+
+        def send_request(method, url, data):
+            self.sent.append((method, url.rsplit("/customers/", 1)[1], data))
+            return "response"
+
+        self.cio.send_request = send_request
+
+    def tearDown(self):
+        self.cio.close()
+
+    def test_identifies_are_sent_as_one_request(self):
+        self.assertIsNone(self.cio.identify(id="1", email="a@example.com"))
+        self.cio.identify(id="1", name="Bob")
+        self.cio.identify(id="1", email="b@example.com")
+        self.cio.flush()
+
+        self.assertEqual(self.sent, [("PUT", "1", {"email": "b@example.com", "name": "Bob"})])
+
+    def test_delete_and_suppress_send_pending_identifies_first(self):
+        self.cio.identify(id="1", email="a@example.com")
+        self.cio.identify(id="2", email="b@example.com")
+        self.cio.identify(id="3", email="c@example.com")
+        self.cio.delete(customer_id="1")
+        self.cio.suppress(customer_id="2")
+
+        self.assertEqual(
+            [(method, path) for method, path, _ in self.sent],
+            [("PUT", "1"), ("DELETE", "1"), ("PUT", "2"), ("POST", "2/suppress")],
+        )
+        self.cio.close()
+        self.assertEqual(self.sent[-1][:2], ("PUT", "3"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,20 @@
 import json
 import socket
 import unittest
-from datetime import datetime
+from datetime import datetime, timezone
 from functools import partial
 
 import urllib3
 from requests.auth import _basic_auth_str
 from urllib3.connection import HTTPConnection
 
-from customerio import CustomerIO, CustomerIOException, Regions
+from customerio import (
+    CustomerIO,
+    CustomerIOBatchException,
+    CustomerIOException,
+    CustomerIOThrottledException,
+    Regions,
+)
 from customerio.client_base import TCP_KEEPALIVE_IDLE_TIMEOUT, TCP_KEEPALIVE_INTERVAL
 from customerio.constants import CIOID, EMAIL, ID
 from tests.server import HTTPSTestCase
@@ -34,6 +40,131 @@ class TestCustomerIOTrackSignatures(unittest.TestCase):
             )
 
 
+class TestCustomerIOURLs(unittest.TestCase):
+    def test_customer_urls_are_cached(self):
+        cio = CustomerIO(site_id="siteid", api_key="apikey", url_cache_size=2)
+
+        self.assertEqual(
+            cio.get_event_query_string("a/b"),
+            "https://track.customer.io/api/v1/customers/a%2Fb/events",
+        )
+        self.assertEqual(
+            cio.get_device_query_string("a/b"),
+            "https://track.customer.io/api/v1/customers/a%2Fb/devices",
+        )
+        self.assertEqual(cio.get_customer_query_string(1), cio.get_customer_query_string("1"))
+        cio.get_customer_query_string(2)
+
+        info = cio.url_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 4, 2))
+
+    def test_batch_url_is_precomputed(self):
+        self.assertEqual(
+            CustomerIO(site_id="siteid", api_key="apikey").batch_url,
+            "https://track.customer.io/api/v2/batch",
+        )
+        self.assertEqual(
+            CustomerIO(site_id="siteid", api_key="apikey", host="localhost", port=8443).batch_url,
+            "https://localhost:8443/api/v2/batch",
+        )
+
+    def test_setup_base_url_clears_cached_urls(self):
+        cio = CustomerIO(site_id="siteid", api_key="apikey")
+        cio.get_customer_query_string("1")
+
+        cio.host = "track-eu.customer.io"
+        cio.setup_base_url()
+
+        self.assertEqual(
+            cio.get_customer_query_string("1"), "https://track-eu.customer.io/api/v1/customers/1"
+        )
+        self.assertEqual(cio.batch_url, "https://track-eu.customer.io/api/v2/batch")
+
+
+class TestCustomerIOBatchChunking(unittest.TestCase):
+    def setUp(self):
+        self.cio = CustomerIO(site_id="siteid", api_key="apikey")
+        self.sent = []
+
+        def send_request(method, url, data):
+            self.assertIsInstance(data, bytes)
+            self.assertLessEqual(len(data), 1024)
+            self.sent.append(json.loads(data)["batch"])
+            return "response"
+
+        self.cio.send_request = send_request
+
+    def _operations(self, count, size=100):
+        return [
+            {"type": "person", "action": "event", "identifiers": {"id": i}, "name": "x" * size}
+            for i in range(count)
+        ]
+
+    def test_operations_are_split_by_request_size(self):
+        operations = self._operations(30)
+        results = self.cio.batch(operations, max_request_size=1024)
+
+        self.assertGreater(len(self.sent), 1)
+        self.assertEqual([op for chunk in self.sent for op in chunk], operations)
+        self.assertEqual([result.count for result in results], [len(c) for c in self.sent])
+        self.assertEqual(results[1].start, results[0].count)
+        for result, chunk in zip(results, self.sent, strict=True):
+            self.assertEqual(result.size, len(json.dumps({"batch": chunk})))
+            self.assertEqual(result.response, "response")
+            self.assertIsNone(result.error)
+
+    def test_operations_are_sanitized(self):
+        created = datetime(2009, 2, 13, 23, 31, 30, tzinfo=timezone.utc)
+        operation = {
+            "type": "person",
+            "action": "identify",
+            "identifiers": {"id": 1},
+            "attributes": {"profile": {"created_at": created, "score": float("nan")}},
+        }
+        self.cio.batch([operation])
+
+        self.assertEqual(
+            self.sent[0][0]["attributes"], {"profile": {"created_at": 1234567890, "score": None}}
+        )
+
+    def test_concurrent_chunks_keep_operation_order(self):
+        operations = self._operations(50)
+        results = self.cio.batch(operations, concurrency=4, max_request_size=1024)
+
+        self.assertEqual([result.start for result in results], sorted(r.start for r in results))
+        self.assertEqual(sum(result.count for result in results), 50)
+
+    def test_oversized_operation_is_reported_without_blocking_others(self):
+        operations = self._operations(3)
+        operations[1]["name"] = "x" * 2000
+
+        with self.assertRaises(CustomerIOBatchException) as ctx:
+            self.cio.batch(operations, max_request_size=1024, max_operation_size=512)
+
+        results = ctx.exception.results
+        self.assertEqual(self.sent, [[operations[0]], [operations[2]]])
+        self.assertEqual([result.start for result in results], [0, 1, 2])
+        self.assertIn("operation 1", str(results[1].error))
+        self.assertIsNone(results[2].error)
+
+    def test_failed_chunk_raises_after_sending_the_rest(self):
+        def send_request(method, url, data):
+            self.sent.append(json.loads(data)["batch"])
+            if len(self.sent) == 1:
+                raise CustomerIOException("500: boom")
+            return "response"
+
+        self.cio.send_request = send_request
+
+        with self.assertRaises(CustomerIOBatchException) as ctx:
+            self.cio.batch(self._operations(30), max_request_size=1024)
+
+        results = ctx.exception.results
+        self.assertEqual(len(results), len(self.sent))
+        self.assertIsNotNone(results[0].error)
+        self.assertTrue(all(result.error is None for result in results[1:]))
+
+
 class TestCustomerIO(HTTPSTestCase):
     """Starts server which the client connects to in the following tests"""
 
@@ -70,6 +201,19 @@ class TestCustomerIO(HTTPSTestCase):
                 "url: {} expected suffix: {}".format(request.url, rq["url_suffix"]),
             )
 
+    def test_json_encoder_is_used_to_serialize(self):
+        class Encoder(json.JSONEncoder):
+            def default(self, o):
+                if isinstance(o, set):
+                    return sorted(o)
+                return super().default(o)
+
+        client = CustomerIO(site_id="site_id", api_key="api_key", json_encoder=Encoder)
+        self.assertEqual(client.serializer({"tags": {"b", "a"}}), b'{"tags": ["a", "b"]}')
+
+        with self.assertRaises(CustomerIOException):
+            CustomerIO(json_encoder=Encoder, serializer=lambda data: b"")
+
     def test_client_setup(self):
         client = CustomerIO(site_id="site_id", api_key="api_key")
         self.assertEqual(client.host, Regions.US.track_host)
@@ -115,6 +259,23 @@ class TestCustomerIO(HTTPSTestCase):
         with self.assertRaises(CustomerIOException):
             self.cio.identify(retries, fail_count=retries)
 
+    def test_throttled_requests_are_retried_then_raise(self):
+        cio = CustomerIO(
+            site_id="siteid",
+            api_key="apikey",
+            host=self.server.server_address[0],
+            port=self.server.server_port,
+            retries=2,
+            backoff_factor=0,
+        )
+        cio.http.verify = False
+
+        with self.assertRaises(CustomerIOThrottledException) as ctx:
+            cio.send_request("POST", f"{cio.base_url}/throttled", {})
+
+        self.assertEqual(ctx.exception.retry_after, 0)
+        self.assertEqual(cio.throttled_count, 3)
+
     def test_identify_call(self):
         self.cio.http.hooks = dict(
             response=partial(
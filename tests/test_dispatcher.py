@@ -0,0 +1,233 @@
+import subprocess
+import sys
+import threading
+import unittest
+from datetime import datetime, timezone
+
+from customerio import CustomerIO, CustomerIOException
+from customerio.dispatcher import BatchDispatcher
+
+
+class TestBatchDispatcher(unittest.TestCase):
+    def test_flushes_when_batch_size_reached(self):
+        batches = []
+        sent = threading.Event()
+
+        def send(operations):
+            batches.append(operations)
+            sent.set()
+
+        dispatcher = BatchDispatcher(send, batch_size=3, flush_interval=None)
+        for i in range(3):
+            dispatcher.put({"n": i})
+
+        self.assertTrue(sent.wait(timeout=5))
+        self.assertEqual(batches, [[{"n": 0}, {"n": 1}, {"n": 2}]])
+        dispatcher.close()
+
+    def test_flushes_after_interval(self):
+        sent = threading.Event()
+        dispatcher = BatchDispatcher(lambda ops: sent.set(), batch_size=100, flush_interval=0.05)
+        dispatcher.put({"n": 1})
+
+        self.assertTrue(sent.wait(timeout=5))
+        dispatcher.close()
+
+    def test_flush_and_close_drain_queue(self):
+        batches = []
+        dispatcher = BatchDispatcher(batches.append, batch_size=100, flush_interval=None)
+        dispatcher.put({"n": 1})
+        dispatcher.put({"n": 2})
+        dispatcher.flush()
+        self.assertEqual(batches, [[{"n": 1}, {"n": 2}]])
+
+        dispatcher.put({"n": 3})
+        dispatcher.close()
+        self.assertEqual(batches[-1], [{"n": 3}])
+
+        with self.assertRaises(CustomerIOException):
+            dispatcher.put({"n": 4})
+
+    def test_flush_after_close_returns(self):
+        batches = []
+        dispatcher = BatchDispatcher(batches.append, batch_size=100, flush_interval=None)
+        dispatcher.put({"n": 1})
+        dispatcher.close()
+
+        flushed = threading.Thread(target=dispatcher.flush, daemon=True)
+        flushed.start()
+        flushed.join(timeout=5)
+        self.assertFalse(flushed.is_alive())
+        self.assertEqual(batches, [[{"n": 1}]])
+
+    def test_puts_racing_close_are_sent_or_rejected(self):
+        sent = []
+        dispatcher = BatchDispatcher(sent.extend, batch_size=10, flush_interval=None)
+        accepted = []
+
+        def put_many():
+            for i in range(2000):
+                try:
+                    dispatcher.put({"n": i})
+                except CustomerIOException:
+                    return
+                accepted.append(i)
+
+        producer = threading.Thread(target=put_many)
+        producer.start()
+        dispatcher.close()
+        producer.join()
+        self.assertEqual(len(sent), len(accepted))
+
+    def test_errors_are_reported_and_worker_survives(self):
+        errors = []
+        sent = []
+
+        def send(operations):
+            if operations[0]["n"] == 1:
+                raise CustomerIOException("boom")
+            sent.append(operations)
+
+        dispatcher = BatchDispatcher(
+            send,
+            batch_size=1,
+            flush_interval=None,
+            on_error=lambda e, ops: errors.append((str(e), ops)),
+        )
+        dispatcher.put({"n": 1})
+        dispatcher.put({"n": 2})
+        dispatcher.flush()
+        dispatcher.close()
+
+        self.assertEqual(errors, [("boom", [{"n": 1}])])
+        self.assertEqual(sent, [[{"n": 2}]])
+
+    def test_full_queue_raises(self):
+        release = threading.Event()
+        dispatcher = BatchDispatcher(
+            lambda ops: release.wait(timeout=5), batch_size=1, max_queue_size=1
+        )
+        with self.assertRaises(CustomerIOException):
+            for i in range(10):
+                dispatcher.put({"n": i})
+        release.set()
+        dispatcher.close()
+
+
+class TestBufferedCustomerIO(unittest.TestCase):
+    def setUp(self):
+        self.cio = CustomerIO(
+            site_id="siteid", api_key="apikey", buffered=True, flush_interval=None
+        )
+        self.batches = []
+        self.cio.batch = self.batches.append
+        self.cio._dispatcher.send = self.cio.batch
+
+    def test_calls_are_sent_as_batch_operations(self):
+        dt = datetime(2009, 2, 13, 23, 31, 30, 0, timezone.utc)
+        self.assertIsNone(self.cio.identify(id="1", email="a@example.com", created_at=dt))
+        self.cio.track(customer_id="1", name="purchase", data={"price": 10}, timestamp=dt)
+        self.cio.pageview(customer_id="1", page="/home", referrer="search")
+        self.cio.add_device(customer_id="1", device_id="abc", platform="ios", last_used=dt)
+        self.cio.flush()
+
+        self.assertEqual(
+            self.batches,
+            [
+                [
+                    {
+                        "type": "person",
+                        "action": "identify",
+                        "identifiers": {"id": "1"},
+                        "attributes": {"email": "a@example.com", "created_at": 1234567890},
+                    },
+                    {
+                        "type": "person",
+                        "action": "event",
+                        "identifiers": {"id": "1"},
+                        "name": "purchase",
+                        "attributes": {"price": 10},
+                        "timestamp": 1234567890,
+                    },
+                    {
+                        "type": "person",
+                        "action": "page",
+                        "identifiers": {"id": "1"},
+                        "name": "/home",
+                        "attributes": {"referrer": "search"},
+                    },
+                    {
+                        "type": "person",
+                        "action": "add_device",
+                        "identifiers": {"id": "1"},
+                        "device": {"token": "abc", "platform": "ios", "last_used": 1234567890},
+                    },
+                ]
+            ],
+        )
+
+    def test_direct_calls_are_sent_after_queued_operations(self):
+        sent = []
+        self.cio._dispatcher.send = lambda ops: sent.append([op["action"] for op in ops])
+        self.cio.send_request = lambda method, url, data: sent.append(url.rsplit("/", 1)[-1])
+
+        self.cio.identify(id="1", name="john")
+        self.cio.delete(customer_id="1")
+        self.cio.add_device(customer_id="2", device_id="abc", platform="ios")
+        self.cio.delete_device(customer_id="2", device_id="abc")
+        self.cio.track(customer_id="3", name="purchase")
+        self.cio.suppress(customer_id="3")
+        self.cio.identify(id="3")
+        self.cio.unsuppress(customer_id="3")
+        self.cio.identify(id="4")
+        self.cio.merge_customers("id", "4", "id", "5")
+
+        self.assertEqual(
+            sent,
+            [
+                ["identify"],
+                "1",
+                ["add_device"],
+                "abc",
+                ["event"],
+                "suppress",
+                ["identify"],
+                "unsuppress",
+                ["identify"],
+                "merge_customers",
+            ],
+        )
+
+    def test_close_drains_queue(self):
+        self.cio.identify(id="1", name="john")
+        self.cio.close()
+        self.assertEqual(len(self.batches), 1)
+
+    def test_validation_still_raises(self):
+        with self.assertRaises(CustomerIOException):
+            self.cio.identify(id="")
+        with self.assertRaises(CustomerIOException):
+            self.cio.track(customer_id=None, name="purchase")
+
+    def test_queued_operations_are_sent_at_exit(self):
+        script = (
+            "import atexit\n"
+            "sessions = []\n"
+            "# runs after the client's own exit handler, which is registered on import\n"
+            "atexit.register(lambda: print(sum(session.count for session in sessions)))\n"
+            "from customerio import CustomerIO\n"
+            "from tests.server import FakeSession\n"
+            "cio = CustomerIO(site_id='siteid', api_key='apikey', buffered=True)\n"
+            "sessions.append(FakeSession())\n"
+            "cio._build_session = lambda: sessions[0]\n"
+            "cio.track(customer_id='1', name='purchase')\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+
+        self.assertEqual(result.stdout.strip(), "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
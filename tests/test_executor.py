@@ -0,0 +1,138 @@
+import threading
+import unittest
+from concurrent.futures import Future
+
+from customerio import (
+    APIClient,
+    CustomerIO,
+    CustomerIOBackpressureException,
+    CustomerIOException,
+    SendEmailRequest,
+)
+from customerio.executor import RequestExecutor, is_synchronous
+from tests.server import FakeSession
+
+
+class TestRequestExecutor(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def tearDown(self):
+        self.release.set()
+
+    def _wait(self, value):
+        self.started.release()
+        self.release.wait(timeout=5)
+        return value
+
+    def _fill(self, executor):
+        futures = [executor.submit(self._wait, i) for i in range(executor.max_in_flight)]
+        for _ in futures:
+            self.assertTrue(self.started.acquire(timeout=5))
+        return futures
+
+    def test_invalid_arguments_raise(self):
+        with self.assertRaises(CustomerIOException):
+            RequestExecutor(backpressure="wait")
+        with self.assertRaises(CustomerIOException):
+            RequestExecutor(max_in_flight=0)
+
+    def test_block_waits_for_a_free_slot(self):
+        executor = RequestExecutor(workers=2, max_in_flight=2, backpressure="block")
+        self._fill(executor)
+        submitted = threading.Event()
+
+        def submit():
+            executor.submit(lambda: "late").add_done_callback(lambda f: submitted.set())
+
+        thread = threading.Thread(target=submit)
+        thread.start()
+        self.assertFalse(submitted.wait(timeout=0.1))
+
+        self.release.set()
+        thread.join(timeout=5)
+        self.assertTrue(submitted.wait(timeout=5))
+        executor.shutdown()
+
+    def test_drop_returns_failed_future(self):
+        executor = RequestExecutor(workers=2, max_in_flight=2, backpressure="drop")
+        futures = self._fill(executor)
+
+        dropped = executor.submit(lambda: "dropped")
+        self.assertIsInstance(dropped.exception(timeout=0), CustomerIOBackpressureException)
+        self.assertEqual(executor.dropped, 1)
+
+        self.release.set()
+        self.assertEqual([f.result(timeout=5) for f in futures], [0, 1])
+        self.assertEqual(executor.submit(lambda: "sent").result(timeout=5), "sent")
+        executor.shutdown()
+
+    def test_raise_raises_when_full(self):
+        executor = RequestExecutor(workers=1, max_in_flight=1, backpressure="raise")
+        self._fill(executor)
+
+        with self.assertRaises(CustomerIOBackpressureException):
+            executor.submit(lambda: "rejected")
+        self.assertEqual(executor.dropped, 0)
+        executor.shutdown(wait=False)
+
+    def test_worker_threads_are_synchronous(self):
+        executor = RequestExecutor(workers=1)
+        self.assertFalse(is_synchronous())
+        self.assertTrue(executor.submit(is_synchronous).result(timeout=5))
+        executor.shutdown()
+
+
+class TestFuturesMode(unittest.TestCase):
+    def test_track_returns_future_of_response(self):
+        cio = CustomerIO(site_id="siteid", api_key="apikey", futures=True)
+        session = FakeSession()
+        cio._build_session = lambda: session
+
+        future = cio.track(customer_id="1", name="purchased")
+        self.assertIsInstance(future, Future)
+        self.assertEqual(future.result(timeout=5).status_code, 200)
+        self.assertTrue(session.requests[0].thread.startswith("customerio-request"))
+        cio.close()
+
+    def test_errors_are_set_on_the_future(self):
+        cio = CustomerIO(site_id="siteid", api_key="apikey", futures=True)
+        cio._build_session = lambda: FakeSession(status_code=400)
+
+        future = cio.identify(id="1", email="a@example.com")
+        self.assertIsInstance(future.exception(timeout=5), CustomerIOException)
+        cio.close()
+
+    def test_batch_returns_future_of_results(self):
+        cio = CustomerIO(site_id="siteid", api_key="apikey", futures=True)
+        session = FakeSession()
+        cio._build_session = lambda: session
+
+        operations = [
+            {"type": "person", "action": "event", "identifiers": {"id": i}, "name": "x" * 100}
+            for i in range(30)
+        ]
+        future = cio.batch(operations, concurrency=2, max_request_size=1024)
+        results = future.result(timeout=5)
+        self.assertGreater(len(results), 1)
+        self.assertEqual(sum(result.count for result in results), 30)
+        cio.close()
+
+    def test_send_email_returns_future_of_json(self):
+        client = APIClient(key="app_api_key", futures=True)
+        client._build_session = lambda: FakeSession(respond=lambda url: {"url": url})
+
+        future = client.send_email(
+            SendEmailRequest(transactional_message_id=1, identifiers={"id": "1"})
+        )
+        self.assertTrue(future.result(timeout=5)["url"].endswith("/v1/send/email"))
+        client.close()
+
+    def test_buffered_and_futures_cannot_be_combined(self):
+        with self.assertRaises(CustomerIOException):
+            CustomerIO(site_id="siteid", api_key="apikey", buffered=True, futures=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import signal
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+
+from customerio import APIClient, CustomerIO, Spool
+from tests.server import FakeSession
+
+
+def batched_names(session):
+    return [
+        operation.get("name") or operation["attributes"]["plan"]
+        for batch in session.batches()
+        for operation in batch
+    ]
+
+
+def run_in_child(test):
+    """Runs `test` in a forked child and returns its exit status."""
+    with warnings.catch_warnings():
+        # forking with the test runner's threads alive is what these tests are about
+        warnings.simplefilter("ignore", DeprecationWarning)
+        pid = os.fork()
+    if pid == 0:
+        code = 1
+        # a child left with the parent's workers hangs, so it is stopped instead
+        signal.alarm(10)
+        try:
+            code = 0 if test() else 1
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+class TestForkSafety(unittest.TestCase):
+    def setUp(self):
+        self.sessions = []
+
+    def _client(self, cls=CustomerIO, **kwargs):
+        if cls is CustomerIO:
+            kwargs.update(site_id="siteid", api_key="apikey")
+        else:
+            kwargs.update(key="app_api_key")
+        client = cls(**kwargs)
+        self.addCleanup(client.close)
+
+        def build_session():
+            self.sessions.append(FakeSession())
+            return self.sessions[-1]
+
+        client._build_session = build_session
+        return client
+
+    @unittest.skipUnless(hasattr(os, "fork"), "os.fork is not available")
+    def test_child_builds_its_own_session(self):
+        cio = self._client()
+        cio.identify(id="1")
+        parent_session = cio.http
+
+        def child():
+            cio.identify(id="2")
+            session = cio.http
+            return session is not parent_session and session.requests[0].pid == os.getpid()
+
+        self.assertEqual(run_in_child(child), 0)
+        self.assertIs(cio.http, parent_session)
+        self.assertEqual(len(parent_session.requests), 1)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "os.fork is not available")
+    def test_child_restarts_futures_workers(self):
+        api = self._client(APIClient, futures=True, futures_workers=1, max_in_flight=2)
+        api.send_email({}).result()
+
+        def child():
+            futures = [api.send_email({}) for _ in range(4)]
+            return [future.result(timeout=5) for future in futures] == [{}] * 4
+
+        self.assertEqual(run_in_child(child), 0)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "os.fork is not available")
+    def test_child_drops_the_parents_buffered_operations(self):
+        cio = self._client(buffered=True, flush_interval=None, identify_coalesce_window=60)
+        cio.track(customer_id="1", name="parent")
+        cio.identify(id="1", plan="parent-plan")
+
+        def child():
+            cio.identify(id="2", plan="child-plan")
+            cio.track(customer_id="2", name="child")
+            cio.flush()
+            (session,) = self.sessions
+            return batched_names(session) == ["child", "child-plan"]
+
+        self.assertEqual(run_in_child(child), 0)
+        cio.flush()
+        (session,) = self.sessions
+        self.assertEqual(batched_names(session), ["parent", "parent-plan"])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "os.fork is not available")
+    def test_child_reopens_the_spool(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        spool = Spool(os.path.join(directory.name, "spool.db"))
+        self.addCleanup(spool.close)
+        cio = self._client(buffered=True, flush_interval=None, spool=spool)
+        connection = spool._connection
+        spool.append([{"name": "parent"}])
+
+        def child():
+            spool.append([{"name": "child"}])
+            return spool._connection is not connection and len(spool) == 2
+
+        # a parent thread holding the spool's lock while forking would leave the child stuck
+        with spool._lock:
+            status = run_in_child(child)
+        self.assertEqual(status, 0)
+        self.assertIs(spool._connection, connection)
+        self.assertEqual(cio.replay_spool(), 2)
+
+    def test_fork_without_at_fork_handlers_is_detected(self):
+        cio = self._client(futures=True)
+        parent_session = cio.http
+        executor = cio.request_executor
+        self.addCleanup(executor._ensure_executor().shutdown)
+
+        with mock.patch("customerio.client_base.os.getpid", return_value=cio._pid + 1):
+            self.assertIsNot(cio.http, parent_session)
+        self.assertIsNone(executor._executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import unittest
+
+import urllib3
+from requests.auth import _basic_auth_str
+
+from benchmarks.server import StandInServer
+from customerio import (
+    APIClient,
+    CustomerIO,
+    CustomerIOException,
+    CustomerIOThrottledException,
+    SendEmailRequest,
+)
+
+try:
+    import h2
+    import httpx
+except ImportError:  # pragma: no cover
+    h2 = httpx = None
+
+# the stand-in server uses a self signed certificate
+urllib3.disable_warnings()
+
+
+@unittest.skipIf(httpx is None or h2 is None, "httpx and h2 are not installed")
+class TestHTTP2Transport(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+        self.responses = []
+        self.cio = CustomerIO(site_id="siteid", api_key="apikey", http2=True, backoff_factor=0)
+        self.cio.http._build_transport = lambda: httpx.MockTransport(self._handle)
+
+    def tearDown(self):
+        self.cio.close()
+
+    def _handle(self, request):
+        self.requests.append(request)
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return httpx.Response(200, json={})
+
+    def test_requests_are_sent_with_client_headers(self):
+        self.cio.identify(id="1", email="a@example.com")
+
+        request = self.requests[0]
+        self.assertEqual(request.method, "PUT")
+        self.assertEqual(str(request.url), "https://track.customer.io/api/v1/customers/1")
+        self.assertEqual(json.loads(request.content), {"email": "a@example.com"})
+        self.assertEqual(request.headers["Authorization"], _basic_auth_str("siteid", "apikey"))
+        self.assertTrue(request.headers["User-Agent"].startswith("Customer.io Python Client/"))
+
+    def test_server_errors_are_retried(self):
+        self.responses = [httpx.Response(503), httpx.ConnectError("refused"), httpx.Response(200)]
+        self.cio.track(customer_id="1", name="purchased")
+        self.assertEqual(len(self.requests), 3)
+
+    def test_failed_retries_raise_with_cause(self):
+        self.responses = [httpx.ConnectError("refused")] * 4
+        with self.assertRaises(CustomerIOException) as ctx:
+            self.cio.track(customer_id="1", name="purchased")
+        self.assertIsNotNone(ctx.exception.__cause__)
+        self.assertEqual(len(self.requests), 4)
+
+    def test_throttled_requests_raise_with_retry_after(self):
+        self.responses = [httpx.Response(429, headers={"Retry-After": "0"})] * 4
+        with self.assertRaises(CustomerIOThrottledException) as ctx:
+            self.cio.track(customer_id="1", name="purchased")
+        self.assertEqual(ctx.exception.retry_after, 0)
+        self.assertEqual(self.cio.throttled_count, 4)
+
+    def test_client_errors_are_not_retried(self):
+        self.responses = [httpx.Response(400, text="bad request")]
+        with self.assertRaises(CustomerIOException) as ctx:
+            self.cio.track(customer_id="1", name="purchased")
+        self.assertIn("400", str(ctx.exception))
+        self.assertEqual(len(self.requests), 1)
+
+    def test_http2_is_negotiated_with_the_server(self):
+        with StandInServer() as server:
+            client = APIClient("apikey", url=server.url, http2=True)
+            client.http.verify = False
+            try:
+                request = SendEmailRequest(transactional_message_id=1, identifiers={"id": 1})
+                response = client.send_request(
+                    "POST", client.url + "/v1/send/email", request._to_dict()
+                )
+            finally:
+                client.close()
+        self.assertEqual(response.http_version, "HTTP/2")
+
+
+if __name__ == "__main__":
+    unittest.main()
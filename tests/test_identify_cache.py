@@ -0,0 +1,140 @@
+import json
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from customerio import CustomerIO, CustomerIOException, IdentifyCache
+
+
+class TestIdentifyCache(unittest.TestCase):
+    def test_unchanged_attributes_are_skipped(self):
+        cache = IdentifyCache()
+        attributes, fingerprints = cache.changes("1", {"email": "a@example.com", "plan": "pro"})
+        self.assertEqual(attributes, {"email": "a@example.com", "plan": "pro"})
+        cache.update("1", fingerprints)
+
+        self.assertEqual(cache.changes(1, {"plan": "pro", "email": "a@example.com"}), (None, None))
+        self.assertEqual((cache.hits, cache.partial_hits, cache.misses), (1, 0, 1))
+
+    def test_only_changed_attributes_are_returned(self):
+        cache = IdentifyCache()
+        cache.update("1", cache.changes("1", {"email": "a@example.com", "tags": ["a"]})[1])
+
+        attributes, fingerprints = cache.changes(
+            "1", {"email": "a@example.com", "tags": ["a", "b"], "plan": "pro"}
+        )
+        self.assertEqual(attributes, {"tags": ["a", "b"], "plan": "pro"})
+        self.assertEqual(set(fingerprints), {"tags", "plan"})
+        self.assertEqual(cache.partial_hits, 1)
+
+    def test_attributes_are_not_cached_until_updated(self):
+        cache = IdentifyCache()
+        cache.changes("1", {"email": "a@example.com"})
+        attributes, _ = cache.changes("1", {"email": "a@example.com"})
+        self.assertEqual(attributes, {"email": "a@example.com"})
+
+    def test_least_recently_used_customers_are_evicted(self):
+        cache = IdentifyCache(max_size=2)
+        for customer_id in ("1", "2"):
+            cache.update(customer_id, cache.changes(customer_id, {"plan": "pro"})[1])
+        cache.changes("1", {"plan": "pro"})
+        cache.update("3", cache.changes("3", {"plan": "pro"})[1])
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.changes("2", {"plan": "pro"})[0], {"plan": "pro"})
+        self.assertIsNone(cache.changes("1", {"plan": "pro"})[0])
+
+    def test_entries_expire_after_ttl(self):
+        cache = IdentifyCache(ttl=60)
+        with mock.patch("customerio.identify_cache.time.monotonic", return_value=100.0):
+            cache.update("1", cache.changes("1", {"plan": "pro"})[1])
+        with mock.patch("customerio.identify_cache.time.monotonic", return_value=159.0):
+            self.assertIsNone(cache.changes("1", {"plan": "pro"})[0])
+        with mock.patch("customerio.identify_cache.time.monotonic", return_value=160.0):
+            self.assertEqual(cache.changes("1", {"plan": "pro"})[0], {"plan": "pro"})
+
+    def test_unserializable_values_are_always_sent(self):
+        cache = IdentifyCache()
+        value = object()
+        cache.update("1", cache.changes("1", {"ref": value})[1])
+        self.assertEqual(cache.changes("1", {"ref": value})[0], {"ref": value})
+
+    def test_invalid_arguments_raise(self):
+        with self.assertRaises(CustomerIOException):
+            IdentifyCache(max_size=0)
+        with self.assertRaises(CustomerIOException):
+            IdentifyCache(ttl=0)
+
+
+class TestCustomerIOIdentifyCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = IdentifyCache()
+        self.cio = CustomerIO(site_id="siteid", api_key="apikey", identify_cache=self.cache)
+        self.sent = []
+        self.fail = False
+
+        def send_request(method, url, data):
+            if self.fail:
+                raise CustomerIOException("500: boom")
+            self.sent.append((method, url, data))
+            return "response"
+
+        self.cio.send_request = send_request
+
+    def test_identify_sends_only_changed_attributes(self):
+        created_at = datetime(2024, 1, 1)
+        self.assertEqual(
+            self.cio.identify(id="1", email="a@example.com", created_at=created_at), "response"
+        )
+        self.assertIsNone(self.cio.identify(id="1", email="a@example.com", created_at=created_at))
+        self.cio.identify(id="1", email="b@example.com", created_at=created_at)
+
+        self.assertEqual([data for _, _, data in self.sent][1:], [{"email": "b@example.com"}])
+        self.assertEqual(len(self.sent), 2)
+
+    def test_failed_identify_is_not_cached(self):
+        self.fail = True
+        with self.assertRaises(CustomerIOException):
+            self.cio.identify(id="1", email="a@example.com")
+
+        self.fail = False
+        self.cio.identify(id="1", email="a@example.com")
+        self.assertEqual(self.sent[0][2], {"email": "a@example.com"})
+
+    def test_delete_and_merge_invalidate_the_customer(self):
+        self.cio.identify(id="1", email="a@example.com")
+        self.cio.identify(id="2", email="b@example.com")
+        self.cio.delete(customer_id="1")
+        self.cio.merge_customers("id", "3", "id", "2")
+
+        self.cio.identify(id="1", email="a@example.com")
+        self.cio.identify(id="2", email="b@example.com")
+        identifies = [data for method, _, data in self.sent if method == "PUT"]
+        self.assertEqual(len(identifies), 4)
+
+    def test_failed_buffered_identifies_are_invalidated(self):
+        cio = CustomerIO(
+            site_id="siteid", api_key="apikey", buffered=True, identify_cache=self.cache
+        )
+        batches = []
+
+        def send_request(method, url, data):
+            batches.append(json.loads(data)["batch"])
+            if len(batches) == 1:
+                raise CustomerIOException("500: boom")
+            return "response"
+
+        cio.send_request = send_request
+        cio.identify(id="1", email="a@example.com")
+        cio.flush()
+        cio.identify(id="1", email="a@example.com")
+        cio.flush()
+        cio.identify(id="1", email="a@example.com")
+        cio.close()
+
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(batches[1][0]["attributes"], {"email": "a@example.com"})
+
+
+if __name__ == "__main__":
+    unittest.main()
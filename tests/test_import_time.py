@@ -0,0 +1,68 @@
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ("requests", "urllib3", "httpx", "charset_normalizer", "idna", "sqlite3")
+
+
+def _run(code):
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def _imported_modules(importtime_output):
+    """Returns the modules listed in `python -X importtime` output with their cumulative µs."""
+    modules = {}
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+class TestImportTime(unittest.TestCase):
+    def test_import_does_not_load_transport_stack(self):
+        result = _run(
+            "from customerio import APIClient, CustomerIO\n"
+            "CustomerIO(site_id='siteid', api_key='apikey')\n"
+            "APIClient('key')\n"
+        )
+        modules = _imported_modules(result.stderr)
+
+        self.assertIn("customerio", modules)
+        loaded = [
+            name
+            for name in modules
+            if name == "customerio.transport" or name.split(".")[0] in HEAVY_MODULES
+        ]
+        self.assertEqual(loaded, [], f"customerio took {modules['customerio']}us to import")
+
+    def test_transport_stack_is_loaded_with_the_first_session(self):
+        result = _run(
+            "import sys\n"
+            "from customerio import CustomerIO\n"
+            "CustomerIO(site_id='siteid', api_key='apikey').http\n"
+            "print('requests' in sys.modules, 'customerio.transport' in sys.modules)\n"
+        )
+
+        self.assertEqual(result.stdout.split(), ["True", "True"])
+
+    def test_import_without_sqlite3(self):
+        result = _run(
+            "import sys\n"
+            "sys.modules['sqlite3'] = None\n"
+            "from customerio import CustomerIO, Spool\n"
+            "CustomerIO(site_id='siteid', api_key='apikey')\n"
+        )
+
+        self.assertEqual(result.returncode, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+from customerio import CustomerIO, CustomerIOException
+from customerio.__main__ import main
+from customerio.importer import Importer
+from tests.server import FakeSession
+
+
+class TestImporter(unittest.TestCase):
+    def setUp(self):
+        self.session = FakeSession()
+        self.client = CustomerIO(
+            site_id="siteid",
+            api_key="apikey",
+            retries=0,
+            futures=True,
+            futures_workers=2,
+            max_in_flight=2,
+        )
+        self.client._build_session = lambda: self.session
+        self.addCleanup(self.client.close)
+
+    def _operations(self):
+        return [operation for batch in self.session.batches() for operation in batch]
+
+    def test_ndjson_rows_are_identified(self):
+        rows = [
+            '{"id": 1, "plan": "pro"}\n',
+            "\n",
+            '{"type": "person", "action": "delete", "identifiers": {"id": 2}}\n',
+            '{"id": 3}\n',
+        ]
+        importer = Importer(self.client, batch_size=2)
+
+        self.assertTrue(importer.run(rows))
+        self.assertEqual(len(self.session.batches()), 2)
+        self.assertEqual(
+            sorted(self._operations(), key=lambda operation: operation["identifiers"]["id"]),
+            [
+                {
+                    "type": "person",
+                    "action": "identify",
+                    "identifiers": {"id": 1},
+                    "attributes": {"plan": "pro"},
+                },
+                {"type": "person", "action": "delete", "identifiers": {"id": 2}},
+                {
+                    "type": "person",
+                    "action": "identify",
+                    "identifiers": {"id": 3},
+                    "attributes": {},
+                },
+            ],
+        )
+        self.assertEqual((importer.sent, importer.failed, importer.skipped), (3, 0, 0))
+
+    def test_csv_rows_are_tracked_as_events(self):
+        rows = io.StringIO("customer,name,timestamp,plan\n1,purchased,1700000000,pro\n2,viewed,,\n")
+        importer = Importer(self.client, action="event", id_column="customer")
+
+        self.assertTrue(importer.run(rows, format="csv"))
+        self.assertEqual(
+            self._operations(),
+            [
+                {
+                    "type": "person",
+                    "action": "event",
+                    "identifiers": {"id": "1"},
+                    "name": "purchased",
+                    "timestamp": 1700000000,
+                    "attributes": {"plan": "pro"},
+                },
+                {
+                    "type": "person",
+                    "action": "event",
+                    "identifiers": {"id": "2"},
+                    "name": "viewed",
+                    "attributes": {},
+                },
+            ],
+        )
+
+    def test_invalid_rows_are_skipped(self):
+        rows = ["not json\n", "[1]\n", '{"plan": "pro"}\n', '{"id": 1, "name": "x"}\n']
+        importer = Importer(self.client, action="event")
+
+        with self.assertLogs("customerio.importer") as logs:
+            self.assertFalse(importer.run(rows))
+        self.assertEqual(importer.skipped, 3)
+        self.assertEqual(importer.sent, 1)
+        self.assertIn("Skipping line 1", logs.output[0])
+
+    def test_undelivered_operations_are_written_to_errors(self):
+        self.session.status_code = 400
+        errors = io.StringIO()
+        importer = Importer(self.client, batch_size=1, errors=errors)
+
+        with self.assertLogs("customerio.importer"):
+            self.assertFalse(importer.run(['{"id": 1}\n', '{"id": 2}\n']))
+        self.assertEqual((importer.sent, importer.failed), (0, 2))
+        written = [json.loads(line) for line in errors.getvalue().splitlines()]
+        self.assertEqual(sorted(op["identifiers"]["id"] for op in written), [1, 2])
+
+    def test_progress_is_reported(self):
+        report = io.StringIO()
+        importer = Importer(self.client, batch_size=1, report=report, report_interval=0)
+
+        importer.run(['{"id": 1}\n', '{"id": 2}\n'])
+        lines = report.getvalue().splitlines()
+        self.assertGreaterEqual(len(lines), 3)
+        self.assertIn("ops/s", lines[0])
+        self.assertTrue(lines[-1].startswith("Imported 2 operations"))
+
+    def test_memory_does_not_grow_with_input(self):
+        self.session.record = False
+
+        def peak(count):
+            rows = (f'{{"id": {i}, "plan": "pro"}}\n' for i in range(count))
+            tracemalloc.start()
+            try:
+                Importer(self.client, batch_size=100).run(rows)
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        small = peak(2000)
+        self.assertLess(peak(20000), small * 2)
+        self.assertEqual(self.session.count, 220)
+
+    def test_client_must_be_in_futures_mode(self):
+        with self.assertRaises(CustomerIOException):
+            Importer(CustomerIO(site_id="siteid", api_key="apikey"))
+
+
+class TestImportCommand(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.session = FakeSession()
+        for patcher in (
+            mock.patch.object(CustomerIO, "_build_session", lambda client: self.session),
+            # the command configures logging for the process, which the test runner owns
+            mock.patch("customerio.importer.logging"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _main(self, *argv):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            return main(list(argv)), stderr.getvalue()
+
+    def test_imports_csv_file(self):
+        path = os.path.join(self.directory, "customers.csv")
+        with open(path, "w") as f:
+            f.write("id,plan\n1,pro\n2,free\n")
+
+        status, output = self._main("import", path, "--site-id", "siteid", "--api-key", "key")
+        self.assertEqual(status, 0)
+        self.assertIn("Imported 2 operations", output)
+        self.assertEqual(len(self.session.batches()[0]), 2)
+
+    def test_credentials_are_required(self):
+        with mock.patch.dict(os.environ, clear=True), self.assertRaises(SystemExit):
+            self._main("import", "customers.ndjson")
+
+
+if __name__ == "__main__":
+    unittest.main()
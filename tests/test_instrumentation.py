@@ -0,0 +1,108 @@
+import unittest
+
+import urllib3
+
+from customerio import APIClient, CustomerIO, CustomerIOException, RequestObserver
+from tests.server import HTTPSTestCase
+
+# test uses a self signed certificate so disable the warning messages
+urllib3.disable_warnings()
+
+
+class RecordingObserver(RequestObserver):
+    def __init__(self):
+        self.calls = []
+
+    def _record(self, hook, event):
+        self.calls.append((hook, event.status, event.attempt, dict(event.timings)))
+
+    def before_send(self, event):
+        self._record("before_send", event)
+
+    def on_retry(self, event):
+        self._record("on_retry", event)
+
+    def after_response(self, event):
+        self._record("after_response", event)
+
+    def on_error(self, event):
+        self._record("on_error", event)
+
+
+class TestRequestObservers(HTTPSTestCase):
+    def setUp(self):
+        self.observer = RecordingObserver()
+        self.cio = CustomerIO(
+            site_id="siteid",
+            api_key="apikey",
+            host=self.server.server_address[0],
+            port=self.server.server_port,
+            retries=5,
+            backoff_factor=0,
+            observers=[self.observer],
+        )
+        # do not verify the ssl certificate as it is self signed
+        self.cio.http.verify = False
+
+    def test_successful_request(self):
+        events = []
+        self.observer.before_send = events.append
+        self.cio.track(customer_id="1", name="purchased", data={"price": 23.45})
+
+        hooks = [call[0] for call in self.observer.calls]
+        self.assertEqual(hooks, ["after_response"])
+        event = events[0]
+        self.assertEqual(event.method, "POST")
+        self.assertEqual(event.endpoint, "/api/v1/customers/{customer_id}/events")
+        self.assertEqual(event.status, 200)
+        self.assertEqual(event.attempt, 1)
+        self.assertGreater(event.payload_bytes, 0)
+        for stage in ("sanitize", "serialize", "connection_wait", "connect", "server", "total"):
+            self.assertIn(stage, event.timings)
+        self.assertGreaterEqual(event.timings["total"], event.timings["server"])
+
+    def test_retries_are_reported(self):
+        self.cio.identify("retried", fail_count=1)
+
+        hooks = [(hook, attempt) for hook, _, attempt, _ in self.observer.calls]
+        self.assertEqual(
+            hooks,
+            [("before_send", 0), ("on_retry", 1), ("on_retry", 2), ("after_response", 3)],
+        )
+        self.assertEqual(self.observer.calls[-1][1], 200)
+
+    def test_errors_are_reported(self):
+        cio = APIClient(
+            "apikey",
+            url=f"https://{self.server.server_address[0]}:{self.server.server_port}",
+            retries=0,
+            observers=[self.observer],
+        )
+        cio.http.verify = False
+
+        with self.assertRaises(CustomerIOException):
+            cio.send_request("PUT", cio.url + "/v1/failing", {"fail_count": 1})
+
+        self.assertEqual([call[0] for call in self.observer.calls], ["before_send", "on_error"])
+        self.assertIn("total", self.observer.calls[-1][3])
+
+    def test_failing_observer_does_not_affect_requests(self):
+        class FailingObserver(RequestObserver):
+            def before_send(self, event):
+                raise RuntimeError("observer failed")
+
+        self.cio.observers.insert(0, FailingObserver())
+        with self.assertLogs("customerio.client_base", level="ERROR"):
+            self.cio.track(customer_id="1", name="purchased")
+
+        self.assertEqual(self.observer.calls[-1][0], "after_response")
+
+    def test_device_endpoint_template(self):
+        self.assertEqual(
+            self.cio._endpoint_template(f"{self.cio.base_url}/customers/1%2F2/devices/abc"),
+            "/api/v1/customers/{customer_id}/devices/{device_id}",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
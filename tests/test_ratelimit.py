@@ -0,0 +1,58 @@
+import threading
+import time
+import unittest
+
+from customerio import CustomerIOException, RateLimiter
+from customerio.client_base import ClientBase
+from tests.server import FakeSession
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_is_available_immediately(self):
+        limiter = RateLimiter(rate=10, burst=5)
+
+        self.assertEqual([limiter.reserve() for _ in range(5)], [0.0] * 5)
+        self.assertAlmostEqual(limiter.reserve(), 0.1, delta=0.01)
+        self.assertAlmostEqual(limiter.reserve(), 0.2, delta=0.01)
+
+    def test_tokens_refill_over_time(self):
+        limiter = RateLimiter(rate=100, burst=1)
+        limiter.reserve()
+        time.sleep(0.02)
+
+        self.assertEqual(limiter.reserve(), 0.0)
+
+    def test_limits_combined_rate_across_threads(self):
+        limiter = RateLimiter(rate=200, burst=1)
+        start = time.monotonic()
+
+        threads = [
+            threading.Thread(target=lambda: [limiter.acquire() for _ in range(10)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 40 tokens at 200/s with a burst of 1 need at least 39 / 200 seconds.
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_invalid_settings_raise(self):
+        with self.assertRaises(CustomerIOException):
+            RateLimiter(rate=0)
+        with self.assertRaises(CustomerIOException):
+            RateLimiter(rate=10, burst=0)
+
+    def test_clients_share_a_limiter(self):
+        limiter = RateLimiter(rate=1000, burst=2)
+        clients = [ClientBase(rate_limiter=limiter) for _ in range(2)]
+        for client in clients:
+            client._build_session = FakeSession
+            client.send_request("POST", "https://example.com", {})
+
+        self.assertGreater(limiter.reserve(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
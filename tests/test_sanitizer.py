@@ -0,0 +1,75 @@
+import json
+import unittest
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from customerio.sanitizer import sanitize
+
+
+class TestSanitize(unittest.TestCase):
+    def test_scalars_are_unchanged(self):
+        data = {"s": "text", "i": 1, "b": True, "n": None, "f": 1.5}
+
+        self.assertEqual(sanitize(data), data)
+
+    def test_nested_values_are_converted(self):
+        data = {
+            "created_at": datetime(2009, 2, 13, 23, 31, 30, tzinfo=timezone.utc),
+            "items": [
+                {"added_at": datetime(2009, 2, 13, 23, 31, 30), "price": float("nan")},
+                ("a", float("inf"), -float("inf")),
+            ],
+            "tags": {"only"},
+            "nested": {"deeper": {"birthday": date(2009, 2, 13)}},
+        }
+
+        self.assertEqual(
+            sanitize(data),
+            {
+                "created_at": 1234567890,
+                "items": [{"added_at": 1234567890, "price": None}, ["a", None, None]],
+                "tags": ["only"],
+                "nested": {"deeper": {"birthday": 1234483200}},
+            },
+        )
+
+    def test_decimal_and_uuid(self):
+        uuid = UUID("12345678-1234-5678-1234-567812345678")
+
+        self.assertEqual(
+            sanitize({"price": Decimal("23.45"), "bad": Decimal("NaN"), "id": uuid}),
+            {"price": 23.45, "bad": None, "id": "12345678-1234-5678-1234-567812345678"},
+        )
+
+    def test_subclasses_use_their_base_type_converter(self):
+        class Timestamp(datetime):
+            pass
+
+        class Enum(str):
+            pass
+
+        data = OrderedDict(at=Timestamp(2009, 2, 13, 23, 31, 30), kind=Enum("x"))
+
+        self.assertEqual(sanitize(data), {"at": 1234567890, "kind": "x"})
+
+    def test_unknown_types_are_left_for_the_serializer(self):
+        value = object()
+
+        self.assertIs(sanitize({"v": value})["v"], value)
+
+    def test_result_is_json_serializable(self):
+        data = {"a": [float("nan"), {"b": datetime(2020, 1, 1)}], "c": {1, 2}}
+
+        json.dumps(sanitize(data), allow_nan=False)
+
+    def test_input_is_not_modified(self):
+        data = {"items": [{"price": float("nan")}]}
+        sanitize(data)
+
+        self.assertTrue(data["items"][0]["price"] != data["items"][0]["price"])
+
+
+if __name__ == "__main__":
+    unittest.main()
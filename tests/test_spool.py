@@ -0,0 +1,281 @@
+import json
+import os
+import tempfile
+import unittest
+
+from customerio import (
+    BatchChunkResult,
+    CustomerIO,
+    CustomerIOBatchException,
+    CustomerIOException,
+    Spool,
+)
+
+
+class TestSpool(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "spool.db")
+        self.spool = Spool(self.path)
+        self.addCleanup(self.spool.close)
+
+    def _operations(self, count):
+        return [
+            {"type": "person", "action": "identify", "identifiers": {"id": i}} for i in range(count)
+        ]
+
+    def test_replays_operations_in_order(self):
+        self.spool.append(self._operations(5))
+        batches = []
+
+        self.assertEqual(self.spool.replay(batches.append, batch_size=2), 5)
+        self.assertEqual(
+            batches, [self._operations(5)[0:2], self._operations(5)[2:4], self._operations(5)[4:]]
+        )
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(self.spool.size, 0)
+
+    def test_failed_replay_keeps_operations(self):
+        self.spool.append(self._operations(3))
+        sent = []
+
+        def send(operations):
+            sent.append(operations)
+            if len(sent) == 2:
+                raise CustomerIOException("unreachable") from ConnectionError()
+
+        with self.assertRaises(CustomerIOException):
+            self.spool.replay(send, batch_size=2)
+
+        self.assertEqual(len(self.spool), 1)
+        self.assertEqual(self.spool.replay(lambda ops: None), 1)
+
+    def test_only_retryable_chunks_stay_after_a_partial_failure(self):
+        operations = self._operations(4)
+        self.spool.append(operations)
+
+        retryable = CustomerIOException("503: unavailable")
+        retryable.__cause__ = ConnectionError()
+        results = [
+            BatchChunkResult(0, 1, 10, "response", None),
+            BatchChunkResult(1, 1, 10, None, CustomerIOException("400: bad request")),
+            BatchChunkResult(2, 2, 20, None, retryable),
+        ]
+
+        def send(batch):
+            raise CustomerIOBatchException("2 of 3 batch requests failed", results)
+
+        with self.assertRaises(CustomerIOBatchException), self.assertLogs("customerio.spool"):
+            self.spool.replay(send)
+
+        self.assertEqual(self.spool.rejected, 1)
+        delivered = []
+        self.assertEqual(self.spool.replay(delivered.extend), 2)
+        self.assertEqual(delivered, operations[2:])
+
+    def test_operations_survive_reopening(self):
+        self.spool.append(self._operations(2))
+        self.spool.close()
+
+        reopened = Spool(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(len(reopened), 2)
+        self.assertGreater(reopened.size, 0)
+
+    def test_spools_sharing_a_file_share_its_size(self):
+        # each instance stands in for a process using the same file
+        path = os.path.join(os.path.dirname(self.path), "shared.db")
+        first, second = Spool(path, max_bytes=1000), Spool(path, max_bytes=1000)
+        self.addCleanup(first.close)
+        self.addCleanup(second.close)
+        for operation in self._operations(40):
+            first.append([operation])
+            second.append([operation])
+
+        self.assertLessEqual(first.size, 1000)
+        self.assertEqual(first.size, second.size)
+        stored = len(second)
+        self.assertEqual(first.replay(lambda operations: None), stored)
+        self.assertEqual((first.size, second.size), (0, 0))
+
+    def test_only_one_spool_replays_a_shared_file(self):
+        other = Spool(self.path)
+        self.addCleanup(other.close)
+        self.spool.append(self._operations(3))
+        replayed_by_other = []
+
+        def send(operations):
+            replayed_by_other.append(other.replay(lambda operations: None))
+
+        self.assertEqual(self.spool.replay(send, batch_size=2), 3)
+        self.assertEqual(replayed_by_other, [0, 0])
+        self.assertEqual(len(other), 0)
+
+    def test_discard_removes_a_customers_operations(self):
+        self.spool.append(
+            self._operations(3)
+            + [{"type": "person", "action": "identify", "identifiers": {"email": 1}}]
+        )
+
+        self.assertEqual(self.spool.discard(1), 1)
+
+        delivered = []
+        self.spool.replay(delivered.extend)
+        self.assertEqual(
+            [op["identifiers"] for op in delivered], [{"id": 0}, {"id": 2}, {"email": 1}]
+        )
+
+    def test_oldest_operations_are_dropped_over_max_bytes(self):
+        operations = self._operations(10)
+        spool = Spool(os.path.join(os.path.dirname(self.path), "small.db"), max_bytes=300)
+        self.addCleanup(spool.close)
+        spool.append(operations)
+
+        delivered = []
+        spool.replay(delivered.extend)
+        self.assertLessEqual(len(delivered), 10)
+        self.assertEqual(delivered, operations[spool.dropped :])
+        self.assertGreater(spool.dropped, 0)
+
+
+class TestCustomerIOSpool(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = Spool(os.path.join(directory.name, "spool.db"))
+        self.addCleanup(self.spool.close)
+        self.cio = CustomerIO(
+            site_id="siteid", api_key="apikey", buffered=True, flush_interval=None, spool=self.spool
+        )
+        self.requests = []
+        self.failure = None
+
+        def send_request(method, url, data):
+            if self.failure is not None:
+                raise self.failure
+            self.requests.append(data)
+
+        self.cio.send_request = send_request
+
+    def test_undeliverable_batches_are_spooled_and_replayed(self):
+        self.failure = self._connection_failure()
+
+        self.cio.identify(id="1", name="john")
+        self.cio.flush()
+        self.assertEqual(len(self.spool), 1)
+
+        self.failure = None
+        self.cio.identify(id="2", name="jane")
+        self.cio.flush()
+
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(len(self.requests), 2)
+        self.assertIn(b'"id": "1"', self.requests[0])
+        self.assertIn(b'"id": "2"', self.requests[1])
+
+    def test_operations_are_spooled_behind_operations_that_cannot_be_replayed(self):
+        self.spool.append([{"type": "person", "action": "identify", "identifiers": {"id": "0"}}])
+        self.failure = self._connection_failure()
+
+        self.cio.identify(id="1")
+        self.cio.flush()
+        self.assertEqual(self.requests, [])
+        self.assertEqual(len(self.spool), 2)
+
+        self.failure = None
+        self.cio.identify(id="2")
+        self.cio.flush()
+
+        self.assertEqual(len(self.spool), 0)
+        ids = [
+            operation["identifiers"]["id"]
+            for data in self.requests
+            for operation in json.loads(data)["batch"]
+        ]
+        self.assertEqual(ids, ["0", "1", "2"])
+
+    def test_deleting_a_customer_drops_its_spooled_operations(self):
+        self.spool.append(
+            [
+                {"type": "person", "action": "identify", "identifiers": {"id": "1"}},
+                {"type": "person", "action": "identify", "identifiers": {"id": "2"}},
+            ]
+        )
+
+        self.cio.delete("1")
+
+        self.assertEqual(len(self.spool), 0)
+        self.assertEqual(len(self.requests), 2)
+        self.assertNotIn(b'"id": "1"', self.requests[0])
+        self.assertIn(b'"id": "2"', self.requests[0])
+        self.assertEqual(self.requests[1], {})
+
+    def test_operations_are_spooled_with_the_clients_serializer(self):
+        class Money:
+            def __init__(self, amount):
+                self.amount = amount
+
+        class MoneyEncoder(json.JSONEncoder):
+            def default(self, o):
+                return o.amount if isinstance(o, Money) else super().default(o)
+
+        errors = []
+        cio = CustomerIO(
+            site_id="siteid",
+            api_key="apikey",
+            buffered=True,
+            flush_interval=None,
+            spool=self.spool,
+            json_encoder=MoneyEncoder,
+            on_batch_error=lambda error, operations: errors.append(operations),
+        )
+        self.addCleanup(cio.close)
+        cio.send_request = lambda method, url, data: self._raise_unreachable()
+
+        cio.identify(id="1", total=Money("1.50"))
+        cio.flush()
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(len(self.spool), 1)
+        delivered = []
+        self.spool.replay(delivered.extend)
+        self.assertEqual(delivered[0]["attributes"]["total"], "1.50")
+
+    def test_batch_error_handler_is_called_when_spooling_fails(self):
+        errors = []
+        self.cio._on_batch_error = lambda error, operations: errors.append(operations)
+        self.spool.append = lambda operations, serializer=None: self._raise_disk_full()
+        self.cio.send_request = lambda method, url, data: self._raise_unreachable()
+
+        with self.assertLogs("customerio.track", level="ERROR"):
+            self.cio.identify(id="1")
+            self.cio.flush()
+        self.assertEqual(len(errors), 1)
+
+    def _connection_failure(self):
+        failure = CustomerIOException("Failed to receive valid response")
+        failure.__cause__ = ConnectionError("connection refused")
+        return failure
+
+    def _raise_disk_full(self):
+        raise OSError("disk full")
+
+    def _raise_unreachable(self):
+        raise CustomerIOException("unreachable") from ConnectionError()
+
+    def test_spool_requires_buffered_mode(self):
+        with self.assertRaises(CustomerIOException):
+            CustomerIO(site_id="siteid", api_key="apikey", spool=self.spool)
+
+    def test_rejected_batches_are_not_spooled(self):
+        self.failure = CustomerIOException("400: bad request")
+
+        self.cio.identify(id="1", name="john")
+        self.cio.flush()
+
+        self.assertEqual(len(self.spool), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()